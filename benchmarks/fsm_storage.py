@@ -0,0 +1,122 @@
+"""
+FSM storage benchmark: get_data / update_data latency of the storage backends.
+
+Usage:
+    python -m benchmarks.fsm_storage [--keys 200] [--rounds 5] [--redis-url redis://localhost:6379/0]
+                                     [--footprint-users 100000]
+
+Every backend gets `--keys` chats; each round calls update_data and then get_data for every chat,
+with a paginator-sized payload (a page of 10 rows, cursors and counters). The SQL backend is measured
+with the read cache off (every call is a round trip, like a second bot process) and on.
+Needs DATABASE_URL (the fsm_states rows it writes are removed afterwards); Redis is optional.
+
+--footprint-users then stores that many chats in aiogram's MemoryStorage and in BoundedMemoryStorage
+(default budget) and prints the memory each one holds (tracemalloc).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete
+
+from bot.database import AsyncDatabase
+from bot.database.models import FSMStates
+from bot.database.fsm_storage import BoundedMemoryStorage, SQLStorage, RedisStorage, pack_data
+
+BOT_ID = 42
+FIRST_CHAT_ID = 9_100_000_000
+
+
+def _payload(i: int) -> dict:
+    rows = [(f"item-{i}-{n}", Decimal("9.99"), datetime(2026, 1, 1, 12, n)) for n in range(10)]
+    return {
+        "goods_paginator": {
+            "cache": {0: rows},
+            "cursors": {0: rows[-1][0]},
+            "total_count": 1234,
+            "total_is_approximate": False,
+            "current_page": 0,
+        },
+        "current_category": f"category-{i}",
+    }
+
+
+async def _measure(storage, keys: list[StorageKey], rounds: int) -> dict:
+    timings = {"update_data": [], "get_data": []}
+    for r in range(rounds):
+        for i, key in enumerate(keys):
+            start = time.perf_counter()
+            await storage.update_data(key, {**_payload(i), "round": r})
+            timings["update_data"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            data = await storage.get_data(key)
+            timings["get_data"].append(time.perf_counter() - start)
+            assert data["round"] == r
+    return {
+        op: (round(statistics.median(t) * 1e6, 1), round(len(t) / sum(t)))
+        for op, t in timings.items()
+    }
+
+
+async def _footprint(storage, users: int) -> int:
+    """Bytes held by `storage` after `users` chats stored a paginator state."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(users):
+        key = StorageKey(bot_id=BOT_ID, chat_id=FIRST_CHAT_ID + i, user_id=FIRST_CHAT_ID + i)
+        await storage.set_state(key, "ShopStates:viewing_goods")
+        await storage.set_data(key, _payload(i))
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held
+
+
+async def main(keys_count: int, rounds: int, redis_url: str | None, footprint_users: int = 0) -> None:
+    keys = [StorageKey(bot_id=BOT_ID, chat_id=FIRST_CHAT_ID + i, user_id=FIRST_CHAT_ID + i)
+            for i in range(keys_count)]
+    backends = {
+        "memory": MemoryStorage(),
+        "memory, bounded": BoundedMemoryStorage(),
+        "sql, no cache": SQLStorage(cache_ttl=0),
+        "sql, cache": SQLStorage(cache_ttl=60),
+    }
+    if redis_url:
+        backends["redis, no cache"] = RedisStorage(redis_url, cache_ttl=0)
+        backends["redis, cache"] = RedisStorage(redis_url, cache_ttl=60)
+
+    print(f"payload blob: {len(pack_data(_payload(0)))} bytes")
+    print(f"{'backend':>16} {'update p50 us':>14} {'updates/s':>10} {'get p50 us':>11} {'gets/s':>9}")
+    try:
+        for name, storage in backends.items():
+            r = await _measure(storage, keys, rounds)
+            print(f"{name:>16} {r['update_data'][0]:>14} {r['update_data'][1]:>10} "
+                  f"{r['get_data'][0]:>11} {r['get_data'][1]:>9}")
+            await storage.close()
+
+        if footprint_users:
+            print(f"\nmemory held after {footprint_users} chats:")
+            for name, storage in (("memory", MemoryStorage()), ("memory, bounded", BoundedMemoryStorage())):
+                held = await _footprint(storage, footprint_users)
+                extra = f" ({storage.stats()})" if isinstance(storage, BoundedMemoryStorage) else ""
+                print(f"{name:>16} {held / 2 ** 20:>8.1f} MB{extra}")
+    finally:
+        async with AsyncDatabase().session() as s:
+            await s.execute(delete(FSMStates).where(FSMStates.key.like(f"fsm:{BOT_ID}:%")))
+        await AsyncDatabase().dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fsm_storage")
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--redis-url", default=None, help="also measure a Redis-protocol server")
+    parser.add_argument("--footprint-users", type=int, default=0, help="compare in-memory storages' footprint")
+    args = parser.parse_args()
+    asyncio.run(main(args.keys, args.rounds, args.redis_url, args.footprint_users))
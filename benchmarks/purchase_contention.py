@@ -0,0 +1,145 @@
+"""
+Purchase contention benchmark: many buyers of ONE position at the same time, and as many buyers
+of DIFFERENT positions (which should not wait for each other at all).
+
+Usage:
+    python -m benchmarks.purchase_contention [--buyers 1 2 4 8 16] [--purchases 400] [--rtt-ms 2]
+
+For every concurrency level, `--purchases` units are bought by N concurrent buyers through
+buy_item_transaction, first all of one throwaway position, then each buyer of its own position;
+throughput and latency percentiles of the successful purchases are printed, and the run stops if
+any purchase fails. The category/positions/users it creates
+(prefixed "bench_") are removed afterwards and the daily rollups are rebuilt. Needs DATABASE_URL; keep N within DB_POOL_SIZE + DB_MAX_OVERFLOW.
+
+Buyers of one position still queue on its goods row: stock_sold locks it until commit.
+
+With the database on the same host a purchase costs mostly bot CPU, so lock waits barely show;
+--rtt-ms adds a simulated network round trip to every statement, BEGIN and COMMIT (asyncpg driver)
+to see how long row locks are held the way they would be against a remote server.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from bot.database import Database, AsyncDatabase
+from bot.database.models import User, Goods, ItemValues, Categories, BoughtGoods
+from bot.database.methods import buy_item_transaction
+from bot.database.maintenance import backfill_rollups
+
+CATEGORY = "bench_category"
+ITEM = "bench_item"
+OWN_ITEM = "bench_item_{}"
+FIRST_USER_ID = 9_000_000_000
+
+
+def _simulate_rtt(rtt: float) -> None:
+    """Delay every asyncpg round trip by `rtt` seconds (patches SQLAlchemy's asyncpg adapter)."""
+    from sqlalchemy.dialects.postgresql import asyncpg as adapter
+
+    def delayed(method):
+        async def wrapper(*args, **kwargs):
+            await asyncio.sleep(rtt)
+            return await method(*args, **kwargs)
+
+        return wrapper
+
+    cursor, connection = adapter.AsyncAdapt_asyncpg_cursor, adapter.AsyncAdapt_asyncpg_connection
+    cursor._prepare_and_execute = delayed(cursor._prepare_and_execute)
+    connection._start_transaction = delayed(connection._start_transaction)
+    connection._commit_and_discard = delayed(connection._commit_and_discard)
+
+
+def _setup(buyers: int, units: int) -> None:
+    items = [ITEM] + [OWN_ITEM.format(i) for i in range(buyers)]
+    with Database().session() as s:
+        s.add(Categories(name=CATEGORY))
+        s.add_all(Goods(item, Decimal("1"), "Contention benchmark", CATEGORY, stock_count=units) for item in items)
+        s.flush()
+        s.add_all(
+            ItemValues(name=item, value=f"bench-{i}", is_infinity=False) for item in items for i in range(units)
+        )
+        s.add_all(
+            User(telegram_id=FIRST_USER_ID + i, balance=Decimal(0), registration_date=datetime.now())
+            for i in range(buyers)
+        )
+
+
+def _fund(balance: int) -> None:
+    """Give every buyer `balance` (units cost 1), enough for all levels of one pass."""
+    with Database().session() as s:
+        s.query(User).filter(User.telegram_id >= FIRST_USER_ID).update(
+            {User.balance: Decimal(balance)}, synchronize_session=False
+        )
+
+
+def _teardown() -> None:
+    with Database().session() as s:
+        s.query(BoughtGoods).filter(BoughtGoods.item_name.startswith(ITEM)).delete(synchronize_session=False)
+        s.query(User).filter(User.telegram_id >= FIRST_USER_ID).delete(synchronize_session=False)
+        s.query(Categories).filter(Categories.name == CATEGORY).delete(synchronize_session=False)
+    backfill_rollups()
+
+
+async def _run_level(buyers: int, purchases: int, same_item: bool) -> dict:
+    remaining = purchases
+    latencies: list[float] = []
+    failures: dict[str, int] = {}
+
+    async def buyer(n: int):
+        nonlocal remaining
+        item = ITEM if same_item else OWN_ITEM.format(n)
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            ok, message, _ = await buy_item_transaction(FIRST_USER_ID + n, item)
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures[message] = failures.get(message, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(buyer(i) for i in range(buyers)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "buyers": buyers,
+        "purchases": len(latencies),
+        "failed": failures,
+        "per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def main(levels: list[int], purchases: int, rtt_ms: float = 0) -> None:
+    if rtt_ms:
+        _simulate_rtt(rtt_ms / 1000)
+    _teardown()
+    _setup(max(levels), purchases * len(levels))
+    try:
+        for same_item, title in ((True, "all buyers of one position"), (False, "each buyer of its own position")):
+            # A single buyer may make every purchase of every level
+            _fund(purchases * len(levels))
+            print(f"{title}:")
+            print(f"{'buyers':>7} {'ok':>6} {'failed':>7} {'buys/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for level in levels:
+                r = await _run_level(level, purchases, same_item)
+                print(f"{r['buyers']:>7} {r['purchases']:>6} {sum(r['failed'].values()):>7} {r['per_sec']:>8} "
+                      f"{r['p50_ms']:>8} {r['p95_ms']:>8}")
+                assert not r["failed"], f"purchases failed: {r['failed']}"
+    finally:
+        await AsyncDatabase().dispose()
+        _teardown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.purchase_contention")
+    parser.add_argument("--buyers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--purchases", type=int, default=400, help="purchases per concurrency level")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="simulated bot <-> database round trip")
+    args = parser.parse_args()
+    asyncio.run(main(args.buyers, args.purchases, args.rtt_ms))
@@ -0,0 +1,138 @@
+"""
+Rate limiter benchmark: the per-user timestamp lists the middleware used to keep against the
+sliding-window counters of bot.middleware.RateLimiter.
+
+Usage:
+    python -m benchmarks.rate_limiter [--users 1000000] [--requests-per-user 5] [--hot-requests 20000]
+                                      [--hot-limit 1000]
+
+Each of `--users` distinct users makes `--requests-per-user` requests (a global and an action check each);
+the memory left behind is measured with tracemalloc in a separate pass. Then one user sends
+`--hot-requests` requests against a limit of `--hot-limit` per minute, where the lists cost O(limit) per check.
+Finally the limiter's clock is moved past the idle period twice and sweep() drops every user.
+No database or network needed.
+"""
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+
+from bot.middleware.rate_limit import RateLimiter, RateLimitConfig
+
+FIRST_USER_ID = 9_200_000_000
+
+
+class ListRateLimiter:
+    """The previous implementation: a list of request timestamps per user and per action."""
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.user_requests = defaultdict(list)
+        self.user_actions = defaultdict(lambda: defaultdict(list))
+        self.banned_users = {}
+
+    def _clean_old_requests(self, requests: list, window: int) -> list:
+        current_time = time.time()
+        return [req_time for req_time in requests if current_time - req_time < window]
+
+    def check_global_limit(self, user_id: int) -> bool:
+        current_time = time.time()
+        self.user_requests[user_id] = self._clean_old_requests(self.user_requests[user_id], self.config.global_window)
+        if len(self.user_requests[user_id]) >= self.config.global_limit:
+            return False
+        self.user_requests[user_id].append(current_time)
+        return True
+
+    def check_action_limit(self, user_id: int, action: str) -> bool:
+        if action not in self.config.action_limits:
+            return True
+        limit, window = self.config.action_limits[action]
+        current_time = time.time()
+        self.user_actions[action][user_id] = self._clean_old_requests(self.user_actions[action][user_id], window)
+        if len(self.user_actions[action][user_id]) >= limit:
+            return False
+        self.user_actions[action][user_id].append(current_time)
+        return True
+
+
+class _Clock:
+    """Settable monotonic clock, to age the limiter without sleeping."""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.offset
+
+
+def _many_users(limiter, users: int, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + users):
+            limiter.check_global_limit(user_id)
+            limiter.check_action_limit(user_id, "shop_view")
+    return time.perf_counter() - start
+
+
+def _footprint(factory, users: int, requests: int) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    limiter = factory()
+    _many_users(limiter, users, requests)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del limiter
+    return held
+
+
+def _hot_user(limiter, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        limiter.check_global_limit(FIRST_USER_ID)
+        limiter.check_action_limit(FIRST_USER_ID, "shop_view")
+    return time.perf_counter() - start
+
+
+def main(users: int, requests: int, hot_requests: int, hot_limit: int) -> None:
+    config = RateLimitConfig()
+    hot_config = RateLimitConfig(global_limit=hot_limit, action_limits={"shop_view": (hot_limit, 60)})
+    clock = _Clock()
+    implementations = {
+        "lists": lambda cfg=config: ListRateLimiter(cfg),
+        "sliding window": lambda cfg=config: RateLimiter(cfg, clock=clock),
+    }
+
+    checks = 2 * users * requests
+    print(f"{users} distinct users, {requests} requests each (a global and an action check per request):")
+    print(f"{'limiter':>15} {'checks/s':>10} {'us/check':>9} {'memory MB':>10} {'bytes/user':>11}")
+    for name, factory in implementations.items():
+        elapsed = _many_users(factory(), users, requests)
+        held = _footprint(factory, users, requests)
+        print(f"{name:>15} {round(checks / elapsed):>10} {elapsed / checks * 1e6:>9.2f} "
+              f"{held / 2 ** 20:>10.1f} {held / users:>11.0f}")
+
+    print(f"\none user, {hot_requests} requests, limit {hot_limit}/min:")
+    for name, factory in implementations.items():
+        elapsed = _hot_user(factory(hot_config), hot_requests)
+        print(f"{name:>15} {elapsed / (2 * hot_requests) * 1e6:>9.2f} us/check")
+
+    limiter = RateLimiter(config, clock=clock)
+    _many_users(limiter, users, 1)
+    sweeps = []
+    for _ in range(2):
+        clock.offset += limiter.idle_after
+        start = time.perf_counter()
+        limiter.sweep()
+        sweeps.append(time.perf_counter() - start)
+    print(f"\nsweep: {users} idle users dropped after two idle periods, "
+          f"longest sweep {max(sweeps) * 1e3:.1f} ms, {limiter.tracked_users()} left")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.rate_limiter")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--requests-per-user", type=int, default=5)
+    parser.add_argument("--hot-requests", type=int, default=20_000)
+    parser.add_argument("--hot-limit", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.users, args.requests_per_user, args.hot_requests, args.hot_limit)
@@ -1 +1 @@
-from bot.database.main import Database
+from bot.database.main import Database, AsyncDatabase
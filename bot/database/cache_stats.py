@@ -0,0 +1,31 @@
+import asyncio
+
+from aiogram.fsm.storage.base import BaseStorage
+
+from bot.database.fsm_storage import BoundedMemoryStorage, CachedStorage
+from bot.database.methods.catalog import catalog_cache_stats
+from bot.database.methods.read import role_cache_stats
+from bot.logger_mesh import logger
+from bot.misc import page_cache_stats, prefetch_stats
+
+
+def cache_stats(fsm_storage: BaseStorage | None = None) -> dict:
+    """Counters of the in-process caches: roles, catalog, shared list pages, prefetch and FSM storage."""
+    stats = {
+        "roles": role_cache_stats(),
+        "catalog": catalog_cache_stats(),
+        "pages": page_cache_stats(),
+        "prefetch": prefetch_stats(),
+    }
+    if isinstance(fsm_storage, BoundedMemoryStorage):
+        stats["fsm"] = fsm_storage.stats()
+    elif isinstance(fsm_storage, CachedStorage):
+        stats["fsm"] = fsm_storage.cache_stats()
+    return stats
+
+
+async def log_cache_stats(interval: float, fsm_storage: BaseStorage | None = None) -> None:
+    """Periodically write cache counters to the bot log (run as a background task)"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Cache stats: %s", cache_stats(fsm_storage))
@@ -1,7 +1,16 @@
 import os
 from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
 from bot.misc import EnvKeys
 
 
 def dsn() -> str:
     return os.getenv("DATABASE_URL") if Path("/.dockerenv").exists() else EnvKeys.DATABASE_URL
+
+
+def async_dsn() -> str:
+    """Same database as dsn(), but with the async driver from DB_ASYNC_DRIVER."""
+    url = make_url(dsn()).set(drivername=EnvKeys.DB_ASYNC_DRIVER)
+    return url.render_as_string(hide_password=False)
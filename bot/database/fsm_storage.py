@@ -0,0 +1,330 @@
+"""
+Persistent FSM storages: conversation state survives restarts and can be shared by several bot processes.
+
+FSM_STORAGE selects the backend: "memory" (this process only, bounded by FSM_MEMORY_MAX_ENTRIES/BYTES),
+"sql" (fsm_states table in the bot's database) or "redis" (any Redis-protocol server at FSM_REDIS_URL;
+needs the `redis` package).
+"""
+import base64
+import json
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import select, delete, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.database.main import AsyncDatabase
+from bot.database.models import FSMStates
+from bot.misc import EnvKeys, TTLCache
+
+# Data blobs at least this long are zlib-compressed (paginator pages, long value lists)
+COMPRESS_MIN_BYTES = 512
+
+_MISSING = object()
+
+# Key marking a tagged value in the JSON blob: {"__t": <type>, "v": <value>}
+_TAG = "__t"
+
+
+def _encode(value: Any) -> Any:
+    """JSON-ready copy of FSM data; types JSON lacks (and dicts that are not plain str-keyed) are tagged."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and _TAG not in value:
+            return {k: _encode(v) for k, v in value.items()}
+        return {_TAG: "dict", "v": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {_TAG: "tuple", "v": [_encode(v) for v in value]}
+    if isinstance(value, Decimal):
+        return {_TAG: "decimal", "v": str(value)}
+    if isinstance(value, datetime):
+        return {_TAG: "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {_TAG: "date", "v": value.isoformat()}
+    if isinstance(value, bytes):
+        return {_TAG: "bytes", "v": base64.b64encode(value).decode()}
+    raise TypeError(f"FSM data cannot store {type(value).__name__} values")
+
+
+_DECODERS = {
+    "dict": lambda pairs: {k: v for k, v in pairs},
+    "tuple": tuple,
+    "decimal": Decimal,
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "bytes": base64.b64decode,
+}
+
+
+def _decode(obj: dict) -> Any:
+    tag = obj.get(_TAG)
+    return _DECODERS[tag](obj["v"]) if tag is not None else obj
+
+
+def pack_data(data: Mapping[str, Any]) -> bytes | None:
+    """
+    Compact FSM data: JSON with tagged tuples, datetimes, Decimals, bytes and int dict keys (so they come back
+    the way MemoryStorage keeps them), compressed when large. JSON, not pickle: the blobs live in a shared
+    database or Redis, and decoding them must never run code.
+    """
+    if not data:
+        return None
+    raw = json.dumps(_encode(dict(data)), separators=(",", ":"), ensure_ascii=False).encode()
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, 1)
+        if len(compressed) < len(raw):
+            return b"c" + compressed
+    return b"j" + raw
+
+
+def unpack_data(blob: bytes | None) -> Dict[str, Any]:
+    """Data of a pack_data blob; blobs in another format (pickles of older versions) are dropped."""
+    if not blob or blob[:1] not in (b"j", b"c"):
+        return {}
+    body = blob[1:]
+    return json.loads(zlib.decompress(body) if blob[:1] == b"c" else body, object_hook=_decode)
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    In-process FSM storage that does not grow with the number of users who ever opened a menu:
+    data is kept as compact blobs, keys untouched for `ttl` seconds expire, and the least recently
+    used keys are evicted once the entry or byte budget is exceeded.
+    """
+
+    # Rough per-key overhead (StorageKey, entry tuple, dict slot) added to the blob and state sizes
+    ENTRY_OVERHEAD = 400
+
+    def __init__(self, ttl: float = 0, max_entries: int = 50_000, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            ttl: Seconds an untouched key lives (0 = until evicted)
+            max_entries: Max keys kept
+            max_bytes: Max approximate bytes kept
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self.expired = 0
+        # key -> (last access, state, data blob); least recently used first
+        self._entries: OrderedDict[StorageKey, tuple[float, Optional[str], Optional[bytes]]] = OrderedDict()
+
+    @classmethod
+    def _size(cls, state: Optional[str], blob: Optional[bytes]) -> int:
+        return cls.ENTRY_OVERHEAD + len(state or "") + len(blob or b"")
+
+    def _drop(self, key: StorageKey) -> None:
+        _, state, blob = self._entries.pop(key)
+        self.bytes -= self._size(state, blob)
+
+    def _sweep(self, now: float) -> None:
+        """Expire untouched keys (they are at the front) and evict over the budget."""
+        if self.ttl > 0:
+            while self._entries:
+                key, (touched, _, _) = next(iter(self._entries.items()))
+                if now - touched < self.ttl:
+                    break
+                self._drop(key)
+                self.expired += 1
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.evicted += 1
+
+    def _get(self, key: StorageKey) -> tuple[Optional[str], Optional[bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        now = time.monotonic()
+        touched, state, blob = entry
+        if self.ttl > 0 and now - touched >= self.ttl:
+            self._drop(key)
+            self.expired += 1
+            return None, None
+        self._entries[key] = (now, state, blob)
+        self._entries.move_to_end(key)
+        return state, blob
+
+    def _put(self, key: StorageKey, state: Optional[str], blob: Optional[bytes]) -> None:
+        if key in self._entries:
+            self._drop(key)
+        if state is not None or blob is not None:
+            now = time.monotonic()
+            self._entries[key] = (now, state, blob)
+            self.bytes += self._size(state, blob)
+            self._sweep(now)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, blob = self._get(key)
+        self._put(key, state.state if isinstance(state, State) else state, blob)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._get(key)[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        state, _ = self._get(key)
+        self._put(key, state, pack_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return unpack_data(self._get(key)[1])
+
+    def stats(self) -> dict:
+        """Entries and approximate bytes kept, and how many keys were evicted / expired so far."""
+        return {"entries": len(self._entries), "bytes": self.bytes, "evicted": self.evicted, "expired": self.expired}
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+
+class CachedStorage(BaseStorage):
+    """
+    FSM storage over a remote key-value backend, with compact data blobs, per-key TTL (FSM_TTL)
+    and an optional write-through read cache (FSM_CACHE_TTL, off by default), with which the state filter
+    and the handler of one update cost one round trip when a single bot process uses the storage.
+    Subclasses implement `_load` and `_save`.
+    """
+
+    def __init__(self, ttl: float = 0, cache_ttl: float = 0, cache_size: int = 10_000):
+        """
+        Args:
+            ttl: Seconds an untouched key lives (0 = forever)
+            cache_ttl: Seconds a read is reused by this process (0 = no cache). Only for a single bot
+                process: another process's change of the key stays invisible for that long
+            cache_size: Max keys kept in the read cache
+        """
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True,
+                                              with_destiny=True)
+
+    async def _load(self, key: str) -> tuple[Optional[str], Optional[bytes]]:
+        """Return (state, data blob) of the key; (None, None) if missing or expired."""
+        raise NotImplementedError
+
+    async def _save(self, key: str, part: str, value: str | bytes | None) -> None:
+        """Write one part ("state" or "data") of the key and refresh its TTL; None deletes it."""
+        raise NotImplementedError
+
+    def _remember(self, key: str, part: str, value: Any) -> None:
+        if self.cache_ttl > 0:
+            self._cache.set((key, part), value)
+
+    async def _get(self, key: str, part: str) -> Any:
+        value = self._cache.get((key, part), _MISSING) if self.cache_ttl > 0 else _MISSING
+        if value is _MISSING:
+            state, blob = await self._load(key)
+            self._remember(key, "state", state)
+            self._remember(key, "data", blob)
+            value = state if part == "state" else blob
+        return value
+
+    async def _set(self, key: str, part: str, value: str | bytes | None) -> None:
+        await self._save(key, part, value)
+        self._remember(key, part, value)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._set(self._key_builder.build(key), "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(self._key_builder.build(key), "state")
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._set(self._key_builder.build(key), "data", pack_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return unpack_data(await self._get(self._key_builder.build(key), "data"))
+
+    def cache_stats(self) -> dict:
+        return self._cache.stats()
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class SQLStorage(CachedStorage):
+    """FSM storage in the fsm_states table: one row per key, upserted column by column."""
+
+    def _expires_at(self) -> datetime | None:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl) if self.ttl > 0 else None
+
+    async def _load(self, key: str) -> tuple[Optional[str], Optional[bytes]]:
+        async with AsyncDatabase().session() as s:
+            row = (await s.execute(
+                select(FSMStates.state, FSMStates.data).where(
+                    FSMStates.key == key,
+                    or_(FSMStates.expires_at.is_(None), FSMStates.expires_at > datetime.now(timezone.utc)),
+                )
+            )).first()
+        return (row.state, row.data) if row else (None, None)
+
+    async def _save(self, key: str, part: str, value: str | bytes | None) -> None:
+        values = {part: value, "expires_at": self._expires_at()}
+        async with AsyncDatabase().session() as s:
+            await s.execute(
+                pg_insert(FSMStates).values(key=key, **values)
+                .on_conflict_do_update(index_elements=[FSMStates.key], set_=values)
+            )
+            if value is None:
+                await s.execute(
+                    delete(FSMStates).where(FSMStates.key == key, FSMStates.state.is_(None),
+                                            FSMStates.data.is_(None))
+                )
+
+
+class RedisStorage(CachedStorage):
+    """FSM storage in a Redis-protocol server: "<key>:state" and "<key>:data" strings with EXPIRE."""
+
+    def __init__(self, url: str, **kwargs: Any):
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError("FSM_STORAGE=redis needs the 'redis' package (pip install redis)") from e
+        super().__init__(**kwargs)
+        self.redis = Redis.from_url(url)
+
+    async def _load(self, key: str) -> tuple[Optional[str], Optional[bytes]]:
+        state, blob = await self.redis.mget(f"{key}:state", f"{key}:data")
+        return (state.decode() if state is not None else None), blob
+
+    async def _save(self, key: str, part: str, value: str | bytes | None) -> None:
+        other = f"{key}:{'data' if part == 'state' else 'state'}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if value is None:
+                pipe.delete(f"{key}:{part}")
+            else:
+                pipe.set(f"{key}:{part}", value, ex=int(self.ttl) or None)
+            if self.ttl > 0:
+                # Both parts of a key expire together
+                pipe.expire(other, int(self.ttl))
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await super().close()
+        await self.redis.aclose()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE (memory, sql, redis)."""
+    options = dict(ttl=EnvKeys.FSM_TTL, cache_ttl=EnvKeys.FSM_CACHE_TTL, cache_size=EnvKeys.FSM_CACHE_SIZE)
+    kind = (EnvKeys.FSM_STORAGE or "memory").lower()
+    if kind == "memory":
+        return BoundedMemoryStorage(
+            ttl=EnvKeys.FSM_TTL, max_entries=EnvKeys.FSM_MEMORY_MAX_ENTRIES, max_bytes=EnvKeys.FSM_MEMORY_MAX_BYTES
+        )
+    if kind == "sql":
+        return SQLStorage(**options)
+    if kind == "redis":
+        return RedisStorage(EnvKeys.FSM_REDIS_URL, **options)
+    raise ValueError(f"Unknown FSM_STORAGE: {EnvKeys.FSM_STORAGE!r} (expected memory, sql or redis)")
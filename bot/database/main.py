@@ -1,8 +1,11 @@
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 from sqlalchemy import create_engine, Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 
-from bot.database.dsn import dsn
+from bot.database.dsn import dsn, async_dsn
+from bot.database.pool import PoolStats, pool_options, instrument_engine
 from bot.misc import SingletonMeta
 
 
@@ -10,12 +13,14 @@ class Database(metaclass=SingletonMeta):
     BASE = declarative_base()
 
     def __init__(self):
+        self.__pool_stats = PoolStats("sync")
         self.__engine: Engine = create_engine(
             dsn(),
             echo=False,
-            pool_pre_ping=True,
             future=True,
+            **pool_options(QueuePool, self.__pool_stats),
         )
+        instrument_engine(self.__engine, self.__pool_stats)
         self.__SessionLocal = sessionmaker(bind=self.__engine, autoflush=False, autocommit=False, future=True,
                                            expire_on_commit=False)
 
@@ -35,3 +40,105 @@ class Database(metaclass=SingletonMeta):
     @property
     def engine(self) -> Engine:
         return self.__engine
+
+    @property
+    def pool_stats(self) -> PoolStats:
+        return self.__pool_stats
+
+
+class _ReadSession(AsyncSession):
+    """
+    Session that hands its connection back to the pool after every statement. It runs in AUTOCOMMIT,
+    so no transaction (and no pooled connection) is kept open across the Telegram calls of an update.
+    """
+
+    async def _release(self) -> None:
+        # No COMMIT is sent in AUTOCOMMIT; this only returns the connection
+        await self.commit()
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await super().execute(*args, **kwargs)
+        finally:
+            await self._release()
+
+    async def scalar(self, *args, **kwargs):
+        try:
+            return await super().scalar(*args, **kwargs)
+        finally:
+            await self._release()
+
+    async def get(self, *args, **kwargs):
+        try:
+            return await super().get(*args, **kwargs)
+        finally:
+            await self._release()
+
+
+class AsyncDatabase(metaclass=SingletonMeta):
+    """Async counterpart of Database: same models, non-blocking driver (asyncpg by default)."""
+
+    def __init__(self):
+        self.__pool_stats = PoolStats("async")
+        self.__engine: AsyncEngine = create_async_engine(
+            async_dsn(),
+            echo=False,
+            **pool_options(AsyncAdaptedQueuePool, self.__pool_stats),
+        )
+        instrument_engine(self.__engine.sync_engine, self.__pool_stats)
+        self.__SessionLocal = async_sessionmaker(bind=self.__engine, autoflush=False, expire_on_commit=False)
+        self.__ReadSessionLocal = async_sessionmaker(
+            bind=self.__engine.execution_options(isolation_level="AUTOCOMMIT"),
+            class_=_ReadSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    @asynccontextmanager
+    async def session(self, outer: AsyncSession | None = None):
+        """
+        Contextual async session: guaranteed to close/rollback on error.
+        If `outer` is given, it belongs to the caller's unit of work and is reused without commit/close.
+        """
+        if outer is not None:
+            yield outer
+            return
+
+        db = self.__SessionLocal()
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+    @asynccontextmanager
+    async def read_session(self):
+        """
+        Session for reads: every statement runs on its own in AUTOCOMMIT and the connection goes back to
+        the pool right after it. Read-only by convention, because the server does not enforce READ ONLY
+        outside a transaction; writes use session().
+        """
+        db = self.__ReadSessionLocal()
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+    async def dispose(self) -> None:
+        """Close all pooled connections (e.g. on shutdown or when the event loop changes)."""
+        await self.__engine.dispose()
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self.__engine
+
+    @property
+    def pool_stats(self) -> PoolStats:
+        return self.__pool_stats
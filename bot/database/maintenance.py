@@ -0,0 +1,97 @@
+"""
+Database maintenance commands.
+
+Usage:
+    python -m bot.database.maintenance backfill-rollups
+    python -m bot.database.maintenance reconcile-stock
+    python -m bot.database.maintenance purge-fsm
+    python -m bot.database.maintenance purge-rate-limits
+    python -m bot.database.maintenance purge-staging
+"""
+import argparse
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, delete
+
+from bot.database import Database
+from bot.database.models import DailySales, DailyTopups, DailyRegistrations, FSMStates, RateLimitCounters, \
+    StagedValues
+
+
+def backfill_rollups() -> None:
+    """Rebuild daily_sales / daily_topups / daily_registrations from the raw tables."""
+    from bot.database.methods.rollups import backfill_statements
+
+    with Database().session() as s:
+        for stmt in backfill_statements():
+            s.execute(stmt)
+        rows = {
+            model.__tablename__: s.scalar(select(func.count()).select_from(model))
+            for model in (DailySales, DailyTopups, DailyRegistrations)
+        }
+    print(f"Rollups rebuilt (rows): {rows}")
+
+
+def reconcile_stock() -> int:
+    """Recount goods.stock_count / is_infinite from item_values; return the number of fixed positions."""
+    from bot.database.methods.stock import reconcile_statements
+
+    with Database().session() as s:
+        fixed = 0
+        for stmt in reconcile_statements():
+            fixed = s.execute(stmt).rowcount
+    print(f"Stock counters reconciled: {fixed} position(s) fixed")
+    return fixed
+
+
+def purge_fsm() -> int:
+    """Delete expired conversation states (FSM_STORAGE=sql); return how many were removed."""
+    with Database().session() as s:
+        purged = s.execute(delete(FSMStates).where(FSMStates.expires_at <= datetime.now(timezone.utc))).rowcount
+    print(f"Expired FSM states purged: {purged}")
+    return purged
+
+
+def purge_rate_limits() -> int:
+    """Delete expired rate-limit counters and bans (RATE_LIMIT_BACKEND=sql); return how many were removed."""
+    with Database().session() as s:
+        purged = s.execute(
+            delete(RateLimitCounters).where(RateLimitCounters.expires_at <= datetime.now(timezone.utc))
+        ).rowcount
+    print(f"Expired rate-limit counters purged: {purged}")
+    return purged
+
+
+# Staged values older than this belong to value entries that were never finished or cancelled
+STAGING_MAX_AGE = timedelta(days=1)
+
+
+def purge_staging() -> int:
+    """Delete staged item values older than STAGING_MAX_AGE; return how many were removed."""
+    with Database().session() as s:
+        purged = s.execute(
+            delete(StagedValues).where(StagedValues.created_at <= datetime.now(timezone.utc) - STAGING_MAX_AGE)
+        ).rowcount
+    print(f"Abandoned staged values purged: {purged}")
+    return purged
+
+
+COMMANDS = {
+    "backfill-rollups": backfill_rollups,
+    "reconcile-stock": reconcile_stock,
+    "purge-fsm": purge_fsm,
+    "purge-rate-limits": purge_rate_limits,
+    "purge-staging": purge_staging,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bot.database.maintenance", description="Database maintenance")
+    parser.add_argument("command", choices=COMMANDS)
+    args = parser.parse_args(argv)
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
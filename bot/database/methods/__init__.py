@@ -4,3 +4,5 @@ from bot.database.methods.update import *
 from bot.database.methods.delete import *
 from bot.database.methods.lazy_queries import *
 from bot.database.methods.transactions import *
+from bot.database.methods.catalog import *
+from bot.database.methods.staging import *
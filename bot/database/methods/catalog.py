@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import wraps
+
+from sqlalchemy import select
+
+from bot.database import AsyncDatabase
+from bot.database.models import Goods
+from bot.i18n import localize
+from bot.misc import EnvKeys, TTLCache
+
+# Category pages, goods pages and item cards; every key starts with the catalog version it was read at.
+# Edits only invalidate this process, so other bot processes rely on the (short) CATALOG_CACHE_TTL;
+# a stale price cannot be charged because the buy button carries the version the card was read at.
+_catalog_cache = TTLCache(maxsize=EnvKeys.CATALOG_CACHE_SIZE, ttl=EnvKeys.CATALOG_CACHE_TTL)
+_catalog_version = 0
+
+
+def catalog_version() -> int:
+    return _catalog_version
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every cached catalog page and item card (call after categories/goods change)."""
+    global _catalog_version
+    _catalog_version += 1
+    _catalog_cache.clear()
+
+
+def invalidate_item_card(item_name: str) -> None:
+    """Forget one item card (stock changed; category and goods pages stay valid)."""
+    _catalog_cache.pop((_catalog_version, "card", item_name))
+
+
+def catalog_cache_stats() -> dict:
+    """Hit/miss counters of the catalog cache."""
+    return {**_catalog_cache.stats(), "version": _catalog_version}
+
+
+def catalog_cached(kind: str):
+    """Serve a catalog query from the process cache, keyed by the catalog version and the call arguments."""
+
+    def decorator(query):
+        @wraps(query)
+        async def wrapper(*args, **kwargs):
+            key = (_catalog_version, kind, args, tuple(sorted(kwargs.items())))
+            return await _catalog_cache.get_or_set(key, lambda: query(*args, **kwargs))
+
+        # Shared paginator pages of this query are keyed by the catalog version too
+        wrapper.cache_version = catalog_version
+        return wrapper
+
+    return decorator
+
+
+@dataclass(frozen=True)
+class ItemCard:
+    """Item position as shown to buyers, with its message text rendered once."""
+    name: str
+    category_name: str
+    description: str
+    price: Decimal
+    is_infinite: bool
+    stock_count: int
+    version: int  # goods.version the price was read at; buying checks it
+    text: str
+
+
+async def _load_item_card(item_name: str) -> ItemCard | None:
+    async with AsyncDatabase().read_session() as s:
+        row = (await s.execute(
+            select(
+                Goods.name, Goods.category_name, Goods.description, Goods.price,
+                Goods.is_infinite, Goods.stock_count, Goods.version,
+            ).where(Goods.name == item_name)
+        )).first()
+    if row is None:
+        return None
+
+    name, category_name, description, price, is_infinite, stock_count, version = row
+    quantity_line = (
+        localize("shop.item.quantity_unlimited")
+        if is_infinite
+        else localize("shop.item.quantity_left", count=stock_count)
+    )
+    text = "\n".join([
+        localize("shop.item.title", name=name),
+        localize("shop.item.description", description=description),
+        localize("shop.item.price", amount=price, currency=EnvKeys.PAY_CURRENCY),
+        quantity_line,
+    ])
+    return ItemCard(name, category_name, description, price, is_infinite, stock_count, version, text)
+
+
+async def get_item_card(item_name: str) -> ItemCard | None:
+    """Rendered item card (one query on a miss, none while the catalog is unchanged), or None."""
+    key = (_catalog_version, "card", item_name)
+    return await _catalog_cache.get_or_set(key, lambda: _load_item_card(item_name))
@@ -1,26 +1,46 @@
 from datetime import datetime
 from decimal import Decimal
+from typing import AsyncIterable, Awaitable, Callable, Iterable
 
-from sqlalchemy import exists
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 
-from bot.database.models import User, ItemValues, Goods, Categories, Operations, Payments, ReferralEarnings
-from bot.database import Database
-
-
-def create_user(telegram_id: int, registration_date: datetime, referral_id: int | str, role: int = 1) -> None:
-    """Create user if missing; commit."""
-    with Database().session() as s:
-        if s.query(exists().where(User.telegram_id == telegram_id)).scalar():
+from bot.database.models import (
+    User, ItemValues, Goods, Categories, Operations, Payments, ReferralEarnings, CartItems
+)
+from bot.database import Database, AsyncDatabase
+from bot.database.methods.rollups import registrations_rollup, topups_rollup
+from bot.database.methods.lazy_queries import (
+    query_all_users, query_user_referrals, query_categories, query_items_in_category, query_items_in_position
+)
+from bot.database.methods.read import invalidate_role_cache
+from bot.database.methods.catalog import bump_catalog_version, invalidate_item_card
+from bot.database.methods.stock import stock_added
+from bot.misc import invalidate_counts
+
+
+async def create_user(telegram_id: int, registration_date: datetime, referral_id: int | str | None,
+                      role: int = 1) -> None:
+    """Create user if missing and count the registration in daily_registrations; commit."""
+    referral_id = int(referral_id) if str(referral_id or "").isdigit() else None
+    async with AsyncDatabase().session() as s:
+        if await s.scalar(select(exists().where(User.telegram_id == telegram_id))):
             return
         s.add(
             User(
                 telegram_id=telegram_id,
                 role_id=role,
                 registration_date=registration_date,
-                referral_id=None if referral_id in ("", None) else referral_id,
+                referral_id=referral_id,
             )
         )
+        await s.execute(registrations_rollup(registration_date, telegram_id))
+
+    invalidate_role_cache(telegram_id)
+    invalidate_counts(query_all_users)
+    if referral_id:
+        invalidate_counts(query_user_referrals, referral_id)
 
 
 def create_item(item_name: str, item_description: str, item_price: int, category_name: str) -> None:
@@ -36,6 +56,8 @@ def create_item(item_name: str, item_description: str, item_price: int, category
                 category_name=category_name,
             )
         )
+    bump_catalog_version()
+    invalidate_counts(query_items_in_category, category_name)
 
 
 def add_values_to_item(item_name: str, value: str, is_infinity: bool) -> bool:
@@ -55,9 +77,106 @@ def add_values_to_item(item_name: str, value: str, is_infinity: bool) -> bool:
 
         try:
             s.add(ItemValues(name=item_name, value=value_norm, is_infinity=bool(is_infinity)))
-            return True
+            s.flush()
         except IntegrityError:
+            s.rollback()
             return False
+        s.execute(stock_added(item_name, infinite=bool(is_infinity)))
+
+    invalidate_item_card(item_name)
+    invalidate_counts(query_items_in_position, item_name)
+    return True
+
+
+BULK_VALUES_CHUNK = 1000
+
+
+def _new_values_result() -> dict[str, int]:
+    return {"added": 0, "skipped_db_dup": 0, "skipped_batch_dup": 0, "skipped_invalid": 0}
+
+
+def _dedupe_values(values: Iterable[str], result: dict[str, int]) -> list[str]:
+    """Strip values and drop blanks and repeats (counted into `result`), keeping the input order."""
+    unique: dict[str, None] = {}
+    for value in values:
+        value_norm = (value or "").strip()
+        if not value_norm:
+            result["skipped_invalid"] += 1
+        elif value_norm in unique:
+            result["skipped_batch_dup"] += 1
+        else:
+            unique[value_norm] = None
+    return list(unique)
+
+
+def _insert_values(item_name: str, values: list[str], is_infinity: bool):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING id: one row comes back per value actually added."""
+    return (
+        pg_insert(ItemValues)
+        .values([{"item_name": item_name, "value": v, "is_infinity": bool(is_infinity)} for v in values])
+        .on_conflict_do_nothing(constraint="uq_item_value_per_item")
+        .returning(ItemValues.id)
+    )
+
+
+async def import_values(item_name: str, values: AsyncIterable[str], is_infinity: bool = False,
+                        on_progress: Callable[[dict[str, int]], Awaitable[None]] | None = None) -> dict[str, int]:
+    """
+    Add the values of an upload of any size: `values` is consumed in batches of
+    BULK_VALUES_CHUNK, each inserted and committed on its own, so memory use does not grow with the input.
+    Repeats are only detected within a batch; across batches they are counted as DB duplicates.
+    `on_progress` gets the running counts after every batch.
+    """
+    result = _new_values_result()
+
+    async def flush(batch: list[str]) -> None:
+        unique = _dedupe_values(batch, result)
+        added = 0
+        if unique:
+            try:
+                async with AsyncDatabase().session() as s:
+                    added = len((await s.execute(_insert_values(item_name, unique, is_infinity))).all())
+                    if added:
+                        await s.execute(stock_added(item_name, added, infinite=bool(is_infinity)))
+            except IntegrityError:
+                added = 0
+        result["added"] += added
+        result["skipped_db_dup"] += len(unique) - added
+        if on_progress:
+            await on_progress(result)
+
+    batch: list[str] = []
+    async for value in values:
+        batch.append(value)
+        if len(batch) >= BULK_VALUES_CHUNK:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    if result["added"]:
+        invalidate_item_card(item_name)
+        invalidate_counts(query_items_in_position, item_name)
+    return result
+
+
+async def bulk_add_values(item_name: str, values: Iterable[str], is_infinity: bool = False) -> dict[str, int]:
+    """
+    Add many item values: blanks and repeats are dropped in memory, the rest goes through import_values
+    (chunks of BULK_VALUES_CHUNK, each committed with the stock counter).
+    Returns counts: added, skipped_db_dup, skipped_batch_dup, skipped_invalid.
+    """
+    result = _new_values_result()
+    unique = _dedupe_values(values, result)
+
+    async def iter_unique():
+        for value in unique:
+            yield value
+
+    imported = await import_values(item_name, iter_unique(), is_infinity)
+    result["added"] = imported["added"]
+    result["skipped_db_dup"] = imported["skipped_db_dup"]
+    return result
 
 
 def create_category(category_name: str) -> None:
@@ -66,12 +185,15 @@ def create_category(category_name: str) -> None:
         if s.query(exists().where(Categories.name == category_name)).scalar():
             return
         s.add(Categories(name=category_name))
+    bump_catalog_version()
+    invalidate_counts(query_categories)
 
 
 def create_operation(user_id: int, value: int, operation_time: datetime) -> None:
-    """Record completed balance operation; commit."""
+    """Record completed balance operation (and its daily_topups rollup); commit."""
     with Database().session() as s:
         s.add(Operations(user_id, value, operation_time))
+        s.execute(topups_rollup(operation_time, user_id, Decimal(value)))
 
 
 def create_pending_payment(provider: str, external_id: str, user_id: int, amount: int, currency: str) -> None:
@@ -98,3 +220,17 @@ def create_referral_earning(referrer_id: int, referral_id: int, amount: int, ori
                 original_amount=Decimal(original_amount)
             )
         )
+
+
+async def add_to_cart(telegram_id: int, item_name: str, quantity: int = 1) -> int:
+    """Add units of a position to the user's cart (one UPSERT); return the line's new quantity, 0 if no such item."""
+    stmt = pg_insert(CartItems).values(user_id=telegram_id, item_name=item_name, quantity=quantity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CartItems.user_id, CartItems.item_name],
+        set_={"quantity": CartItems.quantity + stmt.excluded.quantity},
+    ).returning(CartItems.quantity)
+    try:
+        async with AsyncDatabase().session() as s:
+            return await s.scalar(stmt)
+    except IntegrityError:
+        return 0
@@ -1,25 +1,62 @@
-from bot.database.models import Database, Goods, ItemValues, Categories
+from sqlalchemy import delete
+
+from bot.database import AsyncDatabase
+from bot.database.models import Database, Goods, ItemValues, Categories, CartItems
+from bot.database.methods.lazy_queries import query_categories, query_items_in_category, query_items_in_position
+from bot.database.methods.catalog import bump_catalog_version, invalidate_item_card
+from bot.database.methods.stock import stock_removed, stock_cleared
+from bot.misc import invalidate_counts
 
 
 def delete_item(item_name: str) -> None:
     """Delete a product and all of its stock entries."""
     with Database().session() as s:
         s.query(Goods).filter(Goods.name == item_name).delete(synchronize_session=False)
+    bump_catalog_version()
+    invalidate_counts(query_items_in_category)
+    invalidate_counts(query_items_in_position, item_name)
 
 
 def delete_only_items(item_name: str) -> None:
     """Delete all stock entries (ItemValues) for a product, keep Goods row."""
     with Database().session() as s:
         s.query(ItemValues).filter(ItemValues.item_name == item_name).delete(synchronize_session=False)
+        s.execute(stock_cleared(item_name))
+    invalidate_item_card(item_name)
+    invalidate_counts(query_items_in_position, item_name)
 
 
 def delete_item_from_position(item_id: int) -> None:
     """Delete a single stock row by its ItemValues id."""
     with Database().session() as s:
-        s.query(ItemValues).filter(ItemValues.id == item_id).delete(synchronize_session=False)
+        row = s.query(ItemValues.item_name, ItemValues.is_infinity).filter(ItemValues.id == item_id).first()
+        if row is None:
+            return
+        item_name, is_infinity = row
+        if s.query(ItemValues).filter(ItemValues.id == item_id).delete(synchronize_session=False):
+            s.execute(stock_removed(item_name, infinite=is_infinity))
+    if item_name:
+        invalidate_item_card(item_name)
+        invalidate_counts(query_items_in_position, item_name)
 
 
 def delete_category(category_name: str) -> None:
     """Delete a category and all products/stock inside it."""
     with Database().session() as s:
         s.query(Categories).filter(Categories.name == category_name).delete(synchronize_session=False)
+    bump_catalog_version()
+    invalidate_counts(query_categories)
+    invalidate_counts(query_items_in_category, category_name)
+    invalidate_counts(query_items_in_position)
+
+
+async def remove_from_cart(telegram_id: int, item_name: str) -> None:
+    """Delete one line of the user's cart."""
+    async with AsyncDatabase().session() as s:
+        await s.execute(delete(CartItems).where(CartItems.user_id == telegram_id, CartItems.item_name == item_name))
+
+
+async def clear_cart(telegram_id: int) -> None:
+    """Delete every line of the user's cart."""
+    async with AsyncDatabase().session() as s:
+        await s.execute(delete(CartItems).where(CartItems.user_id == telegram_id))
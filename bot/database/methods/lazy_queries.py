@@ -1,156 +1,206 @@
-from typing import Any
-from sqlalchemy import func, desc
-from bot.database import Database
+from typing import Any, Callable, Optional
+from sqlalchemy import func, desc, select, tuple_, text
+from bot.database import AsyncDatabase
+from bot.database.methods.catalog import catalog_cached
 from bot.database.models import (
     Categories, Goods, User, BoughtGoods, ItemValues,
     ReferralEarnings, Role
 )
 
 
-async def query_categories(offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
+def keyset(cursor_key: Callable[[Any], Any]):
+    """
+    Mark a query function as supporting keyset pagination: it accepts `after=<sort key of the last row seen>`
+    and `cursor_key(row)` returns that sort key. LazyPaginator uses it instead of OFFSET when it can.
+    """
+
+    def decorator(func):
+        func.cursor_key = cursor_key
+        return func
+
+    return decorator
+
+
+# Below this many rows an exact COUNT(*) is cheap enough, and the planner estimate is too coarse to show
+APPROXIMATE_COUNT_MIN = 100_000
+
+
+async def estimate_count(model) -> Optional[int]:
+    """
+    Planner estimate of a table's row count (pg_class.reltuples, refreshed by autovacuum/ANALYZE).
+    Returns None when the table is small or has never been analyzed, so the caller counts exactly.
+    """
+    async with AsyncDatabase().session() as s:
+        estimate = await s.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": model.__tablename__},
+        )
+    if estimate is None or estimate < APPROXIMATE_COUNT_MIN:
+        return None
+    return int(estimate)
+
+
+def _page(query, offset: int, limit: int, after: Any, key, descending: bool = False):
+    """Continue after the `after` sort key (column or tuple of columns) when given, use OFFSET otherwise"""
+    if after is None:
+        return query.offset(offset).limit(limit)
+    if isinstance(key, tuple):
+        key, after = tuple_(*key), tuple_(*after)
+    return query.where(key < after if descending else key > after).limit(limit)
+
+
+@keyset(lambda name: name)
+@catalog_cached("categories")
+async def query_categories(offset: int = 0, limit: int = 10, count_only: bool = False, after: Any = None) -> Any:
     """Query categories with pagination"""
-    with Database().session() as s:
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return s.query(func.count(Categories.name)).scalar() or 0
+            return await s.scalar(select(func.count(Categories.name))) or 0
 
-        return [row[0] for row in s.query(Categories.name)
-        .order_by(Categories.name.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()]
+        return list((await s.scalars(_page(
+            select(Categories.name).order_by(Categories.name.asc()),
+            offset, limit, after, Categories.name
+        ))).all())
 
 
+@keyset(lambda name: name)
+@catalog_cached("goods")
 async def query_items_in_category(category_name: str, offset: int = 0, limit: int = 10,
-                                  count_only: bool = False) -> Any:
+                                  count_only: bool = False, after: Any = None) -> Any:
     """Query items in category with pagination"""
-    with Database().session() as s:
-        query = s.query(Goods.name).filter(Goods.category_name == category_name)
-
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return query.count()
+            return await s.scalar(
+                select(func.count(Goods.name)).where(Goods.category_name == category_name)
+            ) or 0
 
-        return [row[0] for row in query
-        .order_by(Goods.name.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()]
+        return list((await s.scalars(_page(
+            select(Goods.name).where(Goods.category_name == category_name).order_by(Goods.name.asc()),
+            offset, limit, after, Goods.name
+        ))).all())
 
 
-async def query_user_bought_items(user_id: int, offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
+@keyset(lambda item: (item.bought_datetime, item.id))
+async def query_user_bought_items(user_id: int, offset: int = 0, limit: int = 10, count_only: bool = False,
+                                  after: Any = None) -> Any:
     """Query user's bought items with pagination"""
-    with Database().session() as s:
-        query = s.query(BoughtGoods).filter(BoughtGoods.buyer_id == user_id)
-
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return query.count()
+            return await s.scalar(
+                select(func.count(BoughtGoods.id)).where(BoughtGoods.buyer_id == user_id)
+            ) or 0
 
-        return query.order_by(desc(BoughtGoods.bought_datetime)) \
-            .offset(offset) \
-            .limit(limit) \
-            .all()
+        return list((await s.scalars(_page(
+            select(BoughtGoods)
+            .where(BoughtGoods.buyer_id == user_id)
+            .order_by(desc(BoughtGoods.bought_datetime), desc(BoughtGoods.id)),
+            offset, limit, after, (BoughtGoods.bought_datetime, BoughtGoods.id), descending=True
+        ))).all())
 
 
-async def query_all_users(offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
+@keyset(lambda telegram_id: telegram_id)
+async def query_all_users(offset: int = 0, limit: int = 10, count_only: bool = False, after: Any = None) -> Any:
     """Query all users with pagination"""
-    with Database().session() as s:
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return s.query(func.count(User.telegram_id)).scalar() or 0
+            return await s.scalar(select(func.count(User.telegram_id))) or 0
 
-        return [row[0] for row in s.query(User.telegram_id)
-        .order_by(User.telegram_id.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()]
+        return list((await s.scalars(_page(
+            select(User.telegram_id).order_by(User.telegram_id.asc()),
+            offset, limit, after, User.telegram_id
+        ))).all())
 
 
-async def query_admins(offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
+@keyset(lambda telegram_id: telegram_id)
+async def query_admins(offset: int = 0, limit: int = 10, count_only: bool = False, after: Any = None) -> Any:
     """Query admin users with pagination"""
-    with Database().session() as s:
-        query = s.query(User.telegram_id).join(Role).filter(Role.name == 'ADMIN')
+    async with AsyncDatabase().session() as s:
+        query = select(User.telegram_id).join(Role, Role.id == User.role_id).where(Role.name == 'ADMIN')
 
         if count_only:
-            return query.count()
+            return await s.scalar(select(func.count()).select_from(query.subquery())) or 0
 
-        return [row[0] for row in query
-        .order_by(User.telegram_id.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()]
+        return list((await s.scalars(_page(
+            query.order_by(User.telegram_id.asc()),
+            offset, limit, after, User.telegram_id
+        ))).all())
 
 
-async def query_items_in_position(item_name: str, offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
+@keyset(lambda item_id: item_id)
+async def query_items_in_position(item_name: str, offset: int = 0, limit: int = 10, count_only: bool = False,
+                                  after: Any = None) -> Any:
     """Query items in position with pagination"""
-    with Database().session() as s:
-        query = s.query(ItemValues.id).filter(ItemValues.item_name == item_name)
-
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return query.count()
+            return await s.scalar(
+                select(func.count(ItemValues.id)).where(ItemValues.item_name == item_name)
+            ) or 0
 
-        return [row[0] for row in query
-        .order_by(ItemValues.id.asc())
-        .offset(offset)
-        .limit(limit)
-        .all()]
+        return list((await s.scalars(_page(
+            select(ItemValues.id).where(ItemValues.item_name == item_name).order_by(ItemValues.id.asc()),
+            offset, limit, after, ItemValues.id
+        ))).all())
 
 
 async def query_user_referrals(user_id: int, offset: int = 0, limit: int = 10, count_only: bool = False) -> Any:
-    """Query user's referrals with earnings info"""
-    with Database().session() as s:
+    """Query user's referrals with earnings info (ordered by total earned across all referrals)"""
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return s.query(func.count(User.telegram_id)).filter(User.referral_id == user_id).scalar() or 0
-
-        referrals = s.query(User).filter(User.referral_id == user_id) \
-            .offset(offset) \
-            .limit(limit) \
-            .all()
-
-        result = []
-        for ref in referrals:
-            # Get total earned from this referral
-            total_earned = s.query(func.sum(ReferralEarnings.amount)).filter(
-                ReferralEarnings.referrer_id == user_id,
-                ReferralEarnings.referral_id == ref.telegram_id
-            ).scalar() or 0
-
-            result.append({
-                'telegram_id': ref.telegram_id,
-                'registration_date': ref.registration_date,
-                'total_earned': total_earned
-            })
-
-        return sorted(result, key=lambda x: x['total_earned'], reverse=True)
-
-
+            return await s.scalar(
+                select(func.count(User.telegram_id)).where(User.referral_id == user_id)
+            ) or 0
+
+        total_earned = func.coalesce(func.sum(ReferralEarnings.amount), 0).label('total_earned')
+        rows = (await s.execute(
+            select(User.telegram_id, User.registration_date, total_earned)
+            .outerjoin(
+                ReferralEarnings,
+                (ReferralEarnings.referral_id == User.telegram_id) & (ReferralEarnings.referrer_id == user_id)
+            )
+            .where(User.referral_id == user_id)
+            .group_by(User.telegram_id)
+            .order_by(desc(total_earned), User.telegram_id.asc())
+            .offset(offset)
+            .limit(limit)
+        )).all()
+
+        return [dict(row._mapping) for row in rows]
+
+
+@keyset(lambda earning: (earning.created_at, earning.id))
 async def query_referral_earnings_from_user(referrer_id: int, referral_id: int, offset: int = 0, limit: int = 10,
-                                            count_only: bool = False) -> Any:
+                                            count_only: bool = False, after: Any = None) -> Any:
     """Query earnings from specific referral"""
-    with Database().session() as s:
-        query = s.query(ReferralEarnings).filter(
+    async with AsyncDatabase().session() as s:
+        conditions = (
             ReferralEarnings.referrer_id == referrer_id,
             ReferralEarnings.referral_id == referral_id
         )
 
         if count_only:
-            return query.count()
+            return await s.scalar(select(func.count(ReferralEarnings.id)).where(*conditions)) or 0
 
-        return query.order_by(desc(ReferralEarnings.created_at)) \
-            .offset(offset) \
-            .limit(limit) \
-            .all()
+        return list((await s.scalars(_page(
+            select(ReferralEarnings)
+            .where(*conditions)
+            .order_by(desc(ReferralEarnings.created_at), desc(ReferralEarnings.id)),
+            offset, limit, after, (ReferralEarnings.created_at, ReferralEarnings.id), descending=True
+        ))).all())
 
 
+@keyset(lambda earning: (earning.created_at, earning.id))
 async def query_all_referral_earnings(referrer_id: int, offset: int = 0, limit: int = 10,
-                                      count_only: bool = False) -> Any:
+                                      count_only: bool = False, after: Any = None) -> Any:
     """Query all referral earnings for user"""
-    with Database().session() as s:
-        query = s.query(ReferralEarnings).filter(
-            ReferralEarnings.referrer_id == referrer_id
-        )
-
+    async with AsyncDatabase().session() as s:
         if count_only:
-            return query.count()
-
-        return query.order_by(desc(ReferralEarnings.created_at)) \
-            .offset(offset) \
-            .limit(limit) \
-            .all()
+            return await s.scalar(
+                select(func.count(ReferralEarnings.id)).where(ReferralEarnings.referrer_id == referrer_id)
+            ) or 0
+
+        return list((await s.scalars(_page(
+            select(ReferralEarnings)
+            .where(ReferralEarnings.referrer_id == referrer_id)
+            .order_by(desc(ReferralEarnings.created_at), desc(ReferralEarnings.id)),
+            offset, limit, after, (ReferralEarnings.created_at, ReferralEarnings.id), descending=True
+        ))).all())
@@ -1,11 +1,15 @@
 import datetime
+from dataclasses import dataclass
 from decimal import Decimal
 from typing import Optional, List, Dict
 
-from sqlalchemy import func, exists, desc
+from sqlalchemy import func, desc, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.models import Database, User, ItemValues, Goods, Categories, Role, BoughtGoods, \
-    Operations, ReferralEarnings
+    Operations, ReferralEarnings, DailySales, DailyTopups, DailyRegistrations, CartItems
+from bot.database import AsyncDatabase
+from bot.misc import EnvKeys, TTLCache
 
 
 def _day_window(date_str: str) -> tuple[datetime.datetime, datetime.datetime]:
@@ -15,20 +19,50 @@ def _day_window(date_str: str) -> tuple[datetime.datetime, datetime.datetime]:
     return start, end
 
 
-def check_user(telegram_id: int | str) -> Optional[User]:
+async def check_user(telegram_id: int | str, session: AsyncSession | None = None) -> Optional[User]:
     """Return user by Telegram ID or None if not found."""
-    with Database().session() as s:
-        return s.query(User).filter(User.telegram_id == telegram_id).one_or_none()
+    async with AsyncDatabase().session(session) as s:
+        return await s.scalar(select(User).where(User.telegram_id == int(telegram_id)))
 
 
-def check_role(telegram_id: int) -> int:
-    """Return permission bitmask for user (0 if none)."""
-    with Database().session() as s:
-        role_id = s.query(User.role_id).filter(User.telegram_id == telegram_id).scalar()
-        if not role_id:
-            return 0
-        perms = s.query(Role.permissions).filter(Role.id == role_id).scalar()
-        return perms or 0
+# telegram_id -> role_id (0 = not registered); the roles table itself is tiny and fully memoized
+_role_cache = TTLCache(maxsize=EnvKeys.ROLE_CACHE_SIZE, ttl=EnvKeys.ROLE_CACHE_TTL)
+_roles: dict[int, tuple[str, int]] = {}
+
+
+async def _load_roles(s: AsyncSession) -> dict[int, tuple[str, int]]:
+    if not _roles:
+        rows = (await s.execute(select(Role.id, Role.name, Role.permissions))).all()
+        _roles.update({role_id: (name, permissions or 0) for role_id, name, permissions in rows})
+    return _roles
+
+
+def invalidate_role_cache(telegram_id: int | None = None) -> None:
+    """Forget the cached role of one user, or of everybody and the roles table (telegram_id=None)."""
+    if telegram_id is None:
+        _role_cache.clear()
+        _roles.clear()
+    else:
+        _role_cache.pop(int(telegram_id))
+
+
+def role_cache_stats() -> dict:
+    """Hit/miss counters of the per-user role cache."""
+    return {**_role_cache.stats(), "roles": len(_roles)}
+
+
+async def check_role(telegram_id: int, session: AsyncSession | None = None) -> int:
+    """Return permission bitmask for user (0 if none). Cached for ROLE_CACHE_TTL seconds."""
+    telegram_id = int(telegram_id)
+    role_id = _role_cache.get(telegram_id)
+    if role_id is None or not _roles:
+        async with AsyncDatabase().session(session) as s:
+            if role_id is None:
+                role_id = await s.scalar(select(User.role_id).where(User.telegram_id == telegram_id)) or 0
+                _role_cache.set(telegram_id, role_id)
+            await _load_roles(s)
+    role = _roles.get(role_id)
+    return role[1] if role else 0
 
 
 def get_role_id_by_name(role_name: str) -> Optional[int]:
@@ -37,10 +71,13 @@ def get_role_id_by_name(role_name: str) -> Optional[int]:
         return s.query(Role.id).filter(Role.name == role_name).scalar()
 
 
-def check_role_name_by_id(role_id: int) -> str:
+async def check_role_name_by_id(role_id: int, session: AsyncSession | None = None) -> str:
     """Return role name by id (raises if not found)."""
-    with Database().session() as s:
-        return s.query(Role.name).filter(Role.id == role_id).one()[0]
+    role = _roles.get(role_id)
+    if role:
+        return role[0]
+    async with AsyncDatabase().session(session) as s:
+        return (await s.execute(select(Role.name).where(Role.id == role_id))).scalar_one()
 
 
 def select_max_role_id() -> Optional[int]:
@@ -113,26 +150,23 @@ def check_category(category_name: str) -> dict | None:
 
 
 def select_item_values_amount(item_name: str) -> int:
-    """Return count of item_values for an item."""
+    """Return count of item_values for an item (denormalized goods.stock_count)."""
     with Database().session() as s:
-        return s.query(func.count()).filter(ItemValues.item_name == item_name).scalar() or 0
+        return s.query(Goods.stock_count).filter(Goods.name == item_name).scalar() or 0
 
 
 def check_value(item_name: str) -> bool:
-    """Return True if item has any infinite value (is_infinity=True)."""
+    """Return True if item has any infinite value (denormalized goods.is_infinite)."""
     with Database().session() as s:
-        return s.query(
-            exists().where(
-                ItemValues.item_name == item_name,
-                ItemValues.is_infinity.is_(True),
-            )
-        ).scalar()
+        return bool(s.query(Goods.is_infinite).filter(Goods.name == item_name).scalar())
 
 
-def select_user_items(buyer_id: int | str) -> int:
+async def select_user_items(buyer_id: int | str, session: AsyncSession | None = None) -> int:
     """Return count of bought items for user."""
-    with Database().session() as s:
-        return s.query(func.count()).filter(BoughtGoods.buyer_id == buyer_id).scalar() or 0
+    async with AsyncDatabase().session(session) as s:
+        return await s.scalar(
+            select(func.count(BoughtGoods.id)).where(BoughtGoods.buyer_id == int(buyer_id))
+        ) or 0
 
 
 def select_bought_item(unique_id: int) -> dict | None:
@@ -143,9 +177,9 @@ def select_bought_item(unique_id: int) -> dict | None:
 
 
 def select_count_items() -> int:
-    """Return total count of item_values."""
+    """Return total count of item_values (sum of goods.stock_count)."""
     with Database().session() as s:
-        return s.query(ItemValues).count()
+        return s.query(func.coalesce(func.sum(Goods.stock_count), 0)).scalar()
 
 
 def select_count_goods() -> int:
@@ -214,16 +248,20 @@ def select_users_balance():
         return s.query(func.sum(User.balance)).scalar()
 
 
-def select_user_operations(user_id: int | str) -> list[float]:
+async def select_user_operations(user_id: int | str, session: AsyncSession | None = None) -> list[float]:
     """Return list of operation amounts for user."""
-    with Database().session() as s:
-        return [row[0] for row in s.query(Operations.operation_value).filter(Operations.user_id == user_id).all()]
+    async with AsyncDatabase().session(session) as s:
+        return list((await s.scalars(
+            select(Operations.operation_value).where(Operations.user_id == int(user_id))
+        )).all())
 
 
-def check_user_referrals(user_id: int) -> int:
+async def check_user_referrals(user_id: int, session: AsyncSession | None = None) -> int:
     """Return count of referrals of the user."""
-    with Database().session() as s:
-        return s.query(User).filter(User.referral_id == user_id).count()
+    async with AsyncDatabase().session(session) as s:
+        return await s.scalar(
+            select(func.count(User.telegram_id)).where(User.referral_id == int(user_id))
+        ) or 0
 
 
 def get_user_referral(user_id: int) -> Optional[int]:
@@ -233,19 +271,21 @@ def get_user_referral(user_id: int) -> Optional[int]:
         return result[0] if result else None
 
 
-def get_referral_earnings_stats(referrer_id: int) -> Dict:
+async def get_referral_earnings_stats(referrer_id: int, session: AsyncSession | None = None) -> Dict:
     """
     Get statistics on user referral charges.
     """
-    with Database().session() as s:
-        stats = s.query(
-            func.count(ReferralEarnings.id).label('total_earnings_count'),
-            func.sum(ReferralEarnings.amount).label('total_amount'),
-            func.sum(ReferralEarnings.original_amount).label('total_original_amount'),
-            func.count(func.distinct(ReferralEarnings.referral_id)).label('active_referrals_count')
-        ).filter(
-            ReferralEarnings.referrer_id == referrer_id
-        ).first()
+    async with AsyncDatabase().session(session) as s:
+        stats = (await s.execute(
+            select(
+                func.count(ReferralEarnings.id).label('total_earnings_count'),
+                func.sum(ReferralEarnings.amount).label('total_amount'),
+                func.sum(ReferralEarnings.original_amount).label('total_original_amount'),
+                func.count(func.distinct(ReferralEarnings.referral_id)).label('active_referrals_count')
+            ).where(
+                ReferralEarnings.referrer_id == int(referrer_id)
+            )
+        )).first()
 
         return {
             'total_earnings_count': stats.total_earnings_count or 0,
@@ -262,3 +302,150 @@ def get_one_referral_earning(earning_id: int) -> dict | None:
     with Database().session() as s:
         result = s.query(ReferralEarnings).filter(ReferralEarnings.id == earning_id).first()
         return result.__dict__ if result else None
+
+
+@dataclass
+class UserSummary:
+    """Everything the profile / admin user card shows, loaded in one round trip"""
+    telegram_id: int
+    balance: Decimal
+    role_id: int
+    role_name: str
+    referral_id: Optional[int]
+    registration_date: datetime.datetime
+    total_topups: Decimal
+    purchases_count: int
+    referrals_count: int
+    earnings_count: int
+    earnings_amount: Decimal
+    earnings_original_amount: Decimal
+    active_referrals_count: int
+
+
+async def get_user_summary(telegram_id: int | str, session: AsyncSession | None = None) -> Optional[UserSummary]:
+    """
+    Return the user's profile summary (or None if the user does not exist).
+    Every counter is aggregated in its own CTE and joined to the user row, so it is a single query.
+    """
+    telegram_id = int(telegram_id)
+    topups = (
+        select(func.coalesce(func.sum(Operations.operation_value), 0).label("total"))
+        .where(Operations.user_id == telegram_id)
+        .cte("topups")
+    )
+    purchases = (
+        select(func.count(BoughtGoods.id).label("cnt"))
+        .where(BoughtGoods.buyer_id == telegram_id)
+        .cte("purchases")
+    )
+    referrals = (
+        select(func.count(User.telegram_id).label("cnt"))
+        .where(User.referral_id == telegram_id)
+        .cte("referrals")
+    )
+    earnings = (
+        select(
+            func.count(ReferralEarnings.id).label("cnt"),
+            func.coalesce(func.sum(ReferralEarnings.amount), 0).label("amount"),
+            func.coalesce(func.sum(ReferralEarnings.original_amount), 0).label("original_amount"),
+            func.count(func.distinct(ReferralEarnings.referral_id)).label("active_referrals"),
+        )
+        .where(ReferralEarnings.referrer_id == telegram_id)
+        .cte("earnings")
+    )
+
+    stmt = (
+        select(
+            User.telegram_id, User.balance, User.role_id, Role.name, User.referral_id, User.registration_date,
+            topups.c.total, purchases.c.cnt, referrals.c.cnt, earnings.c.cnt, earnings.c.amount,
+            earnings.c.original_amount, earnings.c.active_referrals,
+        )
+        .join(Role, Role.id == User.role_id)
+        .join(topups, true())
+        .join(purchases, true())
+        .join(referrals, true())
+        .join(earnings, true())
+        .where(User.telegram_id == telegram_id)
+    )
+
+    async with AsyncDatabase().session(session) as s:
+        row = (await s.execute(stmt)).first()
+        return UserSummary(*row) if row else None
+
+
+@dataclass
+class ShopStats:
+    """Admin statistics panel snapshot (field names match the admin.shop.stats.template placeholders)"""
+    today_users: int
+    admins: int
+    users: int
+    today_orders: Decimal
+    all_orders: Decimal
+    today_topups: Decimal
+    system_balance: Decimal
+    all_topups: Decimal
+    items: int
+    goods: int
+    categories: int
+    sold_count: int
+
+
+_shop_stats_cache = TTLCache(maxsize=4, ttl=EnvKeys.STATS_CACHE_TTL)
+
+
+async def _load_shop_stats(date: str, session: AsyncSession | None = None) -> ShopStats:
+    day = datetime.date.fromisoformat(date)
+    registrations = select(
+        func.coalesce(func.sum(DailyRegistrations.users_count).filter(DailyRegistrations.day == day), 0)
+        .label("today_users"),
+        func.coalesce(func.sum(DailyRegistrations.users_count), 0).label("users"),
+    ).cte("registrations_agg")
+    users = select(
+        func.count().filter(User.role_id > 1).label("admins"),
+        func.coalesce(func.sum(User.balance), 0).label("system_balance"),
+    ).cte("users_agg")
+    sales = select(
+        func.coalesce(func.sum(DailySales.revenue).filter(DailySales.day == day), 0).label("today_orders"),
+        func.coalesce(func.sum(DailySales.revenue), 0).label("all_orders"),
+        func.coalesce(func.sum(DailySales.orders_count), 0).label("sold_count"),
+    ).cte("sales_agg")
+    topups = select(
+        func.coalesce(func.sum(DailyTopups.amount).filter(DailyTopups.day == day), 0).label("today_topups"),
+        func.coalesce(func.sum(DailyTopups.amount), 0).label("all_topups"),
+    ).cte("topups_agg")
+    goods = select(
+        func.count().label("goods"),
+        func.coalesce(func.sum(Goods.stock_count), 0).label("items"),
+    ).cte("goods_agg")
+    categories = select(func.count().label("categories")).select_from(Categories).cte("categories_agg")
+
+    stmt = select(
+        registrations.c.today_users, users.c.admins, registrations.c.users,
+        sales.c.today_orders, sales.c.all_orders,
+        topups.c.today_topups, users.c.system_balance, topups.c.all_topups,
+        goods.c["items"], goods.c.goods, categories.c.categories, sales.c.sold_count,
+    ).select_from(registrations).join(users, true()).join(sales, true()).join(topups, true()) \
+        .join(goods, true()).join(categories, true())
+
+    async with AsyncDatabase().session(session) as s:
+        return ShopStats(*(await s.execute(stmt)).one())
+
+
+async def get_shop_stats(date: str, session: AsyncSession | None = None) -> ShopStats:
+    """
+    Return shop statistics for the admin panel (date is YYYY-MM-DD for the "today" counters).
+    One query over the daily_* rollups; the snapshot is shared by all admins for STATS_CACHE_TTL seconds.
+    """
+    return await _shop_stats_cache.get_or_set(date, lambda: _load_shop_stats(date, session))
+
+
+async def get_cart(telegram_id: int, session: AsyncSession | None = None) -> list[dict]:
+    """Return the user's cart lines (item_name, quantity, price, stock_count, is_infinite) in adding order."""
+    async with AsyncDatabase().session(session) as s:
+        rows = (await s.execute(
+            select(CartItems.item_name, CartItems.quantity, Goods.price, Goods.stock_count, Goods.is_infinite)
+            .join(Goods, Goods.name == CartItems.item_name)
+            .where(CartItems.user_id == telegram_id)
+            .order_by(CartItems.added_at, CartItems.item_name)
+        )).all()
+        return [dict(row._mapping) for row in rows]
@@ -0,0 +1,92 @@
+import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select, text, delete, insert, cast, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.database.models import User, BoughtGoods, Operations, DailySales, DailyTopups, DailyRegistrations
+
+
+# Rows per day of daily_topups / daily_registrations: writers of one day spread over them instead of
+# all waiting for one row lock until their commit; readers sum the rows
+ROLLUP_SHARDS = 16
+
+
+def _day(when: datetime.datetime | datetime.date) -> datetime.date:
+    return when.date() if isinstance(when, datetime.datetime) else when
+
+
+def _shard(user_id: int) -> int:
+    return user_id % ROLLUP_SHARDS
+
+
+def sales_rollup(when: datetime.datetime, lines: dict[str, tuple[int, Decimal]]):
+    """
+    UPSERT that adds purchases ({item_name: (units, revenue)}) to the daily_sales rows of that day
+    (execute inside the purchase transaction). Rows go in name order, so concurrent carts cannot deadlock.
+    """
+    day = _day(when)
+    stmt = pg_insert(DailySales).values([
+        {"day": day, "item_name": name, "orders_count": units, "revenue": revenue}
+        for name, (units, revenue) in sorted(lines.items())
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[DailySales.day, DailySales.item_name],
+        set_={
+            "orders_count": DailySales.orders_count + stmt.excluded.orders_count,
+            "revenue": DailySales.revenue + stmt.excluded.revenue,
+        },
+    )
+
+
+def topups_rollup(when: datetime.datetime, user_id: int, amount: Decimal, topups: int = 1):
+    """UPSERT that adds a balance top-up to the daily_topups row of that day and the user's shard."""
+    stmt = pg_insert(DailyTopups).values(day=_day(when), shard=_shard(user_id), topups_count=topups, amount=amount)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyTopups.day, DailyTopups.shard],
+        set_={
+            "topups_count": DailyTopups.topups_count + stmt.excluded.topups_count,
+            "amount": DailyTopups.amount + stmt.excluded.amount,
+        },
+    )
+
+
+def registrations_rollup(when: datetime.datetime, telegram_id: int, users: int = 1):
+    """UPSERT that adds new users to the daily_registrations row of that day and the user's shard."""
+    stmt = pg_insert(DailyRegistrations).values(day=_day(when), shard=_shard(telegram_id), users_count=users)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyRegistrations.day, DailyRegistrations.shard],
+        set_={"users_count": DailyRegistrations.users_count + stmt.excluded.users_count},
+    )
+
+
+def backfill_statements():
+    """
+    Statements that rebuild all rollups from the raw tables (run them in one transaction).
+    The EXCLUSIVE lock makes concurrent writers wait, so no purchase/top-up is counted twice or lost.
+    """
+    sales_day = cast(BoughtGoods.bought_datetime, Date)
+    topup_day = cast(Operations.operation_time, Date)
+    reg_day = cast(User.registration_date, Date)
+    topup_shard = Operations.user_id % ROLLUP_SHARDS
+    reg_shard = User.telegram_id % ROLLUP_SHARDS
+    return [
+        text("LOCK TABLE daily_sales, daily_topups, daily_registrations IN EXCLUSIVE MODE"),
+        delete(DailySales),
+        delete(DailyTopups),
+        delete(DailyRegistrations),
+        insert(DailySales).from_select(
+            ["day", "item_name", "orders_count", "revenue"],
+            select(sales_day, BoughtGoods.item_name, func.count(), func.sum(BoughtGoods.price))
+            .group_by(sales_day, BoughtGoods.item_name),
+        ),
+        insert(DailyTopups).from_select(
+            ["day", "shard", "topups_count", "amount"],
+            select(topup_day, topup_shard, func.count(), func.sum(Operations.operation_value))
+            .group_by(topup_day, topup_shard),
+        ),
+        insert(DailyRegistrations).from_select(
+            ["day", "shard", "users_count"],
+            select(reg_day, reg_shard, func.count()).group_by(reg_day, reg_shard),
+        ),
+    ]
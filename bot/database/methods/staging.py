@@ -0,0 +1,87 @@
+from uuid import uuid4
+
+from sqlalchemy import select, delete, insert, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from bot.database import AsyncDatabase
+from bot.database.models import ItemValues, StagedValues
+from bot.database.methods.catalog import invalidate_item_card
+from bot.database.methods.lazy_queries import query_items_in_position
+from bot.database.methods.stock import stock_added
+from bot.misc import invalidate_counts
+
+
+async def start_staging(admin_id: int) -> str:
+    """Open a new staging batch for the admin (values of abandoned batches are dropped); return its id."""
+    async with AsyncDatabase().session() as s:
+        await s.execute(delete(StagedValues).where(StagedValues.admin_id == admin_id))
+    return uuid4().hex
+
+
+async def stage_value(admin_id: int, staging_id: str, value: str) -> None:
+    """Keep one typed value (stripped; blanks are kept to be reported as invalid); commit."""
+    async with AsyncDatabase().session() as s:
+        await s.execute(
+            insert(StagedValues).values(admin_id=admin_id, staging_id=staging_id, value=(value or "").strip())
+        )
+
+
+async def discard_staging(admin_id: int) -> None:
+    """Drop all staged values of the admin."""
+    async with AsyncDatabase().session() as s:
+        await s.execute(delete(StagedValues).where(StagedValues.admin_id == admin_id))
+
+
+async def commit_staged_values(admin_id: int, staging_id: str | None, item_name: str,
+                               is_infinity: bool = False) -> dict[str, int]:
+    """
+    Move a staging batch into item_values with one INSERT ... SELECT DISTINCT ... ON CONFLICT DO NOTHING
+    and empty it, in one transaction.
+    Returns counts: added, skipped_db_dup, skipped_batch_dup, skipped_invalid.
+    """
+    result = {"added": 0, "skipped_db_dup": 0, "skipped_batch_dup": 0, "skipped_invalid": 0}
+    if not staging_id:
+        return result
+
+    batch = (StagedValues.admin_id == admin_id, StagedValues.staging_id == staging_id)
+    async with AsyncDatabase().session() as s:
+        invalid, valid, distinct = (await s.execute(
+            select(
+                func.count().filter(StagedValues.value == ""),
+                func.count().filter(StagedValues.value != ""),
+                func.count(StagedValues.value.distinct()).filter(StagedValues.value != ""),
+            ).where(*batch)
+        )).one()
+        result["skipped_invalid"] = invalid
+        result["skipped_batch_dup"] = valid - distinct
+
+        if distinct:
+            staged = (
+                select(literal(item_name), StagedValues.value, literal(bool(is_infinity)))
+                .where(*batch, StagedValues.value != "")
+                .group_by(StagedValues.value)
+                .order_by(func.min(StagedValues.id))
+            )
+            try:
+                async with s.begin_nested():
+                    added = len((await s.execute(
+                        pg_insert(ItemValues)
+                        .from_select(["item_name", "value", "is_infinity"], staged)
+                        .on_conflict_do_nothing(constraint="uq_item_value_per_item")
+                        .returning(ItemValues.id)
+                    )).all())
+                    if added:
+                        await s.execute(stock_added(item_name, added, infinite=bool(is_infinity)))
+            except IntegrityError:
+                # No such position: nothing was inserted
+                added = 0
+            result["added"] = added
+            result["skipped_db_dup"] = distinct - added
+
+        await s.execute(delete(StagedValues).where(*batch))
+
+    if result["added"]:
+        invalidate_item_card(item_name)
+        invalidate_counts(query_items_in_position, item_name)
+    return result
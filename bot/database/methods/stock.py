@@ -0,0 +1,83 @@
+from sqlalchemy import (
+    update, select, exists, func, or_, text, values, column, case, cast, true, String, Integer
+)
+
+from bot.database.models import Goods, ItemValues
+
+
+def _has_infinite(item_name_col):
+    return exists().where(ItemValues.item_name == item_name_col, ItemValues.is_infinity.is_(True))
+
+
+def stock_added(item_name: str, count: int = 1, infinite: bool = False):
+    """UPDATE that counts new item_values rows on goods (execute inside the inserting transaction)."""
+    values = {Goods.stock_count: Goods.stock_count + count}
+    if infinite:
+        values[Goods.is_infinite] = True
+    return update(Goods).where(Goods.name == item_name).values(values)
+
+
+def stock_removed(item_name: str, count: int = 1, infinite: bool = False):
+    """
+    UPDATE that discounts deleted item_values rows.
+    When an infinite value was removed, is_infinite is re-checked (index ix_item_values_item_inf).
+    """
+    new_values = {Goods.stock_count: Goods.stock_count - count}
+    if infinite:
+        new_values[Goods.is_infinite] = _has_infinite(Goods.name)
+    return update(Goods).where(Goods.name == item_name).values(new_values)
+
+
+def claim_stock(quantities: dict[str, int]):
+    """
+    SELECT (id, item_name, value) that claims up to `quantity` item_values rows of every position
+    in one round trip: a LATERAL ... LIMIT n FOR UPDATE SKIP LOCKED per line of an inline VALUES list.
+    """
+    lines = values(column("item_name", String), column("quantity", Integer), name="lines") \
+        .data(list(quantities.items()))
+    claim = (
+        select(ItemValues.id, ItemValues.item_name, ItemValues.value)
+        .where(ItemValues.item_name == lines.c.item_name)
+        .order_by(ItemValues.id)
+        .limit(cast(lines.c.quantity, Integer))
+        .with_for_update(skip_locked=True)
+        .lateral("claim")
+    )
+    return select(claim.c.id, claim.c.item_name, claim.c.value).select_from(lines).join(claim, true())
+
+
+def stock_sold(quantities: dict[str, int]):
+    """
+    UPDATE that discounts sold units of several positions and RETURNs (name, version) to validate prices.
+    Goods rows are locked in name order first, so concurrent checkouts cannot deadlock on them.
+    """
+    locked = select(Goods.name).where(Goods.name.in_(quantities)).order_by(Goods.name).with_for_update()
+    return (
+        update(Goods)
+        .where(Goods.name.in_(locked.scalar_subquery()))
+        .values(stock_count=Goods.stock_count - case(quantities, value=Goods.name, else_=0))
+        .returning(Goods.name, Goods.version)
+    )
+
+
+def stock_cleared(item_name: str):
+    """UPDATE for a position whose item_values were all deleted."""
+    return update(Goods).where(Goods.name == item_name).values(stock_count=0, is_infinite=False)
+
+
+def reconcile_statements():
+    """
+    Statements that recount goods.stock_count / is_infinite from item_values (run them in one transaction).
+    The SHARE lock keeps values from being added or sold meanwhile; only drifted rows are updated,
+    so the rowcount of the last statement is the number of fixed positions.
+    """
+    actual_count = (
+        select(func.count(ItemValues.id)).where(ItemValues.item_name == Goods.name).scalar_subquery()
+    )
+    actual_infinite = _has_infinite(Goods.name)
+    return [
+        text("LOCK TABLE item_values IN SHARE MODE"),
+        update(Goods)
+        .where(or_(Goods.stock_count != actual_count, Goods.is_infinite != actual_infinite))
+        .values(stock_count=actual_count, is_infinite=actual_infinite),
+    ]
@@ -2,90 +2,221 @@ from datetime import datetime
 from decimal import Decimal
 from random import randint
 
-from bot.database.models import User, ItemValues, Goods, BoughtGoods, Payments, Operations
-from bot.database import Database
-from bot.misc import EnvKeys
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.database.models import (
+    User, ItemValues, Goods, BoughtGoods, Payments, Operations, ReferralEarnings, CartItems
+)
+from bot.database import AsyncDatabase
+from bot.database.methods.rollups import sales_rollup, topups_rollup
+from bot.database.methods.catalog import invalidate_item_card
+from bot.database.methods.stock import claim_stock, stock_sold
+from bot.database.methods.lazy_queries import (
+    query_items_in_position, query_user_bought_items, query_all_referral_earnings, query_referral_earnings_from_user,
+    query_user_referrals
+)
+from bot.misc import EnvKeys, invalidate_counts
 
-def buy_item_transaction(telegram_id: int, item_name: str) -> tuple[bool, str, dict | None]:
+
+async def _purchase(s: AsyncSession, telegram_id: int, lines: dict[str, int],
+                    seen_versions: dict[str, int] | None = None) -> tuple[bool, str, dict | None]:
+    """
+    Buy `lines` ({item_name: quantity}) for the user inside `s`, all or nothing; the caller commits or rolls back.
+    `seen_versions` ({item_name: goods.version}) are the versions of the prices the user was shown;
+    a line whose position changed since is rejected with "price_changed".
+
+    The user row is locked once. Goods rows are not locked while buying: prices are read together with
+    goods.version, stock rows of all lines are claimed with one SKIP LOCKED query, and versions are
+    validated by the stock counter UPDATE at the very end. Concurrent buyers of one position only
+    serialize on that statement and the position's daily_sales row until the commit; buyers of
+    different positions share no row. On failure `data` names the offending item if any.
     """
-    Complete transactional purchase of goods with checks and locks.
+    # 1. Block the user to check the balance
+    user = await s.scalar(
+        select(User).where(User.telegram_id == telegram_id).with_for_update()
+    )
+
+    if not user:
+        return False, "user_not_found", None
+
+    # 2. Read prices and versions of the products (no lock)
+    goods = {
+        row.name: row
+        for row in (await s.execute(
+            select(Goods.name, Goods.price, Goods.version, Goods.is_infinite).where(Goods.name.in_(lines))
+        )).all()
+    }
+    missing = [name for name in lines if name not in goods]
+    if missing:
+        return False, "item_not_found", {"item_name": missing[0]}
+    if seen_versions and any(goods[name].version != version for name, version in seen_versions.items()):
+        return False, "price_changed", None
+
+    prices = {name: Decimal(str(goods[name].price)) for name in lines}
+    total = sum(prices[name] * quantity for name, quantity in lines.items())
+
+    # 3. Checking the balance
+    if user.balance < total:
+        return False, "insufficient_funds", None
+
+    # 4. Receive the goods: endless values are shared and stay, regular ones are claimed
+    #    with one SKIP LOCKED query for all lines and deleted in bulk
+    finite = {name: quantity for name, quantity in lines.items() if not goods[name].is_infinite}
+    infinite = [name for name in lines if goods[name].is_infinite]
+    values: dict[str, list[str]] = {name: [] for name in lines}
+    claimed_ids = []
+    if finite:
+        for row in (await s.execute(claim_stock(finite))).all():
+            values[row.item_name].append(row.value)
+            claimed_ids.append(row.id)
+    if infinite:
+        for name, value in (await s.execute(
+                select(ItemValues.item_name, ItemValues.value)
+                .where(ItemValues.item_name.in_(infinite), ItemValues.is_infinity.is_(True))
+                .distinct(ItemValues.item_name)
+        )).all():
+            values[name] = [value] * lines[name]
+
+    short = [name for name, quantity in lines.items() if len(values[name]) < quantity]
+    if short:
+        return False, "out_of_stock", {"item_name": short[0]}
+
+    if claimed_ids:
+        await s.execute(delete(ItemValues).where(ItemValues.id.in_(claimed_ids)))
+
+    # 5. Write off the balance once
+    user.balance -= total
+
+    # 6. Create the purchase records (one INSERT for all units)
+    bought_datetime = datetime.now()
+    unique_ids = {name: [randint(1_000_000_000, 9_999_999_999) for _ in values[name]] for name in lines}
+    await s.execute(insert(BoughtGoods), [
+        {
+            "item_name": name,
+            "value": value,
+            "price": prices[name],
+            "buyer_id": telegram_id,
+            "bought_datetime": bought_datetime,
+            "unique_id": unique_id,
+        }
+        for name in lines
+        for value, unique_id in zip(values[name], unique_ids[name])
+    ])
+    await s.flush()
+
+    # 7. Shared rows last, so their locks are held only until the commit:
+    #    validate the price versions (and count the sold units), then the positions' daily rollup rows
+    versions = {}
+    if finite:
+        versions.update((await s.execute(stock_sold(finite))).all())
+    if infinite:
+        # FOR SHARE (in name order, like stock_sold) keeps a price edit from committing before this purchase does
+        versions.update((await s.execute(
+            select(Goods.name, Goods.version).where(Goods.name.in_(infinite))
+            .order_by(Goods.name).with_for_update(read=True)
+        )).all())
+    if any(versions.get(name) != goods[name].version for name in lines):
+        return False, "price_changed", None
+    await s.execute(sales_rollup(bought_datetime, {
+        name: (quantity, prices[name] * quantity) for name, quantity in lines.items()
+    }))
+
+    return True, "success", {
+        "lines": {
+            name: {
+                "quantity": quantity,
+                "values": values[name],
+                "price": float(prices[name] * quantity),
+                "unique_ids": unique_ids[name],
+            }
+            for name, quantity in lines.items()
+        },
+        "finite": list(finite),
+        "total": float(total),
+        "new_balance": float(user.balance),
+    }
+
+
+def _after_purchase(telegram_id: int, data: dict) -> None:
+    for name in data["finite"]:
+        invalidate_item_card(name)
+        invalidate_counts(query_items_in_position, name)
+    invalidate_counts(query_user_bought_items, telegram_id)
+
+
+async def buy_item_transaction(telegram_id: int, item_name: str, quantity: int = 1,
+                               version: int | None = None) -> tuple[bool, str, dict | None]:
+    """
+    Complete transactional purchase of `quantity` units of goods with checks and locks (all or nothing).
+    `version` is the goods.version of the price the user saw (rejected with "price_changed" if it is stale).
     Returns: (success, message, purchase_data)
     """
-    with Database().session() as s:
+    if quantity < 1:
+        return False, "invalid_quantity", None
+
+    async with AsyncDatabase().session() as s:
         try:
-            # Starting the transaction
-            s.begin()
-
-            # 1. Block the user to check the balance
-            user = s.query(User).filter(
-                User.telegram_id == telegram_id
-            ).with_for_update().one_or_none()
-
-            if not user:
-                s.rollback()
-                return False, "user_not_found", None
-
-            # 2. Get information about the product
-            goods = s.query(Goods).filter(
-                Goods.name == item_name
-            ).with_for_update().one_or_none()
-
-            if not goods:
-                s.rollback()
-                return False, "item_not_found", None
-
-            price = Decimal(str(goods.price))
-
-            # 3. Checking the balance
-            if user.balance < price:
-                s.rollback()
-                return False, "insufficient_funds", None
-
-            # 4. receive and block the goods for purchase
-            item_value = s.query(ItemValues).filter(
-                ItemValues.item_name == item_name
-            ).with_for_update(skip_locked=True).first()
-
-            if not item_value:
-                s.rollback()
-                return False, "out_of_stock", None
-
-            # 5. If the product is not endless, we remove it
-            if not item_value.is_infinity:
-                s.delete(item_value)
-
-            # 6. Write off the balance
-            user.balance -= price
-
-            # 7. Create a purchase record
-            bought_item = BoughtGoods(
-                name=item_name,
-                value=item_value.value,
-                price=price,
-                buyer_id=telegram_id,
-                bought_datetime=datetime.now(),
-                unique_id=str(randint(1_000_000_000, 9_999_999_999))
+            success, message, data = await _purchase(
+                s, telegram_id, {item_name: quantity}, None if version is None else {item_name: version}
             )
-            s.add(bought_item)
+            if not success:
+                await s.rollback()
+                return False, message, None
 
-            # 8. Commit the transaction
-            s.commit()
+            await s.commit()
+            _after_purchase(telegram_id, data)
 
+            line = data["lines"][item_name]
             return True, "success", {
                 "item_name": item_name,
-                "value": item_value.value,
-                "price": float(price),
-                "new_balance": float(user.balance),
-                "unique_id": bought_item.unique_id
+                "quantity": quantity,
+                "values": line["values"],
+                "value": "\n".join(line["values"]),
+                "price": line["price"],
+                "new_balance": data["new_balance"],
+                "unique_id": line["unique_ids"][0],
+                "unique_ids": line["unique_ids"],
             }
 
         except Exception as e:
-            s.rollback()
+            await s.rollback()
+            return False, f"transaction_error: {str(e)}", None
+
+
+async def checkout_cart_transaction(telegram_id: int) -> tuple[bool, str, dict | None]:
+    """
+    Buy every line of the user's cart in one transaction (all or nothing) and empty the cart.
+    Returns: (success, message, order_data); on failure order_data may name the offending item.
+    """
+    async with AsyncDatabase().session() as s:
+        try:
+            # The cart is read under the user lock, so a double-tapped checkout cannot buy it twice
+            await s.execute(select(User.telegram_id).where(User.telegram_id == telegram_id).with_for_update())
+            lines = dict((await s.execute(
+                select(CartItems.item_name, CartItems.quantity)
+                .where(CartItems.user_id == telegram_id)
+                .order_by(CartItems.added_at, CartItems.item_name)
+            )).all())
+            if not lines:
+                return False, "cart_empty", None
+
+            success, message, data = await _purchase(s, telegram_id, lines)
+            if not success:
+                await s.rollback()
+                return False, message, data
+
+            await s.execute(delete(CartItems).where(CartItems.user_id == telegram_id))
+            await s.commit()
+            _after_purchase(telegram_id, data)
+            return True, "success", data
+
+        except Exception as e:
+            await s.rollback()
             return False, f"transaction_error: {str(e)}", None
 
 
-def process_payment_with_referral(
+async def process_payment_with_referral(
         user_id: int,
         amount: Decimal,
         provider: str,
@@ -97,19 +228,19 @@ def process_payment_with_referral(
     Returns (success, message)
     """
 
-    with Database().session() as s:
+    async with AsyncDatabase().session() as s:
         try:
-            s.begin()
-
             # 1. Check the idempotency of the payment
-            existing_payment = s.query(Payments).filter(
-                Payments.provider == provider,
-                Payments.external_id == external_id
-            ).with_for_update().first()
+            existing_payment = await s.scalar(
+                select(Payments).where(
+                    Payments.provider == provider,
+                    Payments.external_id == external_id
+                ).limit(1).with_for_update()
+            )
 
             if existing_payment:
                 if existing_payment.status == "succeeded":
-                    s.rollback()
+                    await s.rollback()
                     return False, "already_processed"
                 existing_payment.status = "succeeded"
             else:
@@ -125,9 +256,9 @@ def process_payment_with_referral(
                 s.add(payment)
 
             # 2. Update the user's balance
-            user = s.query(User).filter(
-                User.telegram_id == user_id
-            ).with_for_update().one()
+            user = (await s.execute(
+                select(User).where(User.telegram_id == user_id).with_for_update()
+            )).scalar_one()
 
             user.balance += amount
 
@@ -138,6 +269,7 @@ def process_payment_with_referral(
                 operation_time=datetime.now()
             )
             s.add(operation)
+            await s.execute(topups_rollup(operation.operation_time, user_id, amount))
 
             # 4. Process the referral bonus
             if referral_percent > 0 and user.referral_id:
@@ -145,15 +277,14 @@ def process_payment_with_referral(
 
                 if referral_amount > 0:
                     # Update the referrer's balance
-                    referrer = s.query(User).filter(
-                        User.telegram_id == user.referral_id
-                    ).with_for_update().one_or_none()
+                    referrer = await s.scalar(
+                        select(User).where(User.telegram_id == user.referral_id).with_for_update()
+                    )
 
                     if referrer:
                         referrer.balance += referral_amount
 
                         # Create a referral credit record
-                        from bot.database.models import ReferralEarnings
                         earning = ReferralEarnings(
                             referrer_id=user.referral_id,
                             referral_id=user_id,
@@ -162,9 +293,14 @@ def process_payment_with_referral(
                         )
                         s.add(earning)
 
-            s.commit()
+            await s.commit()
+            if user.referral_id:
+                invalidate_counts(query_all_referral_earnings, user.referral_id)
+                invalidate_counts(query_referral_earnings_from_user, user.referral_id, user_id)
+                # Referrals are listed by total earned
+                invalidate_counts(query_user_referrals, user.referral_id)
             return True, "success"
 
         except Exception as e:
-            s.rollback()
+            await s.rollback()
             return False, f"error: {str(e)}"
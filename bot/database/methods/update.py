@@ -2,7 +2,13 @@ from sqlalchemy import exc
 
 from bot.database.models import User, ItemValues, Goods, Categories, BoughtGoods
 from bot.database import Database
+from bot.database.methods.lazy_queries import (
+    query_admins, query_categories, query_items_in_category, query_items_in_position
+)
+from bot.database.methods.read import invalidate_role_cache
+from bot.database.methods.catalog import bump_catalog_version
 from bot.i18n import localize
+from bot.misc import invalidate_counts
 
 
 def set_role(telegram_id: int, role: int) -> None:
@@ -11,6 +17,8 @@ def set_role(telegram_id: int, role: int) -> None:
         s.query(User).filter(User.telegram_id == telegram_id).update(
             {User.role_id: role}
         )
+    invalidate_role_cache(telegram_id)
+    invalidate_counts(query_admins)
 
 
 def update_balance(telegram_id: int | str, summ: int) -> None:
@@ -36,9 +44,15 @@ def update_item(item_name: str, new_name: str, description: str, price, category
                 return False, localize("admin.goods.update.position.invalid")
 
             if new_name == item_name:
+                old_category = goods.category_name
                 goods.description = description
                 goods.price = price
                 goods.category_name = category
+                goods.version = Goods.version + 1
+                session.commit()
+                bump_catalog_version()
+                invalidate_counts(query_items_in_category, old_category)
+                invalidate_counts(query_items_in_category, category)
                 return True, None
 
             # Check that the new name is not already taken
@@ -46,7 +60,9 @@ def update_item(item_name: str, new_name: str, description: str, price, category
                 return False, localize("admin.goods.update.position.exists")
 
             # Create a new product
-            new_goods = Goods(name=new_name, price=price, description=description, category_name=category)
+            new_goods = Goods(name=new_name, price=price, description=description, category_name=category,
+                              stock_count=goods.stock_count, is_infinite=goods.is_infinite,
+                              version=goods.version + 1)
             session.add(new_goods)
             session.flush()
 
@@ -59,8 +75,12 @@ def update_item(item_name: str, new_name: str, description: str, price, category
 
             # Remove the old merchandise
             session.query(Goods).filter(Goods.name == item_name).delete(synchronize_session=False)
+            session.commit()
 
-            return True, None
+        bump_catalog_version()
+        invalidate_counts(query_items_in_category)
+        invalidate_counts(query_items_in_position, item_name)
+        return True, None
 
     except exc.SQLAlchemyError as e:
         return False, f"DB Error: {e.__class__.__name__}"
@@ -93,3 +113,6 @@ def update_category(category_name: str, new_name: str) -> None:
         except Exception:
             s.rollback()
             raise
+    bump_catalog_version()
+    invalidate_counts(query_categories)
+    invalidate_counts(query_items_in_category, category_name)
@@ -2,8 +2,8 @@ import datetime
 from typing import Any
 
 from sqlalchemy import (
-    Column, Integer, String, BigInteger, ForeignKey, Text, Boolean,
-    DateTime, Numeric, Index, UniqueConstraint, func
+    Column, Integer, String, BigInteger, ForeignKey, Text, Boolean, LargeBinary,
+    DateTime, Date, Numeric, Index, UniqueConstraint, func, false
 )
 from bot.database.main import Database
 from sqlalchemy.orm import relationship
@@ -56,6 +56,9 @@ class Role(Database.BASE):
                     role.add_permission(perm)
                 role.default = (role.name == default_role)
 
+        from bot.database.methods.read import invalidate_role_cache
+        invalidate_role_cache()
+
     def add_permission(self, perm):
         if not self.has_permission(perm):
             self.permissions += perm
@@ -95,6 +98,10 @@ class User(Database.BASE):
         back_populates="referral"
     )
 
+    __table_args__ = (
+        Index('ix_users_role_telegram', 'role_id', 'telegram_id'),
+    )
+
     def __init__(self, telegram_id: int, registration_date: datetime.datetime, balance=0, referral_id=None,
                  role_id: int = 1, **kw: Any):
         super().__init__(**kw)
@@ -122,9 +129,18 @@ class Goods(Database.BASE):
     description = Column(Text, nullable=False)
     category_name = Column(String(100), ForeignKey('categories.name', ondelete="CASCADE", onupdate="CASCADE"),
                            nullable=False, index=True)
+    # Denormalized from item_values, kept in step by the write paths (see methods/stock.py)
+    stock_count = Column(Integer, nullable=False, default=0, server_default='0')
+    is_infinite = Column(Boolean, nullable=False, default=False, server_default=false())
+    # Bumped on every edit of price/description; purchases validate it instead of locking the row
+    version = Column(Integer, nullable=False, default=1, server_default='1')
     category = relationship("Categories", back_populates="item")
     values = relationship("ItemValues", back_populates="item")
 
+    __table_args__ = (
+        Index('ix_goods_category_name_name', 'category_name', 'name'),
+    )
+
     def __init__(self, name: str, price, description: str, category_name: str, **kw: Any):
         super().__init__(**kw)
         self.name = name
@@ -145,6 +161,7 @@ class ItemValues(Database.BASE):
     __table_args__ = (
         UniqueConstraint('item_name', 'value', name='uq_item_value_per_item'),
         Index('ix_item_values_item_inf', 'item_name', 'is_infinity'),
+        Index('ix_item_values_item_id', 'item_name', 'id'),
     )
 
     def __init__(self, name: str, value: str, is_infinity: bool, **kw: Any):
@@ -165,6 +182,10 @@ class BoughtGoods(Database.BASE):
     unique_id = Column(BigInteger, nullable=False, unique=True)
     user_telegram_id = relationship("User", back_populates="user_goods")
 
+    __table_args__ = (
+        Index('ix_bought_goods_buyer_datetime_id', 'buyer_id', 'bought_datetime', 'id'),
+    )
+
     def __init__(self, name: str, value: str, price, bought_datetime, unique_id, buyer_id: int = 0, **kw: Any):
         super().__init__(**kw)
         self.item_name = name
@@ -231,6 +252,8 @@ class ReferralEarnings(Database.BASE):
     __table_args__ = (
         Index('ix_referral_earnings_referrer_created', 'referrer_id', 'created_at'),
         Index('ix_referral_earnings_referral_created', 'referral_id', 'created_at'),
+        Index('ix_referral_earnings_referrer_created_id', 'referrer_id', 'created_at', 'id'),
+        Index('ix_referral_earnings_pair_created_id', 'referrer_id', 'referral_id', 'created_at', 'id'),
     )
 
     def __init__(self, referrer_id: int, referral_id: int, amount, original_amount, **kw: Any):
@@ -241,6 +264,90 @@ class ReferralEarnings(Database.BASE):
         self.original_amount = original_amount
 
 
+class CartItems(Database.BASE):
+    """A line of the user's cart (bought in one checkout transaction)"""
+    __tablename__ = 'cart_items'
+
+    user_id = Column(BigInteger, ForeignKey('users.telegram_id', ondelete="CASCADE"), primary_key=True)
+    item_name = Column(String(100), ForeignKey('goods.name', ondelete="CASCADE", onupdate="CASCADE"),
+                       primary_key=True)
+    quantity = Column(Integer, nullable=False, default=1)
+    added_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class StagedValues(Database.BASE):
+    """An item value typed by an admin, kept until the batch is finished or abandoned"""
+    __tablename__ = 'staged_values'
+
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(BigInteger, nullable=False)
+    staging_id = Column(String(32), nullable=False)
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_staged_values_admin_staging', 'admin_id', 'staging_id'),
+    )
+
+
+class FSMStates(Database.BASE):
+    """Conversation state of a chat (FSM_STORAGE=sql); data is a compact blob written by the bot"""
+    __tablename__ = 'fsm_states'
+
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+
+class RateLimitCounters(Database.BASE):
+    """
+    Rate-limit counters shared by bot processes (RATE_LIMIT_BACKEND=sql): one sliding-window counter
+    per user and limit ("<user_id>:<limit>"), and ban rows ("<user_id>:ban", banned until expires_at).
+    Unlogged: losing them in a crash only resets the limits.
+    """
+    __tablename__ = 'rate_limit_counters'
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    key = Column(String(64), primary_key=True)
+    epoch = Column(BigInteger, nullable=False, default=0)
+    previous = Column(Integer, nullable=False, default=0)
+    current = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class DailySales(Database.BASE):
+    """Per-day and per-position purchase rollup, maintained in the purchase transaction"""
+    __tablename__ = 'daily_sales'
+
+    day = Column(Date, primary_key=True)
+    # Per position, so buyers of different items do not queue on one row (no FK: history outlives goods)
+    item_name = Column(String(100), primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+
+
+class DailyTopups(Database.BASE):
+    """Per-day balance top-up rollup, maintained together with Operations rows"""
+    __tablename__ = 'daily_topups'
+
+    day = Column(Date, primary_key=True)
+    # user_id % ROLLUP_SHARDS (see methods/rollups.py), so concurrent top-ups do not queue on one row
+    shard = Column(Integer, primary_key=True)
+    topups_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(12, 2), nullable=False, default=0)
+
+
+class DailyRegistrations(Database.BASE):
+    """Per-day new users rollup, maintained in create_user"""
+    __tablename__ = 'daily_registrations'
+
+    day = Column(Date, primary_key=True)
+    # telegram_id % ROLLUP_SHARDS, like daily_topups
+    shard = Column(Integer, primary_key=True)
+    users_count = Column(Integer, nullable=False, default=0)
+
+
 def register_models():
     Database.BASE.metadata.create_all(Database().engine)
     Role.insert_roles()
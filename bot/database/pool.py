@@ -0,0 +1,137 @@
+import asyncio
+import bisect
+import time
+from typing import Any
+
+from sqlalchemy import event, exc, Engine
+from sqlalchemy.pool import Pool
+
+from bot.logger_mesh import logger
+from bot.misc import EnvKeys
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is "+Inf"
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolStats:
+    """Counters and checkout wait histogram of one connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine: Engine | None = None
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+        self.wait_count += 1
+        self.wait_sum += ms
+        self.wait_max = max(self.wait_max, ms)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Current pool state plus accumulated counters"""
+        pool = self.engine.pool if self.engine is not None else None
+        labels = [f"le_{b}ms" for b in WAIT_BUCKETS_MS] + ["inf"]
+        return {
+            "pool": self.name,
+            "size": pool.size() if pool is not None else 0,
+            "checked_in": pool.checkedin() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "pings": self.pings,
+            "ping_failures": self.ping_failures,
+            "wait_count": self.wait_count,
+            "wait_avg_ms": round(self.wait_sum / self.wait_count, 3) if self.wait_count else 0.0,
+            "wait_max_ms": round(self.wait_max, 3),
+            "wait_histogram": dict(zip(labels, self.wait_buckets)),
+        }
+
+
+def instrumented_pool(base: type[Pool], stats: PoolStats) -> type[Pool]:
+    """
+    Pool class that measures how long a checkout waits for a connection and counts pool timeouts.
+    The class (not the instance) carries `stats`, so it survives pool re-creation on dispose().
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return base._do_get(self)
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.observe_wait(time.perf_counter() - start)
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get})
+
+
+def pool_options(base: type[Pool], stats: PoolStats) -> dict[str, Any]:
+    """create_engine() pool arguments from the environment"""
+    return {
+        "poolclass": instrumented_pool(base, stats),
+        "pool_size": EnvKeys.DB_POOL_SIZE,
+        "max_overflow": EnvKeys.DB_MAX_OVERFLOW,
+        "pool_timeout": EnvKeys.DB_POOL_TIMEOUT,
+        "pool_recycle": EnvKeys.DB_POOL_RECYCLE,
+        "pool_pre_ping": False,
+    }
+
+
+def instrument_engine(engine: Engine, stats: PoolStats, ping_idle: float = EnvKeys.DB_POOL_PING_IDLE) -> None:
+    """
+    Attach pool event listeners to a (sync) engine.
+
+    Liveness: instead of pre-ping on every checkout, only connections that sat idle in the
+    pool longer than `ping_idle` seconds are pinged; a failed ping raises DisconnectionError,
+    so the pool discards that connection and retries with a fresh one.
+    """
+    stats.engine = engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+        checked_in_at = connection_record.info.pop("checked_in_at", None)
+        if checked_in_at is None or time.monotonic() - checked_in_at < ping_idle:
+            return
+        stats.pings += 1
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            stats.ping_failures += 1
+            raise exc.DisconnectionError("connection was idle and failed the liveness ping")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+
+async def log_pool_stats(interval: float, *stats: PoolStats) -> None:
+    """Periodically write pool snapshots to the bot log (run as a background task)"""
+    while True:
+        await asyncio.sleep(interval)
+        for s in stats:
+            logger.info("DB pool stats: %s", s.snapshot())
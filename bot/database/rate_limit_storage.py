@@ -0,0 +1,176 @@
+"""
+Rate-limit counters shared by several bot processes, so a user gets one budget and one ban
+whichever process handles the update.
+
+RATE_LIMIT_BACKEND selects the backend: "memory" (each process counts on its own), "sql"
+(rate_limit_counters table in the bot's database) or "redis" (any Redis-protocol server at
+RATE_LIMIT_REDIS_URL; needs the `redis` package). Each check is one round trip: every counter of
+the update is incremented and read back, with the user's ban, in one statement or pipeline.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Sequence
+
+from sqlalchemy import update, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.database.main import AsyncDatabase
+from bot.database.models import RateLimitCounters
+from bot.misc import EnvKeys
+
+# (limit name, window number, window length in seconds)
+Counter = tuple[str, int, float]
+
+
+class RateLimitStorage:
+    """
+    Sliding-window counters of users by limit name. A counter keeps the count of its current
+    window and of the previous one (see bot.middleware.rate_limit). Subclasses implement all methods.
+    """
+
+    async def hit(self, user_id: int, counters: Sequence[Counter]) -> tuple[float | None, list[tuple[int, int]]]:
+        """
+        Add one to each counter in the given window; return the ban end (unix time, None if not banned)
+        and (previous, current) of every counter after the increment.
+        """
+        raise NotImplementedError
+
+    async def undo(self, user_id: int, counters: Sequence[Counter]) -> None:
+        """Take back a hit() of these counters (the request was rejected)."""
+        raise NotImplementedError
+
+    async def ban(self, user_id: int, until: float) -> None:
+        """Ban the user until the given unix time."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class SQLRateLimitStorage(RateLimitStorage):
+    """Counters in the rate_limit_counters table; statements run in autocommit (no BEGIN/COMMIT trips)."""
+
+    @staticmethod
+    def _key(user_id: int, name: str) -> str:
+        return f"{user_id}:{name}"
+
+    async def _execute(self, statement, params: dict | None = None):
+        async with AsyncDatabase().engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            return await conn.execute(statement, params)
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _hit_statement(count: int):
+        """
+        Upsert `count` counters and read them back with the user's ban, in one statement. Written as text:
+        SQLAlchemy cannot cache an ON CONFLICT insert inside a CTE, and compiling it costs more than the trip.
+        """
+        rows = ", ".join(f"(:key{i}, :epoch{i}, 0, 1, :expires{i})" for i in range(count))
+        return text(f"""
+            WITH hits AS (
+                INSERT INTO rate_limit_counters AS c (key, epoch, previous, current, expires_at)
+                VALUES {rows}
+                ON CONFLICT (key) DO UPDATE SET
+                    -- Same window (or another process's clock is behind): count on; next window: shift; later: restart
+                    previous = CASE WHEN excluded.epoch <= c.epoch THEN c.previous
+                                    WHEN excluded.epoch = c.epoch + 1 THEN c.current ELSE 0 END,
+                    current = CASE WHEN excluded.epoch <= c.epoch THEN c.current + 1 ELSE 1 END,
+                    epoch = greatest(c.epoch, excluded.epoch),
+                    expires_at = excluded.expires_at
+                RETURNING key, previous, current
+            )
+            SELECT key, previous, current,
+                   (SELECT expires_at FROM rate_limit_counters
+                    WHERE key = :ban_key AND expires_at > :now) AS banned_until
+            FROM hits
+        """)
+
+    async def hit(self, user_id: int, counters: Sequence[Counter]) -> tuple[float | None, list[tuple[int, int]]]:
+        now = datetime.now(timezone.utc)
+        params = {"ban_key": self._key(user_id, "ban"), "now": now}
+        for i, (name, epoch, window) in enumerate(counters):
+            params.update({f"key{i}": self._key(user_id, name), f"epoch{i}": epoch,
+                           f"expires{i}": now + timedelta(seconds=2 * window)})
+
+        rows = (await self._execute(self._hit_statement(len(counters)), params)).all()
+        counts = {row.key: (row.previous, row.current) for row in rows}
+        banned = rows[0].banned_until if rows else None
+        return (
+            banned.timestamp() if banned else None,
+            [counts[self._key(user_id, name)] for name, _, _ in counters],
+        )
+
+    async def undo(self, user_id: int, counters: Sequence[Counter]) -> None:
+        await self._execute(
+            update(RateLimitCounters)
+            .where(or_(*(
+                (RateLimitCounters.key == self._key(user_id, name)) & (RateLimitCounters.epoch == epoch)
+                for name, epoch, _ in counters
+            )), RateLimitCounters.current > 0)
+            .values(current=RateLimitCounters.current - 1)
+        )
+
+    async def ban(self, user_id: int, until: float) -> None:
+        values = dict(epoch=0, previous=0, current=0, expires_at=_utc(until))
+        await self._execute(
+            pg_insert(RateLimitCounters).values(key=self._key(user_id, "ban"), **values)
+            .on_conflict_do_update(index_elements=[RateLimitCounters.key], set_=values)
+        )
+
+
+class RedisRateLimitStorage(RateLimitStorage):
+    """
+    Counters in a Redis-protocol server: "rl:<user_id>:<name>:<window number>" integers (INCR with EXPIRE
+    of two windows) and "rl:<user_id>:ban" holding the ban end.
+    """
+
+    def __init__(self, url: str):
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package (pip install redis)") from e
+        self.redis = Redis.from_url(url)
+
+    async def hit(self, user_id: int, counters: Sequence[Counter]) -> tuple[float | None, list[tuple[int, int]]]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(f"rl:{user_id}:ban")
+            for name, epoch, window in counters:
+                pipe.get(f"rl:{user_id}:{name}:{epoch - 1}")
+                pipe.incr(f"rl:{user_id}:{name}:{epoch}")
+                pipe.expire(f"rl:{user_id}:{name}:{epoch}", math.ceil(2 * window))
+            results = await pipe.execute()
+        banned = results[0]
+        counts = [(int(results[i] or 0), int(results[i + 1])) for i in range(1, len(results), 3)]
+        return (float(banned) if banned is not None else None), counts
+
+    async def undo(self, user_id: int, counters: Sequence[Counter]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for name, epoch, _ in counters:
+                pipe.decr(f"rl:{user_id}:{name}:{epoch}")
+            await pipe.execute()
+
+    async def ban(self, user_id: int, until: float) -> None:
+        seconds = math.ceil(until - datetime.now(timezone.utc).timestamp())
+        if seconds > 0:
+            await self.redis.set(f"rl:{user_id}:ban", repr(until), ex=seconds)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_rate_limit_storage() -> RateLimitStorage | None:
+    """Shared rate-limit storage selected by RATE_LIMIT_BACKEND (None for memory: per-process limits)."""
+    kind = (EnvKeys.RATE_LIMIT_BACKEND or "memory").lower()
+    if kind == "memory":
+        return None
+    if kind == "sql":
+        return SQLRateLimitStorage()
+    if kind == "redis":
+        return RedisRateLimitStorage(EnvKeys.RATE_LIMIT_REDIS_URL)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {EnvKeys.RATE_LIMIT_BACKEND!r} (expected memory, sql or redis)")
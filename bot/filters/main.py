@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 from aiogram.filters import BaseFilter
 from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.methods import check_role
 from bot.misc import EnvKeys
@@ -30,8 +31,8 @@ class HasPermissionFilter(BaseFilter):
     """
     permission: int
 
-    async def __call__(self, event: Message | CallbackQuery) -> bool:
+    async def __call__(self, event: Message | CallbackQuery, session: AsyncSession | None = None) -> bool:
         user_id = event.from_user.id
         # check_role(user_id) returns int (bitmask of rights) or None
-        user_permissions: int = check_role(user_id) or 0
+        user_permissions: int = await check_role(user_id, session=session) or 0
         return (user_permissions & self.permission) == self.permission
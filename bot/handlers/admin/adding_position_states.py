@@ -1,22 +1,121 @@
+import asyncio
+import time
+from contextlib import suppress
 from urllib.parse import urlparse
 
+import aiohttp
 from aiogram import Router, F
-from aiogram.exceptions import TelegramForbiddenError, TelegramNotFound, TelegramBadRequest
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramNotFound, TelegramBadRequest
 from aiogram.types import CallbackQuery, Message
 
 from bot.database.models import Permission
 from bot.database.methods import (
-    check_category, check_item, create_item, add_values_to_item
+    check_category, check_item, create_item, add_values_to_item, import_values, start_staging, stage_value,
+    commit_staged_values
 )
-from bot.keyboards.inline import back, question_buttons, simple_buttons
+from bot.keyboards.inline import back, question_buttons, simple_buttons, MAX_ITEM_NAME_BYTES
 from bot.logger_mesh import audit_logger
 from bot.filters import HasPermissionFilter
-from bot.misc import EnvKeys
+from bot.misc import EnvKeys, Priority, outbound_priority
 from bot.i18n import localize
+from bot.misc.stock_upload import is_values_document, document_chunks, iter_values
 from bot.states import AddItemFSM
 
 router = Router()
 
+UPLOAD_PROGRESS_INTERVAL = 3  # sec between progress message edits
+
+
+async def stage_typed_value(message: Message, state) -> int:
+    """
+    Keep a typed value in the staging table; FSM only holds the batch id and a counter.
+    Returns the number of values staged so far.
+    """
+    data = await state.get_data()
+    staging_id = data.get('staging_id') or await start_staging(message.from_user.id)
+    await stage_value(message.from_user.id, staging_id, message.text)
+    count = data.get('staged_count', 0) + 1
+    await state.update_data(staging_id=staging_id, staged_count=count)
+    return count
+
+
+async def upload_item_values(message: Message, item_name: str) -> tuple[dict[str, int], str | None]:
+    """
+    Stream the values of the uploaded .txt/.csv document into the position, with a progress message.
+    Returns the import counts and the error if the file could not be read to the end.
+    """
+    document = message.document
+    progress = await message.answer(localize('admin.goods.upload.progress', n=0))
+    counts: dict[str, int] = {}
+    last_edit = time.monotonic()
+
+    async def report(result: dict[str, int]):
+        nonlocal counts, last_edit
+        counts = result
+        if time.monotonic() - last_edit < UPLOAD_PROGRESS_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        with suppress(TelegramBadRequest):
+            await progress.edit_text(localize('admin.goods.upload.progress', n=sum(result.values())))
+
+    try:
+        file = await message.bot.get_file(document.file_id)
+        values = iter_values(
+            document_chunks(message.bot, file.file_path),
+            is_csv=document.file_name.lower().endswith(".csv")
+        )
+        return await import_values(item_name, values, on_progress=report), None
+    except (TelegramAPIError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        return counts, str(e)
+    finally:
+        with suppress(TelegramBadRequest):
+            await progress.delete()
+
+
+def values_report(title: str, *results: dict[str, int], error: str | None = None) -> str:
+    """Result text of a values import (counts of several imports are summed)."""
+    total = {key: sum(r.get(key, 0) for r in results)
+             for key in ('added', 'skipped_db_dup', 'skipped_batch_dup', 'skipped_invalid')}
+    text_lines = [title, localize('admin.goods.add.result.added', n=total['added'])]
+    for key in ('skipped_db_dup', 'skipped_batch_dup', 'skipped_invalid'):
+        if total[key]:
+            text_lines.append(localize(f'admin.goods.add.result.{key}', n=total[key]))
+    if error:
+        text_lines.append(localize('admin.goods.upload.failed', error=error))
+    return "\n".join(text_lines)
+
+
+async def notify_channel_upload(event: Message | CallbackQuery, item_name: str, count: int | str) -> None:
+    """
+    Post the "new upload" notice to the channel (if configured); delivery errors are answered to the admin
+    (a reply to a message, an alert to a button press).
+    """
+    channel_url = EnvKeys.CHANNEL_URL or ""
+    parsed = urlparse(channel_url)
+    channel_username = (
+                           parsed.path.lstrip('/')
+                           if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
+                       ) or None
+    if not channel_username:
+        return
+    try:
+        with outbound_priority(Priority.NOTIFICATION):
+            await event.bot.send_message(
+                chat_id=f"@{channel_username}",
+                text=(
+                    f"🎁 {localize('shop.group.new_upload')}\n"
+                    f"🏷️ {localize('shop.group.item')}: <b>{item_name}</b>\n"
+                    f"📦 {localize('shop.group.count')}: <b>{count}</b>"
+                ),
+                parse_mode='HTML'
+            )
+    except TelegramForbiddenError:
+        await event.answer(localize("errors.channel.telegram_forbidden_error", channel=channel_username))
+    except TelegramNotFound:
+        await event.answer(localize("errors.channel.telegram_not_found", channel=channel_username))
+    except TelegramBadRequest as e:
+        await event.answer(localize("errors.channel.telegram_bad_request", e=e))
+
 
 @router.callback_query(F.data == 'add_item', HasPermissionFilter(permission=Permission.SHOP_MANAGE))
 async def add_item_callback_handler(call: CallbackQuery, state):
@@ -33,6 +132,12 @@ async def check_item_name_for_add(message: Message, state):
     If position already exists — inform the user; otherwise save name and ask for description.
     """
     item_name = (message.text or "").strip()
+    if len(item_name.encode()) > MAX_ITEM_NAME_BYTES:
+        await message.answer(
+            localize('admin.goods.add.name.too_long', max=MAX_ITEM_NAME_BYTES),
+            reply_markup=back('goods_management')
+        )
+        return
     item = check_item(item_name)
     if item:
         await message.answer(
@@ -121,17 +226,13 @@ async def adding_value_to_position(call: CallbackQuery, state):
 @router.message(AddItemFSM.waiting_values, F.text)
 async def collect_item_value(message: Message, state):
     """
-    Accumulate values in FSM state. After the first one — show a “Finish adding” button.
+    Stage the value. After the first one — show a “Finish adding” button.
     """
-    data = await state.get_data()
-    values = data.get('item_values', [])
-    value = (message.text or "")
-    values.append(value)
-    await state.update_data(item_values=values)
+    count = await stage_typed_value(message, state)
 
     # Show progress + “Finish adding” button
     await message.answer(
-        localize('admin.goods.add.values.added', value=value, count=len(values)),
+        localize('admin.goods.add.values.added', value=message.text, count=count),
         reply_markup=simple_buttons([
             (localize('btn.add_values_finish'), "finish_adding_items"),
             (localize('btn.back'), "goods_management")
@@ -139,6 +240,38 @@ async def collect_item_value(message: Message, state):
     )
 
 
+@router.message(AddItemFSM.waiting_values, F.document)
+async def upload_item_values_handler(message: Message, state):
+    """
+    Create a position from a .txt/.csv document (one value per line or a CSV column), streamed in batches.
+    """
+    if not is_values_document(message.document.file_name):
+        await message.answer(localize('admin.goods.upload.unsupported'), reply_markup=back("goods_management"))
+        return
+
+    data = await state.get_data()
+    item_name = data.get('item_name')
+    create_item(item_name, data.get('item_description'), data.get('item_price'), data.get('item_category'))
+    # Values typed before the upload go in first
+    typed = await commit_staged_values(message.from_user.id, data.get('staging_id'), item_name)
+    uploaded, error = await upload_item_values(message, item_name)
+
+    added = typed["added"] + uploaded.get("added", 0)
+
+    await message.answer(
+        values_report(localize('admin.goods.add.result.created'), typed, uploaded, error=error),
+        parse_mode="HTML",
+        reply_markup=back("goods_management")
+    )
+    await notify_channel_upload(message, item_name, added)
+    admin_info = await message.bot.get_chat(message.from_user.id)
+    audit_logger.info(
+        f'Admin {message.from_user.id} ({admin_info.first_name}) created a new item "{item_name}" '
+        f'from file "{message.document.file_name}" ({added} value(s))'
+    )
+    await state.clear()
+
+
 @router.callback_query(F.data == 'finish_adding_items', AddItemFSM.waiting_values)
 async def finish_adding_items_callback_handler(call: CallbackQuery, state):
     """
@@ -149,72 +282,19 @@ async def finish_adding_items_callback_handler(call: CallbackQuery, state):
     item_description = data.get('item_description')
     item_price = data.get('item_price')
     category_name = data.get('item_category')
-    raw_values: list[str] = data.get("item_values", []) or []
-
-    added = 0
-    skipped_db_dup = 0
-    skipped_batch_dup = 0
-    skipped_invalid = 0
-    seen_in_batch: set[str] = set()
 
     # Create position
     create_item(item_name, item_description, item_price, category_name)
 
-    for v in raw_values:
-        v_norm = (v or "").strip()
-        if not v_norm:
-            skipped_invalid += 1
-            continue
-
-        # Duplicate within the current input batch
-        if v_norm in seen_in_batch:
-            skipped_batch_dup += 1
-            continue
-        seen_in_batch.add(v_norm)
-
-        # Try to insert — False means it already exists in DB
-        if add_values_to_item(item_name, v_norm, False):
-            added += 1
-        else:
-            skipped_db_dup += 1
-
-    text_lines = [
-        localize('admin.goods.add.result.created'),
-        localize('admin.goods.add.result.added', n=added)
-    ]
-    if skipped_db_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_db_dup', n=skipped_db_dup))
-    if skipped_batch_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_batch_dup', n=skipped_batch_dup))
-    if skipped_invalid:
-        text_lines.append(localize('admin.goods.add.result.skipped_invalid', n=skipped_invalid))
-
-    await call.message.edit_text("\n".join(text_lines), parse_mode="HTML", reply_markup=back("goods_management"))
-
-    # Optionally notify a channel
-    channel_url = EnvKeys.CHANNEL_URL or ""
-    parsed = urlparse(channel_url)
-    channel_username = (
-                           parsed.path.lstrip('/')
-                           if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
-                       ) or None
-    if channel_username:
-        try:
-            await call.bot.send_message(
-                chat_id=f"@{channel_username}",
-                text=(
-                    f"🎁 {localize('shop.group.new_upload')}\n"
-                    f"🏷️ {localize('shop.group.item')}: <b>{item_name}</b>\n"
-                    f"📦 {localize('shop.group.count')}: <b>{added}</b>"
-                ),
-                parse_mode='HTML'
-            )
-        except TelegramForbiddenError:
-            await call.answer(localize("errors.channel.telegram_forbidden_error", channel=channel_username))
-        except TelegramNotFound:
-            await call.answer(localize("errors.channel.telegram_not_found", channel=channel_username))
-        except TelegramBadRequest as e:
-            await call.answer(localize("errors.channel.telegram_bad_request", e=e))
+    result = await commit_staged_values(call.from_user.id, data.get('staging_id'), item_name)
+
+    await call.message.edit_text(
+        values_report(localize('admin.goods.add.result.created'), result),
+        parse_mode="HTML",
+        reply_markup=back("goods_management")
+    )
+
+    await notify_channel_upload(call, item_name, result['added'])
 
     admin_info = await call.message.bot.get_chat(call.from_user.id)
     audit_logger.info(
@@ -245,29 +325,7 @@ async def finish_adding_item_callback_handler(message: Message, state):
     add_values_to_item(item_name, single_value, True)
 
     # 3) Optionally notify a channel
-    channel_url = EnvKeys.CHANNEL_URL or ""
-    parsed = urlparse(channel_url)
-    channel_username = (
-                           parsed.path.lstrip('/')
-                           if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
-                       ) or None
-    if channel_username:
-        try:
-            await message.bot.send_message(
-                chat_id=f"@{channel_username}",
-                text=(
-                    f"🎁 {localize('shop.group.new_upload')}\n"
-                    f"🏷️ {localize('shop.group.item')}: <b>{item_name}</b>\n"
-                    f"📦 {localize('shop.group.count')}: <b>∞</b>"
-                ),
-                parse_mode='HTML'
-            )
-        except TelegramForbiddenError:
-            await message.answer(localize("errors.channel.telegram_forbidden_error", channel=channel_username))
-        except TelegramNotFound:
-            await message.answer(localize("errors.channel.telegram_not_found", channel=channel_username))
-        except TelegramBadRequest as e:
-            await message.answer(localize("errors.channel.telegram_bad_request", e=e))
+    await notify_channel_upload(message, item_name, "∞")
 
     await message.answer(localize('admin.goods.add.single.created'), reply_markup=back('goods_management'))
     admin_info = await message.bot.get_chat(message.from_user.id)
@@ -64,11 +64,10 @@ async def broadcast_messages(message: Message, state: FSMContext):
         except Exception:
             pass  # Ignore update errors
 
-    # Start the mailing
+    # Start the mailing (paced by the outbound governor, behind the answers to users)
     broadcast_manager = BroadcastManager(
         bot=message.bot,
-        batch_size=30,  # 30 messages in parallel
-        batch_delay=1.0  # 1 second between batches
+        batch_size=30  # 30 messages in parallel
     )
 
     stats = await broadcast_manager.broadcast(
@@ -7,7 +7,7 @@ from aiogram.types import CallbackQuery, Message
 from bot.i18n import localize
 from bot.database.models import Permission
 from bot.database.methods import check_item, delete_item, get_item_info, get_goods_info, delete_item_from_position, \
-    query_items_in_position
+    query_items_in_position, discard_staging
 from bot.keyboards.inline import back, simple_buttons, lazy_paginated_keyboard
 from bot.logger_mesh import audit_logger
 from bot.filters import HasPermissionFilter
@@ -31,6 +31,9 @@ async def goods_management_callback_handler(call: CallbackQuery, state):
         (localize("btn.back"), "console"),
     ]
     markup = simple_buttons(actions, per_row=1)
+    if (await state.get_data()).get('staging_id'):
+        # Back from value entry: drop the values typed so far
+        await discard_staging(call.from_user.id)
     await call.message.edit_text(localize('admin.goods.menu.title'), reply_markup=markup)
     await state.clear()
 
@@ -1,5 +1,6 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.i18n import localize
 from bot.keyboards import admin_console_keyboard
@@ -11,12 +12,12 @@ router = Router()
 
 
 @router.callback_query(F.data == 'console', HasPermissionFilter(permission=Permission.SHOP_MANAGE))
-async def console_callback_handler(call: CallbackQuery):
+async def console_callback_handler(call: CallbackQuery, session: AsyncSession):
     """
     Admin menu (only for admins and above).
     """
     user_id = call.from_user.id
-    role = check_role(user_id)
+    role = await check_role(user_id, session=session)
     if role > 1:
         await call.message.edit_text(localize("admin.menu.main"), reply_markup=admin_console_keyboard())
     else:
@@ -2,17 +2,16 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 from aiogram.types import FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from dataclasses import asdict
+from functools import partial
 from pathlib import Path
 import datetime
 
-from bot.database.models import Permission
+from bot.database.models import Permission, User
 from bot.database.methods import (
-    select_today_users, select_admins, get_user_count, select_today_orders,
-    select_all_orders, select_today_operations, select_users_balance, select_all_operations,
-    select_count_items, select_count_goods, select_count_categories, select_count_bought_items,
-    select_bought_item, check_user, check_user_referrals, check_role_name_by_id, select_user_items,
-    select_user_operations, query_admins, query_all_users
+    get_shop_stats, select_bought_item, get_user_summary, query_admins, query_all_users, estimate_count
 )
 from bot.keyboards import back, simple_buttons, lazy_paginated_keyboard
 from bot.filters import HasPermissionFilter
@@ -58,26 +57,16 @@ async def logs_callback_handler(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "statistics", HasPermissionFilter(Permission.SHOP_MANAGE))
-async def statistics_callback_handler(call: CallbackQuery):
+async def statistics_callback_handler(call: CallbackQuery, session: AsyncSession):
     """
     Show key shop statistics.
     """
     today_str = datetime.date.today().isoformat()
+    stats = await get_shop_stats(today_str, session=session)
 
     text = localize(
         "admin.shop.stats.template",
-        today_users=select_today_users(today_str),
-        admins=select_admins(),
-        users=get_user_count(),
-        today_orders=select_today_orders(today_str),
-        all_orders=select_all_orders(),
-        today_topups=select_today_operations(today_str),
-        system_balance=select_users_balance(),
-        all_topups=select_all_operations(),
-        items=select_count_items(),
-        goods=select_count_goods(),
-        categories=select_count_categories(),
-        sold_count=select_count_bought_items(),
+        **asdict(stats),
         currency=EnvKeys.PAY_CURRENCY
     )
 
@@ -145,7 +134,7 @@ async def users_callback_handler(call: CallbackQuery, state: FSMContext):
     Show list of all users with lazy loading pagination.
     """
     # Create paginator
-    paginator = LazyPaginator(query_all_users, per_page=10)
+    paginator = LazyPaginator(query_all_users, per_page=10, approximate_count=partial(estimate_count, User))
 
     markup = await lazy_paginated_keyboard(
         paginator=paginator,
@@ -177,7 +166,8 @@ async def navigate_users(call: CallbackQuery, state: FSMContext):
     paginator_state = data.get('users_paginator')
 
     # Create paginator with cached state
-    paginator = LazyPaginator(query_all_users, per_page=10, state=paginator_state)
+    paginator = LazyPaginator(query_all_users, per_page=10, state=paginator_state,
+                              approximate_count=partial(estimate_count, User))
 
     markup = await lazy_paginated_keyboard(
         paginator=paginator,
@@ -195,7 +185,7 @@ async def navigate_users(call: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("show-user_"), HasPermissionFilter(permission=Permission.USERS_MANAGE))
-async def show_user_info(call: CallbackQuery):
+async def show_user_info(call: CallbackQuery, session: AsyncSession):
     """
     Show detailed info for selected user.
     """
@@ -203,13 +193,12 @@ async def show_user_info(call: CallbackQuery):
     origin, user_id = query.split("-")  # origin: 'user' | 'admin'
     back_target = "users_list" if origin == "user" else "admins_list"
 
-    user = check_user(user_id)
+    user = await get_user_summary(user_id, session=session)
     user_info = await call.message.bot.get_chat(user_id)
-    operations = select_user_operations(user_id)
-    overall_balance = sum(operations) if operations else 0
-    items = select_user_items(user_id)
-    role = check_role_name_by_id(user.role_id)
-    referrals = check_user_referrals(user.telegram_id)
+    overall_balance = user.total_topups
+    items = user.purchases_count
+    role = user.role_name
+    referrals = user.referrals_count
 
     text = (
         f"{localize('profile.caption', name=user_info.first_name, id=user_id)}\n\n"
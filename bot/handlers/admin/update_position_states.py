@@ -1,19 +1,20 @@
-from urllib.parse import urlparse
-
 from aiogram import Router, F
-from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest, TelegramNotFound
 from aiogram.types import CallbackQuery, Message
 
 from bot.database.models import Permission
 from bot.database.methods import (
-    check_item, add_values_to_item, update_item, check_value, delete_only_items
+    check_item, add_values_to_item, update_item, check_value, delete_only_items, commit_staged_values
 )
-from bot.keyboards.inline import back, question_buttons, simple_buttons
+from bot.keyboards.inline import back, question_buttons, simple_buttons, MAX_ITEM_NAME_BYTES
 from bot.logger_mesh import audit_logger
 from bot.filters import HasPermissionFilter
 from bot.misc import EnvKeys
+from bot.misc.stock_upload import is_values_document
 from bot.i18n import localize
 from bot.states import UpdateItemFSM
+from bot.handlers.admin.adding_position_states import (
+    stage_typed_value, upload_item_values, values_report, notify_channel_upload
+)
 
 router = Router()
 
@@ -63,16 +64,13 @@ async def check_item_name_for_amount_upd(message: Message, state):
 @router.message(UpdateItemFSM.waiting_item_values_upd, F.text)
 async def updating_item_values(message: Message, state):
     """
-    Accumulate values for the item (regular mode).
+    Stage values for the item (regular mode).
     Show "Finish" button after first value.
     """
-    data = await state.get_data()
-    values = data.get('item_values', [])
-    values.append(message.text)
-    await state.update_data(item_values=values)
+    count = await stage_typed_value(message, state)
 
     await message.answer(
-        localize('admin.goods.add.values.added', value=message.text, count=len(values)),
+        localize('admin.goods.add.values.added', value=message.text, count=count),
         reply_markup=simple_buttons([
             (localize('btn.add_values_finish'), "finish_updating_items"),
             (localize('btn.back'), "goods_management")
@@ -80,78 +78,56 @@ async def updating_item_values(message: Message, state):
     )
 
 
+@router.message(UpdateItemFSM.waiting_item_values_upd, F.document)
+async def upload_item_values_upd(message: Message, state):
+    """
+    Add values from a .txt/.csv document (one value per line or a CSV column), streamed in batches.
+    """
+    if not is_values_document(message.document.file_name):
+        await message.answer(localize('admin.goods.upload.unsupported'), reply_markup=back("goods_management"))
+        return
+
+    data = await state.get_data()
+    item_name = data.get('item_name')
+    typed = await commit_staged_values(message.from_user.id, data.get('staging_id'), item_name)
+    uploaded, error = await upload_item_values(message, item_name)
+
+    added = typed["added"] + uploaded.get("added", 0)
+
+    await message.answer(
+        values_report(localize('admin.goods.update.values.result.title'), typed, uploaded, error=error),
+        parse_mode="HTML",
+        reply_markup=back('goods_management')
+    )
+    await notify_channel_upload(message, item_name, added)
+    admin_info = await message.bot.get_chat(message.from_user.id)
+    audit_logger.info(
+        f'Admin {message.from_user.id} ({admin_info.first_name}) added '
+        f'{added} value(s) to item "{item_name}" '
+        f'from file "{message.document.file_name}".'
+    )
+    await state.clear()
+
+
 @router.callback_query(F.data == 'finish_updating_items', UpdateItemFSM.waiting_item_values_upd)
 async def updating_item_amount(call: CallbackQuery, state):
     """Finish adding new item values."""
     data = await state.get_data()
     item_name = data.get('item_name')
-    raw_values: list[str] = data.get("item_values", []) or []
-
-    added = 0
-    skipped_db_dup = 0
-    skipped_batch_dup = 0
-    skipped_invalid = 0
-    seen_in_batch: set[str] = set()
-
-    for v in raw_values:
-        v_norm = (v or "").strip()
-        if not v_norm:
-            skipped_invalid += 1
-            continue
-
-        # Duplicate inside current batch
-        if v_norm in seen_in_batch:
-            skipped_batch_dup += 1
-            continue
-        seen_in_batch.add(v_norm)
-
-        # Try insert — False means it already exists in DB
-        if add_values_to_item(item_name, v_norm, False):
-            added += 1
-        else:
-            skipped_db_dup += 1
-
-    text_lines = [
-        localize('admin.goods.update.values.result.title'),
-        localize('admin.goods.add.result.added', n=added),
-    ]
-    if skipped_db_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_db_dup', n=skipped_db_dup))
-    if skipped_batch_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_batch_dup', n=skipped_batch_dup))
-    if skipped_invalid:
-        text_lines.append(localize('admin.goods.add.result.skipped_invalid', n=skipped_invalid))
-
-    await call.message.edit_text("\n".join(text_lines), parse_mode="HTML", reply_markup=back('goods_management'))
-
-    # Optional: channel notification (if configured)
-    channel_url = EnvKeys.CHANNEL_URL or ""
-    parsed = urlparse(channel_url)
-    channel_username = (
-                           parsed.path.lstrip('/')
-                           if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
-                       ) or None
-    if channel_username:
-        try:
-            await call.bot.send_message(
-                chat_id=f"@{channel_username}",
-                text=(
-                    f'🎁 {localize("shop.group.new_upload")}\n'
-                    f'🏷️ {localize("shop.group.item")}: <b>{item_name}</b>\n'
-                    f'📦 {localize("shop.group.count")}: <b>{added}</b>'
-                ),
-                parse_mode='HTML'
-            )
-        except TelegramForbiddenError:
-            await call.answer(localize("errors.channel.telegram_forbidden_error", channel=channel_username))
-        except TelegramNotFound:
-            await call.answer(localize("errors.channel.telegram_not_found", channel=channel_username))
-        except TelegramBadRequest as e:
-            await call.answer(localize("errors.channel.telegram_bad_request", e=e))
+
+    result = await commit_staged_values(call.from_user.id, data.get('staging_id'), item_name)
+
+    await call.message.edit_text(
+        values_report(localize('admin.goods.update.values.result.title'), result),
+        parse_mode="HTML",
+        reply_markup=back('goods_management')
+    )
+
+    await notify_channel_upload(call, item_name, result['added'])
 
     admin_info = await call.message.bot.get_chat(call.from_user.id)
     audit_logger.info(
-        f'Admin {call.from_user.id} ({admin_info.first_name}) added {added} value(s) to item "{item_name}".'
+        f'Admin {call.from_user.id} ({admin_info.first_name}) added {result["added"]} value(s) to item "{item_name}".'
     )
     await state.clear()
 
@@ -183,7 +159,14 @@ async def check_item_name_for_update(message: Message, state):
 @router.message(UpdateItemFSM.waiting_item_new_name, F.text)
 async def update_item_name(message: Message, state):
     """Ask for item description."""
-    await state.update_data(item_new_name=message.text.strip())
+    item_new_name = message.text.strip()
+    if len(item_new_name.encode()) > MAX_ITEM_NAME_BYTES:
+        await message.answer(
+            localize('admin.goods.add.name.too_long', max=MAX_ITEM_NAME_BYTES),
+            reply_markup=back('goods_management')
+        )
+        return
+    await state.update_data(item_new_name=item_new_name)
     await message.answer(localize('admin.goods.update.prompt.description'), reply_markup=back('goods_management'))
     await state.set_state(UpdateItemFSM.waiting_item_description)
 
@@ -304,16 +287,13 @@ async def update_item_infinity(message: Message, state):
 async def updating_item(message: Message, state):
     """
     Switch to regular (non-infinite) mode:
-    - accumulate values,
+    - stage values,
     - then apply changes with the “Finish” button.
     """
-    data = await state.get_data()
-    values = data.get('item_values', [])
-    values.append(message.text)
-    await state.update_data(item_values=values)
+    count = await stage_typed_value(message, state)
 
     await message.answer(
-        localize('admin.goods.add.values.added', value=message.text, count=len(values)),
+        localize('admin.goods.add.values.added', value=message.text, count=count),
         reply_markup=simple_buttons([
             (localize('btn.add_values_finish'), "finish_update_item"),
             (localize('btn.back'), "goods_management")
@@ -335,72 +315,21 @@ async def update_item_no_infinity(call: CallbackQuery, state):
     item_description = data.get('item_description')
     category = data.get('item_category')
     price = data.get('item_price')
-    raw_values: list[str] = data.get("item_values", []) or []
-
-    added = 0
-    skipped_db_dup = 0
-    skipped_batch_dup = 0
-    skipped_invalid = 0
-    seen_in_batch: set[str] = set()
 
     delete_only_items(item_old_name)
 
-    for v in raw_values:
-        v_norm = (v or "").strip()
-        if not v_norm:
-            skipped_invalid += 1
-            continue
-
-        if v_norm in seen_in_batch:
-            skipped_batch_dup += 1
-            continue
-        seen_in_batch.add(v_norm)
-
-        if add_values_to_item(item_old_name, v_norm, False):
-            added += 1
-        else:
-            skipped_db_dup += 1
+    result = await commit_staged_values(call.from_user.id, data.get('staging_id'), item_old_name)
 
     # Update meta after values are in place
     update_item(item_old_name, item_new_name, item_description, price, category)
 
-    text_lines = [
-        localize('admin.goods.update.success'),
-        localize('admin.goods.add.result.added', n=added),
-    ]
-    if skipped_db_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_db_dup', n=skipped_db_dup))
-    if skipped_batch_dup:
-        text_lines.append(localize('admin.goods.add.result.skipped_batch_dup', n=skipped_batch_dup))
-    if skipped_invalid:
-        text_lines.append(localize('admin.goods.add.result.skipped_invalid', n=skipped_invalid))
-
-    # Optional: channel notification (if configured)
-    channel_url = EnvKeys.CHANNEL_URL or ""
-    parsed = urlparse(channel_url)
-    channel_username = (
-                           parsed.path.lstrip('/')
-                           if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
-                       ) or None
-    if channel_username:
-        try:
-            await call.bot.send_message(
-                chat_id=f"@{channel_username}",
-                text=(
-                    f'🎁 {localize("shop.group.new_upload")}\n'
-                    f'🏷️ {localize("shop.group.item")}: <b>{item_new_name}</b>\n'
-                    f'📦 {localize("shop.group.count")}: <b>{added}</b>'
-                ),
-                parse_mode='HTML'
-            )
-        except TelegramForbiddenError:
-            await call.answer(localize("errors.channel.telegram_forbidden_error", channel=channel_username))
-        except TelegramNotFound:
-            await call.answer(localize("errors.channel.telegram_not_found", channel=channel_username))
-        except TelegramBadRequest as e:
-            await call.answer(localize("errors.channel.telegram_bad_request", e=e))
-
-    await call.message.edit_text("\n".join(text_lines), parse_mode="HTML", reply_markup=back('goods_management'))
+    await notify_channel_upload(call, item_new_name, result['added'])
+
+    await call.message.edit_text(
+        values_report(localize('admin.goods.update.success'), result),
+        parse_mode="HTML",
+        reply_markup=back('goods_management')
+    )
     admin_info = await call.message.bot.get_chat(call.from_user.id)
     audit_logger.info(
         f'Admin {call.from_user.id} ({admin_info.first_name}) updated item "{item_old_name}" → "{item_new_name}".'
@@ -3,12 +3,13 @@ from functools import partial
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.i18n import localize
 from bot.database.models import Permission
 from bot.database.methods import (
-    check_user, select_user_operations, select_user_items, check_role_name_by_id, check_user_referrals, set_role,
-    create_operation, update_balance, get_role_id_by_name, get_referral_earnings_stats, get_one_referral_earning,
+    check_user, get_user_summary, check_role_name_by_id, set_role,
+    create_operation, update_balance, get_role_id_by_name, get_one_referral_earning,
     query_user_bought_items, query_user_referrals, query_referral_earnings_from_user, query_all_referral_earnings
 )
 from bot.keyboards import back, close, simple_buttons, lazy_paginated_keyboard
@@ -18,7 +19,7 @@ from bot.states import UserMgmtStates
 
 import datetime
 
-from bot.misc import EnvKeys, LazyPaginator
+from bot.misc import EnvKeys, LazyPaginator, Priority, outbound_priority
 
 router = Router()
 
@@ -37,7 +38,7 @@ async def user_callback_handler(call: CallbackQuery, state: FSMContext):
 
 
 @router.message(UserMgmtStates.waiting_user_id_for_check, F.text)
-async def check_user_data(message: Message, state: FSMContext):
+async def check_user_data(message: Message, state: FSMContext, session: AsyncSession):
     """
     Validates ID and shows user profile directly.
     """
@@ -50,7 +51,7 @@ async def check_user_data(message: Message, state: FSMContext):
         return
 
     target_id = int(user_id_text)
-    user = check_user(target_id)
+    user = await get_user_summary(target_id, session=session)
     if not user:
         await message.answer(
             localize('admin.users.profile_unavailable'),
@@ -60,16 +61,12 @@ async def check_user_data(message: Message, state: FSMContext):
 
     # Get user profile data
     user_info = await message.bot.get_chat(target_id)
-    operations = select_user_operations(target_id)
-    overall_balance = sum(operations) if operations else 0
-    items_count = select_user_items(target_id)
-    role = check_role_name_by_id(user.role_id)
-    referrals = check_user_referrals(user.telegram_id)
-
-    # Get referral earnings stats for the user
-    earnings_stats = get_referral_earnings_stats(target_id)
+    overall_balance = user.total_topups
+    items_count = user.purchases_count
+    role = user.role_name
+    referrals = user.referrals_count
     has_referrals = referrals > 0
-    has_earnings = earnings_stats['total_earnings_count'] > 0
+    has_earnings = user.earnings_count > 0
 
     # Action buttons
     actions: list[tuple[str, str]] = []
@@ -116,10 +113,10 @@ async def check_user_data(message: Message, state: FSMContext):
     if has_earnings:
         lines.append('')
         lines.append(localize('referrals.stats.template',
-                              active_count=earnings_stats['active_referrals_count'],
-                              total_earned=int(earnings_stats['total_amount']),
-                              total_original=int(earnings_stats['total_original_amount']),
-                              earnings_count=earnings_stats['total_earnings_count'],
+                              active_count=user.active_referrals_count,
+                              total_earned=int(user.earnings_amount),
+                              total_original=int(user.earnings_original_amount),
+                              earnings_count=user.earnings_count,
                               currency=EnvKeys.PAY_CURRENCY))
 
     await message.answer(
@@ -131,7 +128,7 @@ async def check_user_data(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith('check-user_'), HasPermissionFilter(Permission.USERS_MANAGE))
-async def user_profile_view(call: CallbackQuery):
+async def user_profile_view(call: CallbackQuery, session: AsyncSession):
     """
     Shows admin view of user profile + actions.
     """
@@ -142,23 +139,18 @@ async def user_profile_view(call: CallbackQuery):
         await call.answer(localize('errors.invalid_data'), show_alert=True)
         return
 
-    user = check_user(target_id)
+    user = await get_user_summary(target_id, session=session)
     if not user:
         await call.answer(localize('admin.users.not_found'), show_alert=True)
         return
 
     user_info = await call.message.bot.get_chat(target_id)
-
-    operations = select_user_operations(target_id)
-    overall_balance = sum(operations) if operations else 0
-    items_count = select_user_items(target_id)
-    role = check_role_name_by_id(user.role_id)
-    referrals = check_user_referrals(user.telegram_id)
-
-    # Get referral earnings stats for the user
-    earnings_stats = get_referral_earnings_stats(target_id)
+    overall_balance = user.total_topups
+    items_count = user.purchases_count
+    role = user.role_name
+    referrals = user.referrals_count
     has_referrals = referrals > 0
-    has_earnings = earnings_stats['total_earnings_count'] > 0
+    has_earnings = user.earnings_count > 0
 
     # Action buttons
     actions: list[tuple[str, str]] = []
@@ -205,10 +197,10 @@ async def user_profile_view(call: CallbackQuery):
     if has_earnings:
         lines.append('')
         lines.append(localize('referrals.stats.template',
-                              active_count=earnings_stats['active_referrals_count'],
-                              total_earned=int(earnings_stats['total_amount']),
-                              total_original=int(earnings_stats['total_original_amount']),
-                              earnings_count=earnings_stats['total_earnings_count'],
+                              active_count=user.active_referrals_count,
+                              total_earned=int(user.earnings_amount),
+                              total_original=int(user.earnings_original_amount),
+                              earnings_count=user.earnings_count,
                               currency=EnvKeys.PAY_CURRENCY))
 
     await call.message.edit_text(
@@ -513,7 +505,7 @@ async def user_items_callback_handler(call: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith('set-admin_'), HasPermissionFilter(Permission.ADMINS_MANAGE))
-async def process_admin_for_purpose(call: CallbackQuery):
+async def process_admin_for_purpose(call: CallbackQuery, session: AsyncSession):
     """
     Assigns ADMIN role to the user.
     """
@@ -524,12 +516,12 @@ async def process_admin_for_purpose(call: CallbackQuery):
         await call.answer(localize('errors.invalid_data'), show_alert=True)
         return
 
-    db_user = check_user(user_id)
+    db_user = await check_user(user_id, session=session)
     if not db_user:
         await call.answer(localize('admin.users.not_found'), show_alert=True)
         return
 
-    role_name = check_role_name_by_id(db_user.role_id)
+    role_name = await check_role_name_by_id(db_user.role_id, session=session)
     if role_name == 'OWNER':
         await call.answer(localize('admin.users.cannot_change_owner'), show_alert=True)
         return
@@ -543,11 +535,12 @@ async def process_admin_for_purpose(call: CallbackQuery):
         reply_markup=back(f'check-user_{user_id}')
     )
     try:
-        await call.message.bot.send_message(
-            chat_id=user_id,
-            text=localize('admin.users.set_admin.notify'),
-            reply_markup=close()
-        )
+        with outbound_priority(Priority.NOTIFICATION):
+            await call.message.bot.send_message(
+                chat_id=user_id,
+                text=localize('admin.users.set_admin.notify'),
+                reply_markup=close()
+            )
     except Exception:
         pass
 
@@ -559,7 +552,7 @@ async def process_admin_for_purpose(call: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith('remove-admin_'), HasPermissionFilter(Permission.ADMINS_MANAGE))
-async def process_admin_for_remove(call: CallbackQuery):
+async def process_admin_for_remove(call: CallbackQuery, session: AsyncSession):
     """
     Revokes ADMIN role from the user (sets USER).
     """
@@ -570,12 +563,12 @@ async def process_admin_for_remove(call: CallbackQuery):
         await call.answer(localize('errors.invalid_data'), show_alert=True)
         return
 
-    db_user = check_user(user_id)
+    db_user = await check_user(user_id, session=session)
     if not db_user:
         await call.answer(localize('admin.users.not_found'), show_alert=True)
         return
 
-    role_name = check_role_name_by_id(db_user.role_id)
+    role_name = await check_role_name_by_id(db_user.role_id, session=session)
     if role_name == 'OWNER':
         await call.answer(localize('admin.users.cannot_change_owner'), show_alert=True)
         return
@@ -589,11 +582,12 @@ async def process_admin_for_remove(call: CallbackQuery):
         reply_markup=back(f'check-user_{user_id}')
     )
     try:
-        await call.message.bot.send_message(
-            chat_id=user_id,
-            text=localize('admin.users.remove_admin.notify'),
-            reply_markup=close()
-        )
+        with outbound_priority(Priority.NOTIFICATION):
+            await call.message.bot.send_message(
+                chat_id=user_id,
+                text=localize('admin.users.remove_admin.notify'),
+                reply_markup=close()
+            )
     except Exception:
         pass
 
@@ -668,19 +662,20 @@ async def process_replenish_user_balance(message: Message, state: FSMContext):
         f"{user_id} ({user_info.first_name}) by {amount}"
     )
     try:
-        await message.bot.send_message(
-            chat_id=user_id,
-            text=localize('admin.users.balance.topped.notify', amount=amount, currency=EnvKeys.PAY_CURRENCY),
-            reply_markup=close()
-        )
+        with outbound_priority(Priority.NOTIFICATION):
+            await message.bot.send_message(
+                chat_id=user_id,
+                text=localize('admin.users.balance.topped.notify', amount=amount, currency=EnvKeys.PAY_CURRENCY),
+                reply_markup=close()
+            )
     except Exception:
         pass
     await state.clear()
 
 
 @router.callback_query(F.data.startswith('check-user_'), HasPermissionFilter(permission=Permission.USERS_MANAGE))
-async def check_user_profile_again(call: CallbackQuery):
+async def check_user_profile_again(call: CallbackQuery, session: AsyncSession):
     """
     Re-uses user_profile_view to show the profile again.
     """
-    await user_profile_view(call)
+    await user_profile_view(call, session)
@@ -3,13 +3,14 @@ import datetime
 from decimal import Decimal, ROUND_HALF_UP
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message, PreCheckoutQuery, SuccessfulPayment
+from aiogram.types import CallbackQuery, Message, PreCheckoutQuery, SuccessfulPayment, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 
-from bot.database.methods import get_user_referral, buy_item_transaction, process_payment_with_referral
-from bot.keyboards import back, payment_menu, close, get_payment_choice
+from bot.database.methods import get_user_referral, buy_item_transaction, process_payment_with_referral, \
+    invalidate_item_card
+from bot.keyboards import back, payment_menu, close, get_payment_choice, BUY_QUANTITIES, BUY_PREFIX
 from bot.logger_mesh import audit_logger
-from bot.misc import EnvKeys
+from bot.misc import EnvKeys, Priority, outbound_priority
 from bot.handlers.other import _any_payment_method_enabled
 from bot.misc.payment import CryptoPayAPI, send_stars_invoice, send_fiat_invoice
 from bot.filters import ValidAmountFilter
@@ -188,7 +189,7 @@ async def checking_payment(call: CallbackQuery, state: FSMContext):
             # Use transactional payment processing
             used_transaction_version = False
 
-            success, error_msg = process_payment_with_referral(
+            success, error_msg = await process_payment_with_referral(
                 user_id=user_id,
                 amount=Decimal(balance_amount),
                 provider="cryptopay",
@@ -213,15 +214,16 @@ async def checking_payment(call: CallbackQuery, state: FSMContext):
                         Decimal(EnvKeys.REFERRAL_PERCENT) / Decimal(100) * Decimal(balance_amount)
                     )
                     if referral_amount > 0:
-                        await call.bot.send_message(
-                            referral_id,
-                            localize('payments.referral.bonus',
-                                     amount=referral_amount,
-                                     name=call.from_user.first_name,
-                                     id=call.from_user.id,
-                                     currency=EnvKeys.PAY_CURRENCY),
-                            reply_markup=close()
-                        )
+                        with outbound_priority(Priority.NOTIFICATION):
+                            await call.bot.send_message(
+                                referral_id,
+                                localize('payments.referral.bonus',
+                                         amount=referral_amount,
+                                         name=call.from_user.first_name,
+                                         id=call.from_user.id,
+                                         currency=EnvKeys.PAY_CURRENCY),
+                                reply_markup=close()
+                            )
                 except Exception:
                     pass
 
@@ -307,7 +309,7 @@ async def successful_payment_handler(message: Message):
     external_id = sp.telegram_payment_charge_id or sp.provider_payment_charge_id or f"{provider}:{user_id}:{sp.total_amount}:{datetime.datetime.now().timestamp()}"
 
 
-    success, error_msg = process_payment_with_referral(
+    success, error_msg = await process_payment_with_referral(
         user_id=user_id,
         amount=Decimal(amount),
         provider=provider,
@@ -331,15 +333,16 @@ async def successful_payment_handler(message: Message):
                 Decimal(EnvKeys.REFERRAL_PERCENT) / Decimal(100) * Decimal(amount)
             )
             if referral_operation > 0:
-                await message.bot.send_message(
-                    referral_id,
-                    localize('payments.referral.bonus',
-                             amount=referral_operation,
-                             currency=EnvKeys.PAY_CURRENCY,
-                             name=message.from_user.first_name,
-                             id=message.from_user.id),
-                    reply_markup=close()
-                )
+                with outbound_priority(Priority.NOTIFICATION):
+                    await message.bot.send_message(
+                        referral_id,
+                        localize('payments.referral.bonus',
+                                 amount=referral_operation,
+                                 currency=EnvKeys.PAY_CURRENCY,
+                                 name=message.from_user.first_name,
+                                 id=message.from_user.id),
+                        reply_markup=close()
+                    )
         except Exception:
             pass
 
@@ -362,19 +365,28 @@ async def successful_payment_handler(message: Message):
 
 
 # --- Buy an item
-@router.callback_query(F.data.startswith('buy_'))
+@router.callback_query(F.data.startswith(BUY_PREFIX))
 async def buy_item_callback_handler(call: CallbackQuery):
     """
     Processing the purchase of goods with full transactional security.
+    Format: buyq_{quantity}_{version}_{item_name}, version being that of the price shown on the card.
     """
-    item_name = call.data[4:]
+    parts = call.data[len(BUY_PREFIX):].split('_', 2)
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+        await call.answer(localize("errors.invalid_data"), show_alert=True)
+        return
+    quantity, version, item_name = int(parts[0]), int(parts[1]), parts[2]
     user_id = call.from_user.id
 
+    if not item_name or not 1 <= quantity <= max(BUY_QUANTITIES):
+        await call.answer(localize("errors.invalid_data"), show_alert=True)
+        return
+
     # Show the processing indicator
     await call.answer(localize("shop.purchase.processing"))
 
     # Execute a transactional purchase
-    success, message, purchase_data = buy_item_transaction(user_id, item_name)
+    success, message, purchase_data = await buy_item_transaction(user_id, item_name, quantity, version=version)
 
     if not success:
         # Handling various errors
@@ -398,6 +410,13 @@ async def buy_item_callback_handler(call: CallbackQuery):
                 localize("shop.out_of_stock"),
                 reply_markup=back(f'item_{item_name}')
             )
+        elif message == "price_changed":
+            # The card this process showed may be the stale one
+            invalidate_item_card(item_name)
+            await call.message.edit_text(
+                localize("shop.purchase.fail.price_changed"),
+                reply_markup=back(f'item_{item_name}')
+            )
         else:
             # General error
             await call.message.edit_text(
@@ -410,25 +429,37 @@ async def buy_item_callback_handler(call: CallbackQuery):
             )
         return
 
-    # Successful purchase
-    await call.message.edit_text(
-        localize(
-            'shop.purchase.success',
-            balance=purchase_data['new_balance'],
-            value=purchase_data['value'],
-            currency=EnvKeys.PAY_CURRENCY
-        ),
-        parse_mode='HTML',
-        reply_markup=back(f'item_{item_name}')
+    # Successful purchase: values in the message, or in a document if they don't fit into one
+    text = localize(
+        'shop.purchase.success',
+        balance=purchase_data['new_balance'],
+        value=purchase_data['value'],
+        currency=EnvKeys.PAY_CURRENCY
     )
+    if len(text) <= 4096:
+        await call.message.edit_text(text, parse_mode='HTML', reply_markup=back(f'item_{item_name}'))
+    else:
+        await call.message.edit_text(
+            localize(
+                'shop.purchase.success_file',
+                quantity=quantity,
+                balance=purchase_data['new_balance'],
+                currency=EnvKeys.PAY_CURRENCY
+            ),
+            parse_mode='HTML',
+            reply_markup=back(f'item_{item_name}')
+        )
+        await call.message.answer_document(
+            BufferedInputFile(purchase_data['value'].encode(), filename=f"{item_name}.txt")
+        )
 
     try:
         user_info = await call.bot.get_chat(user_id)
         audit_logger.info(
             f"user {user_id} ({user_info.first_name}) "
-            f"bought 1 item from position: {item_name} "
+            f"bought {quantity} item(s) from position: {item_name} "
             f"for {purchase_data['price']} {EnvKeys.PAY_CURRENCY} "
-            f"(unique_id: {purchase_data['unique_id']})"
+            f"(unique_ids: {', '.join(map(str, purchase_data['unique_ids']))})"
         )
     except Exception:
         pass
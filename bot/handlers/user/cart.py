@@ -0,0 +1,160 @@
+from decimal import Decimal
+
+from aiogram import Router, F
+from aiogram.types import CallbackQuery, BufferedInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.methods import (
+    get_cart, add_to_cart, remove_from_cart, clear_cart, checkout_cart_transaction
+)
+from bot.keyboards import back, cart_keyboard
+from bot.logger_mesh import audit_logger
+from bot.misc import EnvKeys
+from bot.i18n import localize
+
+router = Router()
+
+
+async def _show_cart(call: CallbackQuery, session: AsyncSession | None = None):
+    """
+    Render the user's cart into the current message.
+    """
+    lines = await get_cart(call.from_user.id, session)
+    if not lines:
+        await call.message.edit_text(localize("cart.empty"), reply_markup=cart_keyboard([]))
+        return
+
+    total = sum(Decimal(str(line["price"])) * line["quantity"] for line in lines)
+    text = localize(
+        "cart.title",
+        lines="\n".join(
+            localize(
+                "cart.line",
+                name=line["item_name"],
+                quantity=line["quantity"],
+                amount=Decimal(str(line["price"])) * line["quantity"],
+                currency=EnvKeys.PAY_CURRENCY,
+            )
+            for line in lines
+        ),
+        total=total,
+        currency=EnvKeys.PAY_CURRENCY,
+    )
+    await call.message.edit_text(
+        text, parse_mode="HTML", reply_markup=cart_keyboard(line["item_name"] for line in lines)
+    )
+
+
+@router.callback_query(F.data == "cart")
+async def cart_callback_handler(call: CallbackQuery, session: AsyncSession):
+    """
+    Show the cart.
+    """
+    await _show_cart(call, session)
+
+
+@router.callback_query(F.data.startswith("cart-add_"))
+async def cart_add_callback_handler(call: CallbackQuery):
+    """
+    Add one unit of the position to the cart.
+    """
+    item_name = call.data[len("cart-add_"):]
+    quantity = await add_to_cart(call.from_user.id, item_name)
+    if not quantity:
+        await call.answer(localize("shop.item.not_found"), show_alert=True)
+        return
+    await call.answer(localize("cart.added", name=item_name, quantity=quantity))
+
+
+@router.callback_query(F.data.startswith("cart-del_"))
+async def cart_remove_callback_handler(call: CallbackQuery):
+    """
+    Remove a line from the cart.
+    """
+    await remove_from_cart(call.from_user.id, call.data[len("cart-del_"):])
+    await _show_cart(call)
+
+
+@router.callback_query(F.data == "cart-clear")
+async def cart_clear_callback_handler(call: CallbackQuery):
+    """
+    Empty the cart.
+    """
+    await clear_cart(call.from_user.id)
+    await _show_cart(call)
+
+
+@router.callback_query(F.data == "cart-checkout")
+async def cart_checkout_callback_handler(call: CallbackQuery):
+    """
+    Buy the whole cart in one transaction (all or nothing).
+    """
+    user_id = call.from_user.id
+    await call.answer(localize("shop.purchase.processing"))
+
+    success, message, order = await checkout_cart_transaction(user_id)
+
+    if not success:
+        if message == "cart_empty":
+            await call.message.edit_text(localize("cart.empty"), reply_markup=cart_keyboard([]))
+        elif message == "user_not_found":
+            await call.message.edit_text(
+                localize("shop.purchase.fail.user_not_found"),
+                reply_markup=back('back_to_menu')
+            )
+        elif message == "item_not_found":
+            await call.message.edit_text(localize("shop.item.not_found"), reply_markup=back('cart'))
+        elif message == "insufficient_funds":
+            await call.message.edit_text(localize("shop.insufficient_funds"), reply_markup=back('cart'))
+        elif message == "out_of_stock":
+            await call.message.edit_text(
+                localize("cart.out_of_stock", name=order["item_name"]),
+                reply_markup=back('cart')
+            )
+        elif message == "price_changed":
+            await call.message.edit_text(
+                localize("shop.purchase.fail.price_changed"),
+                reply_markup=back('cart')
+            )
+        else:
+            await call.message.edit_text(
+                localize("shop.purchase.fail.general", message=message),
+                reply_markup=back('cart')
+            )
+            audit_logger.error(f"Checkout error for user {user_id}: {message}")
+        return
+
+    # Values of every line in the message, or in a document if they don't fit into one
+    values = "\n\n".join(
+        f"<b>{name}</b>\n" + "\n".join(line["values"]) for name, line in order["lines"].items()
+    )
+    text = localize(
+        'cart.checkout.success',
+        balance=order['new_balance'],
+        values=values,
+        currency=EnvKeys.PAY_CURRENCY
+    )
+    if len(text) <= 4096:
+        await call.message.edit_text(text, parse_mode='HTML', reply_markup=back('back_to_menu'))
+    else:
+        await call.message.edit_text(
+            localize('cart.checkout.success_file', balance=order['new_balance'], currency=EnvKeys.PAY_CURRENCY),
+            parse_mode='HTML',
+            reply_markup=back('back_to_menu')
+        )
+        document = "\n\n".join(
+            f"{name}\n" + "\n".join(line["values"]) for name, line in order["lines"].items()
+        )
+        await call.message.answer_document(BufferedInputFile(document.encode(), filename="order.txt"))
+
+    try:
+        user_info = await call.bot.get_chat(user_id)
+        audit_logger.info(
+            f"user {user_id} ({user_info.first_name}) checked out the cart for {order['total']} "
+            f"{EnvKeys.PAY_CURRENCY}: " + "; ".join(
+                f"{name} x{line['quantity']} (unique_ids: {', '.join(map(str, line['unique_ids']))})"
+                for name, line in order["lines"].items()
+            )
+        )
+    except Exception:
+        pass
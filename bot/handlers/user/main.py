@@ -2,13 +2,13 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.enums.chat_type import ChatType
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from urllib.parse import urlparse
 import datetime
 
 from bot.database.methods import (
-    select_max_role_id, create_user, check_role, check_user,
-    select_user_operations, select_user_items
+    select_max_role_id, create_user, check_role, check_user, get_user_summary
 )
 from bot.handlers.other import check_sub_channel
 from bot.keyboards import main_menu, back, profile_keyboard, check_sub
@@ -19,7 +19,7 @@ router = Router()
 
 
 @router.message(F.text.startswith('/start'))
-async def start(message: Message, state: FSMContext):
+async def start(message: Message, state: FSMContext, session: AsyncSession):
     """
     Handle /start:
     - Ensure user exists (register if new)
@@ -37,7 +37,7 @@ async def start(message: Message, state: FSMContext):
     user_role = owner_max_role if str(user_id) == EnvKeys.OWNER_ID else 1
 
     # registration_date is DateTime
-    create_user(
+    await create_user(
         telegram_id=int(user_id),
         registration_date=datetime.datetime.now(),
         referral_id=referral_id,
@@ -52,7 +52,7 @@ async def start(message: Message, state: FSMContext):
                            if parsed.path else channel_url.replace("https://t.me/", "").replace("t.me/", "").lstrip('@')
                        ) or None
 
-    role_data = check_role(user_id)
+    role_data = await check_role(user_id, session=session)
 
     # Optional subscription check
     try:
@@ -74,12 +74,12 @@ async def start(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "back_to_menu")
-async def back_to_menu_callback_handler(call: CallbackQuery, state: FSMContext):
+async def back_to_menu_callback_handler(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Return user to the main menu.
     """
     user_id = call.from_user.id
-    user = check_user(user_id)
+    user = await check_user(user_id, session=session)
 
     channel_url = EnvKeys.CHANNEL_URL or ""
     parsed = urlparse(channel_url)
@@ -107,17 +107,16 @@ async def rules_callback_handler(call: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "profile")
-async def profile_callback_handler(call: CallbackQuery, state: FSMContext):
+async def profile_callback_handler(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Send profile info (balance, purchases count, id, etc.).
     """
     user_id = call.from_user.id
     tg_user = call.from_user
-    user_info = check_user(user_id)
-    balance = user_info.balance
-    operations = select_user_operations(user_id)
-    overall_balance = sum(operations) if operations else 0
-    items = select_user_items(user_id)
+    summary = await get_user_summary(user_id, session=session)
+    balance = summary.balance
+    overall_balance = summary.total_topups
+    items = summary.purchases_count
     referral = EnvKeys.REFERRAL_PERCENT
 
     markup = profile_keyboard(referral, items)
@@ -133,7 +132,7 @@ async def profile_callback_handler(call: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "sub_channel_done")
-async def check_sub_to_channel(call: CallbackQuery, state: FSMContext):
+async def check_sub_to_channel(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Re-check channel subscription after user clicks "Check".
     """
@@ -149,7 +148,7 @@ async def check_sub_to_channel(call: CallbackQuery, state: FSMContext):
     if channel_username:
         chat_member = await call.bot.get_chat_member(chat_id='@' + channel_username, user_id=user_id)
         if await check_sub_channel(chat_member):
-            user = check_user(user_id)
+            user = await check_user(user_id, session=session)
             markup = main_menu(user.role_id, channel_username, helper)
             await call.message.edit_text(localize("menu.title"), reply_markup=markup)
             await state.clear()
@@ -3,6 +3,7 @@ from functools import partial
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database.methods import (
     check_user_referrals, get_referral_earnings_stats, get_one_referral_earning, query_user_referrals,
@@ -17,16 +18,16 @@ router = Router()
 
 
 @router.callback_query(F.data == "referral_system")
-async def referral_callback_handler(call: CallbackQuery, state: FSMContext):
+async def referral_callback_handler(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     """
     Show referral info, personal invite link, and additional buttons.
     """
     user_id = call.from_user.id
-    referrals_count = check_user_referrals(user_id)
+    referrals_count = await check_user_referrals(user_id, session=session)
     referral_percent = EnvKeys.REFERRAL_PERCENT
     bot_username = await get_bot_info(call)
 
-    earnings_stats = get_referral_earnings_stats(user_id)
+    earnings_stats = await get_referral_earnings_stats(user_id, session=session)
 
     has_referrals = referrals_count > 0
     has_earnings = earnings_stats['total_earnings_count'] > 0
@@ -181,6 +182,7 @@ async def referral_earnings_handler(call: CallbackQuery, state: FSMContext):
 
     # Save state
     await state.update_data(ref_earnings_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data == "view_all_earnings")
@@ -223,6 +225,7 @@ async def view_all_earnings_handler(call: CallbackQuery, state: FSMContext):
 
     # Save state
     await state.update_data(all_earnings_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith("all_earnings_page_"))
@@ -266,6 +269,7 @@ async def all_earnings_pagination_handler(call: CallbackQuery, state: FSMContext
 
     # Update state
     await state.update_data(all_earnings_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith("earning_detail:"))
@@ -5,8 +5,7 @@ from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from bot.database.methods import (
-    get_bought_item_info, get_item_info, select_item_values_amount,
-    check_value, query_categories, query_user_bought_items
+    get_bought_item_info, get_item_card, query_categories, query_user_bought_items
 )
 from bot.keyboards import item_info, back, lazy_paginated_keyboard
 from bot.i18n import localize
@@ -39,6 +38,7 @@ async def shop_callback_handler(call: CallbackQuery, state: FSMContext):
     # Save paginator state
     await state.update_data(categories_paginator=paginator.get_state())
     await state.set_state(ShopStates.viewing_categories)
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('categories-page_'))
@@ -73,6 +73,7 @@ async def navigate_categories(call: CallbackQuery, state: FSMContext):
 
     # Update state
     await state.update_data(categories_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('category_'))
@@ -115,6 +116,7 @@ async def items_list_callback_handler(call: CallbackQuery, state: FSMContext):
         current_category=category_name
     )
     await state.set_state(ShopStates.viewing_goods)
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('goods-page_'), ShopStates.viewing_goods)
@@ -157,6 +159,7 @@ async def navigate_goods(call: CallbackQuery, state: FSMContext):
 
     # Update state
     await state.update_data(goods_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('item_'))
@@ -168,49 +171,27 @@ async def item_info_callback_handler(call: CallbackQuery):
     # Parse callback data
     callback_data = call.data[5:]  # Remove 'item_'
 
-    # Extract item name, category and back data
+    # Extract item name and back data
     if '_goods-page_' in callback_data:
         # Split by the last occurrence of _goods-page_
         item_and_cat, back_page_data = callback_data.rsplit('_goods-page_', 1)
-        # Now split item_and_cat to get item name and category
-        parts = item_and_cat.rsplit('_', 1)
-        if len(parts) == 2:
-            item_name, category = parts
-        else:
-            item_name = item_and_cat
-            category = ""
+        # The category after the item name is not needed: the card is looked up by name
+        item_name = item_and_cat.rsplit('_', 1)[0]
         back_data = f"goods-page_{back_page_data}"
     else:
         item_name = callback_data
         back_data = "shop"
-        category = ""
 
-    item_info_data = get_item_info(item_name)
-    if not item_info_data:
+    # Pre-rendered card from the catalog cache (no DB round trip while the catalog is unchanged)
+    card = await get_item_card(item_name)
+    if not card:
         await call.answer(localize("shop.item.not_found"), show_alert=True)
         return
 
-    # If couldn't extract category from callback, get it from item info
-    if not category:
-        category = item_info_data.get('category_name', '')
+    markup = item_info(item_name, back_data, max_quantity=1 if card.is_infinite else card.stock_count,
+                       version=card.version)
 
-    quantity_line = (
-        localize("shop.item.quantity_unlimited")
-        if check_value(item_name)
-        else localize("shop.item.quantity_left", count=select_item_values_amount(item_name))
-    )
-
-    markup = item_info(item_name, back_data)
-
-    await call.message.edit_text(
-        "\n".join([
-            localize("shop.item.title", name=item_name),
-            localize("shop.item.description", description=item_info_data["description"]),
-            localize("shop.item.price", amount=item_info_data["price"], currency=EnvKeys.PAY_CURRENCY),
-            quantity_line,
-        ]),
-        reply_markup=markup,
-    )
+    await call.message.edit_text(card.text, reply_markup=markup)
 
 
 @router.callback_query(F.data == "bought_items")
@@ -237,6 +218,7 @@ async def bought_items_callback_handler(call: CallbackQuery, state: FSMContext):
 
     # Save paginator state
     await state.update_data(bought_items_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('bought-goods-page_'))
@@ -286,6 +268,7 @@ async def navigate_bought_items(call: CallbackQuery, state: FSMContext):
 
     # Update state
     await state.update_data(bought_items_paginator=paginator.get_state())
+    await paginator.prefetch(state)
 
 
 @router.callback_query(F.data.startswith('bought-item:'))
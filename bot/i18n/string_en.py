@@ -10,6 +10,12 @@ TRANSLATIONS: dict[str, str] = {
     "btn.to_menu": "🏠 Menu",
     "btn.close": "✖ Close",
     "btn.buy": "🛒 Buy",
+    "btn.buy_quantity": "🛒 ×{count}",
+    "btn.cart_add": "🧺 Add to cart",
+    "btn.cart": "🧺 Cart",
+    "btn.cart_remove": "❌ {name}",
+    "btn.checkout": "✅ Checkout",
+    "btn.cart_clear": "🗑 Clear",
     "btn.yes": "✅ Yes",
     "btn.no": "❌ No",
     "btn.check": "🔄 Check",
@@ -105,6 +111,7 @@ TRANSLATIONS: dict[str, str] = {
     "admin.goods.show_items": "📄 show goods in item",
     "admin.goods.add.prompt.name": "Enter the item name",
     "admin.goods.add.name.exists": "❌ Item cannot be created (it already exists)",
+    "admin.goods.add.name.too_long": "❌ The name is too long: at most {max} bytes (UTF-8)",
     "admin.goods.add.prompt.description": "Enter item description:",
     "admin.goods.add.prompt.price": "Enter item price (number in {currency}):",
     "admin.goods.add.price.invalid": "⚠️ Invalid price. Please enter a number.",
@@ -113,9 +120,13 @@ TRANSLATIONS: dict[str, str] = {
     "admin.goods.add.infinity.question": "Should this item have infinite values? (everyone will receive the same value copy)",
     "admin.goods.add.values.prompt_multi": (
         "Send product values one per message.\n"
+        "Or send a .txt/.csv file with one value per line.\n"
         "When finished, press “Add the listed goods”."
     ),
     "admin.goods.add.values.added": "✅ Value “{value}” added to the list ({count} pcs).",
+    "admin.goods.upload.progress": "⏳ Lines processed: {n}…",
+    "admin.goods.upload.unsupported": "⚠️ Only .txt and .csv files are supported",
+    "admin.goods.upload.failed": "❌ Could not read the file to the end: {error}",
     "admin.goods.add.result.created": "✅ Item has been created.",
     "admin.goods.add.result.added": "📦 Added values: <b>{n}</b>",
     "admin.goods.add.result.skipped_db_dup": "↩️ Skipped (already in DB): <b>{n}</b>",
@@ -235,7 +246,16 @@ TRANSLATIONS: dict[str, str] = {
     "shop.item.quantity_left": "Quantity — {count} pcs",
     "shop.insufficient_funds": "❌ Insufficient funds",
     "shop.out_of_stock": "❌ Item is out of stock",
+    "shop.purchase.fail.price_changed": "❌ The item price has changed, please check it and try again",
     "shop.purchase.success": "✅ Item purchased. <b>Balance</b>: <i>{balance}</i> {currency}\n\n{value}",
+    "shop.purchase.success_file": "✅ {quantity} items purchased. <b>Balance</b>: <i>{balance}</i> {currency}\n\nThe values are in the file below",
+    "cart.title": "🧺 Cart:\n\n{lines}\n\n<b>Total</b>: {total} {currency}",
+    "cart.line": "{name} × {quantity} — {amount} {currency}",
+    "cart.empty": "🧺 Your cart is empty",
+    "cart.added": "🧺 «{name}» in cart: {quantity} pcs",
+    "cart.out_of_stock": "❌ Not enough «{name}» in stock — remove it from the cart or try later",
+    "cart.checkout.success": "✅ Order paid. <b>Balance</b>: <i>{balance}</i> {currency}\n\n{values}",
+    "cart.checkout.success_file": "✅ Order paid. <b>Balance</b>: <i>{balance}</i> {currency}\n\nThe values are in the file below",
     # === Purchases ===
     "purchases.title": "Purchased items:",
     "purchases.pagination.invalid": "Invalid pagination data",
@@ -10,6 +10,12 @@ TRANSLATIONS : dict[str, str] = {
         "btn.to_menu": "🏠 В меню",
         "btn.close": "✖ Закрыть",
         "btn.buy": "🛒 Купить",
+        "btn.buy_quantity": "🛒 ×{count}",
+        "btn.cart_add": "🧺 В корзину",
+        "btn.cart": "🧺 Корзина",
+        "btn.cart_remove": "❌ {name}",
+        "btn.checkout": "✅ Оформить заказ",
+        "btn.cart_clear": "🗑 Очистить",
         "btn.yes": "✅ Да",
         "btn.no": "❌ Нет",
         "btn.check": "🔄 Проверить",
@@ -116,6 +122,7 @@ TRANSLATIONS : dict[str, str] = {
         "admin.goods.show_items": "📄 Показать товары в позиции",
         "admin.goods.add.prompt.name": "Введите название позиции",
         "admin.goods.add.name.exists": "❌ Позиция не может быть создана (такая позиция уже существует)",
+        "admin.goods.add.name.too_long": "❌ Название слишком длинное: не больше {max} байт (UTF-8)",
         "admin.goods.add.prompt.description": "Введите описание для позиции:",
         "admin.goods.add.prompt.price": "Введите цену для позиции (число в {currency}):",
         "admin.goods.add.price.invalid": "⚠️ Некорректное значение цены. Введите число.",
@@ -124,9 +131,13 @@ TRANSLATIONS : dict[str, str] = {
         "admin.goods.add.infinity.question": "У этой позиции будут бесконечные товары? (всем будет высылаться одна копия значения)",
         "admin.goods.add.values.prompt_multi": (
             "Введите товары для позиции по одному сообщению.\n"
+            "Или отправьте файл .txt/.csv — по одному товару в строке.\n"
             "Когда закончите ввод — нажмите «Добавить указанные товары»."
         ),
         "admin.goods.add.values.added": "✅ Товар «{value}» добавлен в список ({count} шт.)",
+        "admin.goods.upload.progress": "⏳ Обработано строк: {n}…",
+        "admin.goods.upload.unsupported": "⚠️ Поддерживаются только файлы .txt и .csv",
+        "admin.goods.upload.failed": "❌ Не удалось дочитать файл: {error}",
         "admin.goods.add.result.created": "✅ Позиция создана.",
         "admin.goods.add.result.added": "📦 Добавлено товаров: <b>{n}</b>",
         "admin.goods.add.result.skipped_db_dup": "↩️ Пропущено (уже были в БД): <b>{n}</b>",
@@ -252,7 +263,16 @@ TRANSLATIONS : dict[str, str] = {
         "shop.item.quantity_left": "Количество — {count} шт.",
         "shop.insufficient_funds": "❌ Недостаточно средств",
         "shop.out_of_stock": "❌ Товара нет в наличии",
+        "shop.purchase.fail.price_changed": "❌ Цена товара изменилась, проверьте её и попробуйте снова",
         "shop.purchase.success": "✅ Товар куплен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\n{value}",
+        "shop.purchase.success_file": "✅ Куплено {quantity} шт. <b>Баланс</b>: <i>{balance}</i> {currency}\n\nТовары — в файле ниже",
+        "cart.title": "🧺 Корзина:\n\n{lines}\n\n<b>Итого</b>: {total} {currency}",
+        "cart.line": "{name} × {quantity} — {amount} {currency}",
+        "cart.empty": "🧺 Корзина пуста",
+        "cart.added": "🧺 «{name}» в корзине: {quantity} шт.",
+        "cart.out_of_stock": "❌ Недостаточно товара «{name}» — уберите его из корзины или попробуйте позже",
+        "cart.checkout.success": "✅ Заказ оплачен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\n{values}",
+        "cart.checkout.success_file": "✅ Заказ оплачен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\nТовары — в файле ниже",
 
         # === Purchases ===
         "purchases.title": "Купленные товары:",
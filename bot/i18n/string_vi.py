@@ -10,6 +10,12 @@ TRANSLATIONS: dict[str, str] = {
     "btn.to_menu": "🏠 Menu",
     "btn.close": "✖ Đóng",
     "btn.buy": "🛒 Mua",
+    "btn.buy_quantity": "🛒 ×{count}",
+    "btn.cart_add": "🧺 Thêm vào giỏ",
+    "btn.cart": "🧺 Giỏ hàng",
+    "btn.cart_remove": "❌ {name}",
+    "btn.checkout": "✅ Thanh toán",
+    "btn.cart_clear": "🗑 Xóa giỏ",
     "btn.yes": "✅ Có",
     "btn.no": "❌ Không",
     "btn.check": "🔄 Kiểm tra",
@@ -105,6 +111,7 @@ TRANSLATIONS: dict[str, str] = {
     "admin.goods.show_items": "📄 Hiển thị hàng hóa trong mặt hàng",
     "admin.goods.add.prompt.name": "Nhập tên mặt hàng",
     "admin.goods.add.name.exists": "❌ Không thể tạo mặt hàng (đã tồn tại)",
+    "admin.goods.add.name.too_long": "❌ Tên quá dài: tối đa {max} byte (UTF-8)",
     "admin.goods.add.prompt.description": "Nhập mô tả mặt hàng:",
     "admin.goods.add.prompt.price": "Nhập giá mặt hàng (số tiền bằng {currency}):",
     "admin.goods.add.price.invalid": "⚠️ Giá không hợp lệ. Vui lòng nhập một số.",
@@ -113,9 +120,13 @@ TRANSLATIONS: dict[str, str] = {
     "admin.goods.add.infinity.question": "Mặt hàng này có nên có giá trị vô hạn không? (mọi người sẽ nhận được cùng một bản sao giá trị)",
     "admin.goods.add.values.prompt_multi": (
         "Gửi giá trị sản phẩm từng cái một.\n"
+        "Hoặc gửi tệp .txt/.csv, mỗi dòng một giá trị.\n"
         "Khi hoàn thành, nhấn \"Thêm hàng hóa đã liệt kê\"."
     ),
     "admin.goods.add.values.added": "✅ Giá trị \"{value}\" đã được thêm vào danh sách ({count} cái).",
+    "admin.goods.upload.progress": "⏳ Đã xử lý {n} dòng…",
+    "admin.goods.upload.unsupported": "⚠️ Chỉ hỗ trợ tệp .txt và .csv",
+    "admin.goods.upload.failed": "❌ Không thể đọc hết tệp: {error}",
     "admin.goods.add.result.created": "✅ Mặt hàng đã được tạo.",
     "admin.goods.add.result.added": "📦 Giá trị đã thêm: <b>{n}</b>",
     "admin.goods.add.result.skipped_db_dup": "↩️ Đã bỏ qua (đã có trong DB): <b>{n}</b>",
@@ -235,7 +246,16 @@ TRANSLATIONS: dict[str, str] = {
     "shop.item.quantity_left": "Số lượng — {count} cái",
     "shop.insufficient_funds": "❌ Không đủ tiền",
     "shop.out_of_stock": "❌ Hết hàng",
+    "shop.purchase.fail.price_changed": "❌ Giá mặt hàng đã thay đổi, vui lòng kiểm tra và thử lại",
     "shop.purchase.success": "✅ Đã mua mặt hàng. <b>Số dư</b>: <i>{balance}</i> {currency}\n\n{value}",
+    "shop.purchase.success_file": "✅ Đã mua {quantity} mặt hàng. <b>Số dư</b>: <i>{balance}</i> {currency}\n\nDữ liệu nằm trong tệp bên dưới",
+    "cart.title": "🧺 Giỏ hàng:\n\n{lines}\n\n<b>Tổng</b>: {total} {currency}",
+    "cart.line": "{name} × {quantity} — {amount} {currency}",
+    "cart.empty": "🧺 Giỏ hàng trống",
+    "cart.added": "🧺 «{name}» trong giỏ: {quantity}",
+    "cart.out_of_stock": "❌ Không đủ hàng «{name}» — hãy xóa khỏi giỏ hoặc thử lại sau",
+    "cart.checkout.success": "✅ Đã thanh toán đơn hàng. <b>Số dư</b>: <i>{balance}</i> {currency}\n\n{values}",
+    "cart.checkout.success_file": "✅ Đã thanh toán đơn hàng. <b>Số dư</b>: <i>{balance}</i> {currency}\n\nDữ liệu nằm trong tệp bên dưới",
     # === Purchases ===
     "purchases.title": "Mặt hàng đã mua:",
     "purchases.pagination.invalid": "Dữ liệu phân trang không hợp lệ",
@@ -17,6 +17,12 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "btn.to_menu": "🏠 В меню",
         "btn.close": "✖ Закрыть",
         "btn.buy": "🛒 Купить",
+        "btn.buy_quantity": "🛒 ×{count}",
+        "btn.cart_add": "🧺 В корзину",
+        "btn.cart": "🧺 Корзина",
+        "btn.cart_remove": "❌ {name}",
+        "btn.checkout": "✅ Оформить заказ",
+        "btn.cart_clear": "🗑 Очистить",
         "btn.yes": "✅ Да",
         "btn.no": "❌ Нет",
         "btn.check": "🔄 Проверить",
@@ -152,6 +158,7 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "admin.goods.show_items": "📄 Показать товары в позиции",
         "admin.goods.add.prompt.name": "Введите название позиции",
         "admin.goods.add.name.exists": "❌ Позиция не может быть создана (такая позиция уже существует)",
+        "admin.goods.add.name.too_long": "❌ Название слишком длинное: не больше {max} байт (UTF-8)",
         "admin.goods.add.prompt.description": "Введите описание для позиции:",
         "admin.goods.add.prompt.price": "Введите цену для позиции (число в {currency}):",
         "admin.goods.add.price.invalid": "⚠️ Некорректное значение цены. Введите число.",
@@ -160,9 +167,13 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "admin.goods.add.infinity.question": "У этой позиции будут бесконечные товары? (всем будет высылаться одна копия значения)",
         "admin.goods.add.values.prompt_multi": (
             "Введите товары для позиции по одному сообщению.\n"
+            "Или отправьте файл .txt/.csv — по одному товару в строке.\n"
             "Когда закончите ввод — нажмите «Добавить указанные товары»."
         ),
         "admin.goods.add.values.added": "✅ Товар «{value}» добавлен в список ({count} шт.)",
+        "admin.goods.upload.progress": "⏳ Обработано строк: {n}…",
+        "admin.goods.upload.unsupported": "⚠️ Поддерживаются только файлы .txt и .csv",
+        "admin.goods.upload.failed": "❌ Не удалось дочитать файл: {error}",
         "admin.goods.add.result.created": "✅ Позиция создана.",
         "admin.goods.add.result.added": "📦 Добавлено товаров: <b>{n}</b>",
         "admin.goods.add.result.skipped_db_dup": "↩️ Пропущено (уже были в БД): <b>{n}</b>",
@@ -311,7 +322,16 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "shop.item.quantity_left": "Количество — {count} шт.",
         "shop.insufficient_funds": "❌ Недостаточно средств",
         "shop.out_of_stock": "❌ Товара нет в наличии",
+        "shop.purchase.fail.price_changed": "❌ Цена товара изменилась, проверьте её и попробуйте снова",
         "shop.purchase.success": "✅ Товар куплен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\n{value}",
+        "shop.purchase.success_file": "✅ Куплено {quantity} шт. <b>Баланс</b>: <i>{balance}</i> {currency}\n\nТовары — в файле ниже",
+        "cart.title": "🧺 Корзина:\n\n{lines}\n\n<b>Итого</b>: {total} {currency}",
+        "cart.line": "{name} × {quantity} — {amount} {currency}",
+        "cart.empty": "🧺 Корзина пуста",
+        "cart.added": "🧺 «{name}» в корзине: {quantity} шт.",
+        "cart.out_of_stock": "❌ Недостаточно товара «{name}» — уберите его из корзины или попробуйте позже",
+        "cart.checkout.success": "✅ Заказ оплачен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\n{values}",
+        "cart.checkout.success_file": "✅ Заказ оплачен. <b>Баланс</b>: <i>{balance}</i> {currency}\n\nТовары — в файле ниже",
         "shop.purchase.processing": "⏳ Обрабатываем покупку...",
         "shop.purchase.fail.user_not_found": "❌ Пользователь не найден в системе",
         "shop.purchase.fail.general": "❌ Ошибка при покупке: {message}",
@@ -355,6 +375,12 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "btn.to_menu": "🏠 Menu",
         "btn.close": "✖ Close",
         "btn.buy": "🛒 Buy",
+        "btn.buy_quantity": "🛒 ×{count}",
+        "btn.cart_add": "🧺 Add to cart",
+        "btn.cart": "🧺 Cart",
+        "btn.cart_remove": "❌ {name}",
+        "btn.checkout": "✅ Checkout",
+        "btn.cart_clear": "🗑 Clear",
         "btn.yes": "✅ Yes",
         "btn.no": "❌ No",
         "btn.check": "🔄 Check",
@@ -490,6 +516,7 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "admin.goods.show_items": "📄 show goods in item",
         "admin.goods.add.prompt.name": "Enter the item name",
         "admin.goods.add.name.exists": "❌ Item cannot be created (it already exists)",
+        "admin.goods.add.name.too_long": "❌ The name is too long: at most {max} bytes (UTF-8)",
         "admin.goods.add.prompt.description": "Enter item description:",
         "admin.goods.add.prompt.price": "Enter item price (number in {currency}):",
         "admin.goods.add.price.invalid": "⚠️ Invalid price. Please enter a number.",
@@ -498,9 +525,13 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "admin.goods.add.infinity.question": "Should this item have infinite values? (everyone will receive the same value copy)",
         "admin.goods.add.values.prompt_multi": (
             "Send product values one per message.\n"
+            "Or send a .txt/.csv file with one value per line.\n"
             "When finished, press “Add the listed goods”."
         ),
         "admin.goods.add.values.added": "✅ Value “{value}” added to the list ({count} pcs).",
+        "admin.goods.upload.progress": "⏳ Lines processed: {n}…",
+        "admin.goods.upload.unsupported": "⚠️ Only .txt and .csv files are supported",
+        "admin.goods.upload.failed": "❌ Could not read the file to the end: {error}",
         "admin.goods.add.result.created": "✅ Item has been created.",
         "admin.goods.add.result.added": "📦 Added values: <b>{n}</b>",
         "admin.goods.add.result.skipped_db_dup": "↩️ Skipped (already in DB): <b>{n}</b>",
@@ -649,7 +680,16 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "shop.item.quantity_left": "Quantity — {count} pcs",
         "shop.insufficient_funds": "❌ Insufficient funds",
         "shop.out_of_stock": "❌ Item is out of stock",
+        "shop.purchase.fail.price_changed": "❌ The item price has changed, please check it and try again",
         "shop.purchase.success": "✅ Item purchased. <b>Balance</b>: <i>{balance}</i> {currency}\n\n{value}",
+        "shop.purchase.success_file": "✅ {quantity} items purchased. <b>Balance</b>: <i>{balance}</i> {currency}\n\nThe values are in the file below",
+        "cart.title": "🧺 Cart:\n\n{lines}\n\n<b>Total</b>: {total} {currency}",
+        "cart.line": "{name} × {quantity} — {amount} {currency}",
+        "cart.empty": "🧺 Your cart is empty",
+        "cart.added": "🧺 «{name}» in cart: {quantity} pcs",
+        "cart.out_of_stock": "❌ Not enough «{name}» in stock — remove it from the cart or try later",
+        "cart.checkout.success": "✅ Order paid. <b>Balance</b>: <i>{balance}</i> {currency}\n\n{values}",
+        "cart.checkout.success_file": "✅ Order paid. <b>Balance</b>: <i>{balance}</i> {currency}\n\nThe values are in the file below",
         "shop.purchase.processing": "⏳ Processing the purchase...",
         "shop.purchase.fail.user_not_found": "❌ User not found in the system",
         "shop.purchase.fail.general": "❌ Purchase error: {message}",
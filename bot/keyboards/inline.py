@@ -13,6 +13,7 @@ def main_menu(role: int, channel: str | None = None, helper: str | None = None)
     kb.button(text=localize("btn.shop"), callback_data="shop")
     kb.button(text=localize("btn.rules"), callback_data="rules")
     kb.button(text=localize("btn.profile"), callback_data="profile")
+    kb.button(text=localize("btn.cart"), callback_data="cart")
     if helper:
         kb.button(text=localize("btn.support"), url=f"tg://user?id={helper}")
     if channel:
@@ -99,14 +100,17 @@ async def lazy_paginated_keyboard(
         kb.button(text=item_text(item), callback_data=item_callback(item))
     kb.adjust(1)
 
-    # Navigation
+    # Navigation (an approximate total may be too low, so a full page always allows "next")
     total_pages = await paginator.get_total_pages()
-    if total_pages > 1:
+    approximate = paginator.total_is_approximate
+    has_next = page < total_pages - 1 or (approximate and len(items) == paginator.per_page)
+    if total_pages > 1 or has_next:
         nav_buttons = []
         if page > 0:
             nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"{nav_cb_prefix}{page - 1}"))
-        nav_buttons.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
-        if page < total_pages - 1:
+        pages_text = f"~{total_pages}" if approximate else f"{total_pages}"
+        nav_buttons.append(InlineKeyboardButton(text=f"{page + 1}/{pages_text}", callback_data="noop"))
+        if has_next:
             nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"{nav_cb_prefix}{page + 1}"))
         kb.row(*nav_buttons)
 
@@ -116,14 +120,44 @@ async def lazy_paginated_keyboard(
     return kb.as_markup()
 
 
-def item_info(item_name: str, back_data: str) -> InlineKeyboardMarkup:
+# Quantities offered on the product card; callback data is buyq_{quantity}_{version}_{item_name},
+# version being the goods.version of the price shown on the card
+BUY_QUANTITIES = (1, 5, 10, 25)
+BUY_PREFIX = "buyq_"
+# Longest item name (UTF-8 bytes) whose buy buttons fit Telegram's 64-byte callback_data
+# (goods.version is an INTEGER: at most 10 digits)
+MAX_ITEM_NAME_BYTES = 64 - len(f"{BUY_PREFIX}{max(BUY_QUANTITIES)}_{2 ** 31 - 1}_".encode())
+
+
+def item_info(item_name: str, back_data: str, max_quantity: int = 1, version: int = 0) -> InlineKeyboardMarkup:
     """
-    Product card.
+    Product card. Multi-unit buy buttons are added for the quantities that are in stock.
     """
     kb = InlineKeyboardBuilder()
-    kb.button(text=localize("btn.buy"), callback_data=f"buy_{item_name}")
+    kb.button(text=localize("btn.buy"), callback_data=f"{BUY_PREFIX}1_{version}_{item_name}")
+    extra = [q for q in BUY_QUANTITIES if 1 < q <= max_quantity]
+    for quantity in extra:
+        kb.button(text=localize("btn.buy_quantity", count=quantity),
+                  callback_data=f"{BUY_PREFIX}{quantity}_{version}_{item_name}")
+    kb.button(text=localize("btn.cart_add"), callback_data=f"cart-add_{item_name}")
     kb.button(text=localize("btn.back"), callback_data=back_data)
-    kb.adjust(2)
+    kb.adjust(len(extra) + 1, 2)
+    return kb.as_markup()
+
+
+def cart_keyboard(item_names: Iterable[str]) -> InlineKeyboardMarkup:
+    """
+    Cart: a remove button per line, checkout and clear (only when the cart is not empty).
+    """
+    kb = InlineKeyboardBuilder()
+    item_names = list(item_names)
+    for name in item_names:
+        kb.button(text=localize("btn.cart_remove", name=name), callback_data=f"cart-del_{name}")
+    if item_names:
+        kb.button(text=localize("btn.checkout"), callback_data="cart-checkout")
+        kb.button(text=localize("btn.cart_clear"), callback_data="cart-clear")
+    kb.button(text=localize("btn.back"), callback_data="back_to_menu")
+    kb.adjust(*([1] * len(item_names)), 2, 1)
     return kb.as_markup()
 
 
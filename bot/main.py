@@ -1,35 +1,46 @@
+import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from bot.misc import EnvKeys
+from bot.misc import EnvKeys, OutboundLimits
+from bot.misc.outbound import log_outbound_stats
 from bot.handlers import register_all_handlers
 from bot.database.models import register_models
+from bot.database import Database, AsyncDatabase
+from bot.database.fsm_storage import create_fsm_storage
+from bot.database.rate_limit_storage import create_rate_limit_storage, RateLimitStorage
+from bot.database.pool import log_pool_stats
+from bot.database.cache_stats import log_cache_stats
 from bot.logger_mesh import configure_logging
-from bot.middleware import setup_rate_limiting, RateLimitConfig
+from bot.middleware import (setup_rate_limiting, RateLimitConfig, setup_db_session, setup_prefetch_cancel,
+                            setup_outbound_governor)
 
 
-async def __on_start_up(dp: Dispatcher) -> None:
+async def __on_start_up(dp: Dispatcher, rate_limit_storage: RateLimitStorage | None = None) -> None:
     register_all_handlers(dp)
     register_models()
 
+    setup_db_session(dp)
+    setup_prefetch_cancel(dp)
+
     rate_config = RateLimitConfig(
         global_limit=30,
         global_window=60,
         ban_duration=300,
         admin_bypass=True
     )
-    setup_rate_limiting(dp, rate_config)
+    setup_rate_limiting(dp, rate_config, rate_limit_storage, timeout=EnvKeys.RATE_LIMIT_TIMEOUT)
 
 
 async def start_bot() -> None:
     configure_logging(console=EnvKeys.LOG_TO_STDOUT == "1", debug=EnvKeys.DEBUG == "1")
     logging.basicConfig(level=logging.INFO)
 
-    dp = Dispatcher(storage=MemoryStorage())
-    await __on_start_up(dp)
+    dp = Dispatcher(storage=create_fsm_storage())
+    rate_limit_storage = create_rate_limit_storage()
+    await __on_start_up(dp, rate_limit_storage)
 
     async with Bot(
             token=EnvKeys.TOKEN,
@@ -39,8 +50,34 @@ async def start_bot() -> None:
                 protect_content=False,
             ),
     ) as bot:
-        await dp.start_polling(
+        governor = setup_outbound_governor(
             bot,
-            allowed_updates=["message", "callback_query", "pre_checkout_query"],
-            handle_signals=False,
+            OutboundLimits(
+                global_rate=EnvKeys.OUTBOUND_GLOBAL_RATE,
+                global_burst=max(1, int(EnvKeys.OUTBOUND_GLOBAL_RATE)),
+                group_rate=EnvKeys.OUTBOUND_GROUP_PER_MINUTE / 60,
+            ),
+            retries=EnvKeys.OUTBOUND_RETRIES,
         )
+        stats_tasks = []
+        if EnvKeys.DB_POOL_STATS_INTERVAL > 0:
+            stats_tasks.append(asyncio.create_task(
+                log_pool_stats(EnvKeys.DB_POOL_STATS_INTERVAL, Database().pool_stats, AsyncDatabase().pool_stats)
+            ))
+        if EnvKeys.OUTBOUND_STATS_INTERVAL > 0:
+            stats_tasks.append(asyncio.create_task(log_outbound_stats(EnvKeys.OUTBOUND_STATS_INTERVAL, governor)))
+        if EnvKeys.CACHE_STATS_INTERVAL > 0:
+            stats_tasks.append(asyncio.create_task(log_cache_stats(EnvKeys.CACHE_STATS_INTERVAL, dp.storage)))
+        try:
+            await dp.start_polling(
+                bot,
+                allowed_updates=["message", "callback_query", "pre_checkout_query"],
+                handle_signals=False,
+            )
+        finally:
+            for task in stats_tasks:
+                task.cancel()
+            await dp.storage.close()
+            if rate_limit_storage:
+                await rate_limit_storage.close()
+            await AsyncDatabase().dispose()
@@ -4,3 +4,6 @@ from bot.middleware.rate_limit import (
     RateLimiter,
     setup_rate_limiting
 )
+from bot.middleware.db_session import DatabaseSessionMiddleware, setup_db_session
+from bot.middleware.prefetch import PrefetchCancelMiddleware, setup_prefetch_cancel
+from bot.middleware.outbound import OutboundGovernorMiddleware, setup_outbound_governor
@@ -0,0 +1,34 @@
+from typing import Dict, Any, Callable, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database import AsyncDatabase
+
+
+class DatabaseSessionMiddleware(BaseMiddleware):
+    """
+    One read session per update, shared by filters, middlewares and handlers.
+
+    Handlers (and filters) receive it as the `session` argument and pass it on to the
+    bot.database.methods readers. It holds a pooled connection only while a statement runs, never
+    across Telegram calls or a long handler (see AsyncDatabase.read_session). Writes keep their own
+    short transactions.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        async with AsyncDatabase().read_session() as session:
+            data["session"] = session
+            return await handler(event, data)
+
+
+def setup_db_session(dp) -> DatabaseSessionMiddleware:
+    """Connects the per-update session to the dispatcher (must run before other middlewares)"""
+    middleware = DatabaseSessionMiddleware()
+    dp.update.outer_middleware(middleware)
+    return middleware
@@ -0,0 +1,58 @@
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from bot.misc.outbound import OutboundGovernor, OutboundLimits, Priority, current_priority
+
+# Requests that deliver a message to a chat and count against Telegram's sending limits;
+# everything else (getUpdates, answerCallbackQuery, getChat, ...) goes straight through
+PACED_PREFIXES = ("send", "edit", "copy", "forward")
+
+
+class OutboundGovernorMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware: every sending request waits for the governor, and a TelegramRetryAfter
+    pauses all of them for retry_after seconds before the request is retried. Broadcast requests are
+    not retried here: BroadcastManager retries them itself (after the pause, through the governor).
+    """
+
+    def __init__(self, governor: OutboundGovernor, retries: int = 2):
+        """
+        Args:
+            governor: Governor shared by all requests of the bot
+            retries: Times a request is resent after retry_after before the error is raised (not broadcasts)
+        """
+        self.governor = governor
+        self.retries = retries
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not method.__api_method__.startswith(PACED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        retries = 0 if current_priority() == Priority.BROADCAST else self.retries
+        for attempt in range(retries + 1):
+            await self.governor.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.governor.pause(e.retry_after)
+                if attempt == retries:
+                    raise
+
+
+def setup_outbound_governor(bot: Bot, limits: Optional[OutboundLimits] = None,
+                            retries: int = 2) -> OutboundGovernor:
+    """Connects the outbound governor to the bot's session"""
+    governor = OutboundGovernor(limits)
+    bot.session.middleware(OutboundGovernorMiddleware(governor, retries=retries))
+    return governor
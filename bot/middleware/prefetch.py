@@ -0,0 +1,33 @@
+from typing import Dict, Any, Callable, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.misc.lazy_paginator import cancel_stale_prefetch
+
+
+class PrefetchCancelMiddleware(BaseMiddleware):
+    """
+    After each update, cancels the user's pending page prefetch if the update took them
+    out of the FSM state the prefetch was started in (the page would not be opened).
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            state = data.get("state")
+            if state is not None:
+                await cancel_stale_prefetch(state)
+
+
+def setup_prefetch_cancel(dp) -> PrefetchCancelMiddleware:
+    """Connects prefetch cancellation to the dispatcher"""
+    middleware = PrefetchCancelMiddleware()
+    dp.update.outer_middleware(middleware)
+    return middleware
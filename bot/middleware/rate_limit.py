@@ -1,6 +1,6 @@
+import asyncio
 import time
-from typing import Dict, Any, Callable, Awaitable
-from collections import defaultdict
+from typing import Dict, Any, Callable, Awaitable, Optional
 from dataclasses import dataclass, field
 
 from aiogram import BaseMiddleware
@@ -8,6 +8,7 @@ from aiogram.types import Message, CallbackQuery, TelegramObject
 from aiogram.exceptions import TelegramBadRequest
 
 from bot.i18n import localize
+from bot.logger_mesh import logger
 
 
 @dataclass
@@ -32,53 +33,119 @@ class RateLimitConfig:
     # Exceptions for admins
     admin_bypass: bool = True
 
+    # How often idle users are dropped from memory (seconds)
+    sweep_interval: int = 60
+
+
+class _Window:
+    """
+    Sliding-window counter: requests counted in the current fixed window (windows are aligned to
+    multiples of the window length) and in the previous one, weighted by how much of it still
+    overlaps the sliding window.
+    """
+    __slots__ = ("epoch", "previous", "current")
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.previous = 0
+        self.current = 0
+
+    def estimate(self, now: float, window: float) -> float:
+        position = now / window
+        epoch = int(position)
+        if epoch != self.epoch:
+            self.previous = self.current if epoch == self.epoch + 1 else 0
+            self.current = 0
+            self.epoch = epoch
+        return self.previous * (1 - (position - epoch)) + self.current
+
+    def wait_time(self, now: float, window: float, limit: int) -> float:
+        """Seconds until estimate() drops below limit (estimate() must have been called at `now`)"""
+        start = self.epoch * window
+        if self.current >= limit:
+            # Wait for the next window; by then the previous count is this one, fully weighted
+            return start + window - now + window * max(0.0, 1 - limit / self.current)
+        if not self.previous:
+            return 0.0
+        return max(0.0, start + window * (1 - (limit - self.current) / self.previous) - now)
+
+
+class _Generations:
+    """
+    user_id -> window in two generations: rotate() forgets the older one and starts a new one,
+    and a window used since the previous rotation is moved to the new one. So users idle for
+    a whole rotation period are dropped in O(1), without timestamps or scans.
+    """
+    __slots__ = ("current", "previous")
+
+    def __init__(self):
+        self.current: Dict[int, _Window] = {}
+        self.previous: Dict[int, _Window] = {}
+
+    def get(self, user_id: int) -> _Window | None:
+        window = self.current.get(user_id)
+        if window is None:
+            window = self.previous.pop(user_id, None)
+            if window is not None:
+                self.current[user_id] = window
+        return window
+
+    def get_or_create(self, user_id: int, now: float, window_size: float) -> _Window:
+        window = self.get(user_id)
+        if window is None:
+            window = self.current[user_id] = _Window(int(now / window_size))
+        return window
+
+    def rotate(self) -> int:
+        dropped = len(self.previous)
+        self.previous = self.current
+        self.current = {}
+        return dropped
+
+    def __len__(self) -> int:
+        return len(self.current) + len(self.previous)
+
 
 class RateLimiter:
-    """A repository for tracking rate limits"""
+    """
+    A repository for tracking rate limits.
 
-    def __init__(self, config: RateLimitConfig):
-        self.config = config
-        self.user_requests: Dict[int, list] = defaultdict(list)
-        self.user_actions: Dict[str, Dict[int, list]] = defaultdict(lambda: defaultdict(list))
-        self.banned_users: Dict[int, float] = {}
+    Every limit is a sliding-window counter (constant memory and work per check, whatever the limit);
+    sweep() drops users idle for longer than the longest window, twice over.
+    """
 
-    def _clean_old_requests(self, requests: list, window: int) -> list:
-        """Clears old requests outside the window"""
-        current_time = time.time()
-        return [req_time for req_time in requests if current_time - req_time < window]
+    def __init__(self, config: RateLimitConfig, clock: Callable[[], float] = time.monotonic):
+        self.config = config
+        self.clock = clock
+        self.user_requests = _Generations()
+        self.user_actions: Dict[str, _Generations] = {action: _Generations() for action in config.action_limits}
+        self.banned_users: Dict[int, float] = {}  # user_id -> banned until
+        # A counter is useless once both of its windows have slid by
+        windows = [config.global_window, *(window for _, window in config.action_limits.values())]
+        self.idle_after = 2 * max(windows)
+        self._rotated_at = clock()
 
     def is_banned(self, user_id: int) -> bool:
         """Checks if the user is banned"""
-        if user_id not in self.banned_users:
+        banned_until = self.banned_users.get(user_id)
+        if banned_until is None:
             return False
-
-        ban_time = self.banned_users[user_id]
-        if time.time() - ban_time > self.config.ban_duration:
+        if banned_until <= self.clock():
             del self.banned_users[user_id]
             return False
-
         return True
 
     def ban_user(self, user_id: int):
         """Bans the user for a period of time"""
-        self.banned_users[user_id] = time.time()
+        self.banned_users[user_id] = self.clock() + self.config.ban_duration
 
     def check_global_limit(self, user_id: int) -> bool:
         """Checks the global request limit"""
-        current_time = time.time()
-
-        # Clearing old requests
-        self.user_requests[user_id] = self._clean_old_requests(
-            self.user_requests[user_id],
-            self.config.global_window
-        )
-
-        # Checking the limit
-        if len(self.user_requests[user_id]) >= self.config.global_limit:
+        now = self.clock()
+        window = self.user_requests.get_or_create(user_id, now, self.config.global_window)
+        if window.estimate(now, self.config.global_window) >= self.config.global_limit:
             return False
-
-        # Add the current query
-        self.user_requests[user_id].append(current_time)
+        window.current += 1
         return True
 
     def check_action_limit(self, user_id: int, action: str) -> bool:
@@ -86,50 +153,150 @@ class RateLimiter:
         if action not in self.config.action_limits:
             return True
 
-        limit, window = self.config.action_limits[action]
-        current_time = time.time()
-
-        # Clear old requests for this action
-        self.user_actions[action][user_id] = self._clean_old_requests(
-            self.user_actions[action][user_id],
-            window
-        )
-
-        # Checking the limit
-        if len(self.user_actions[action][user_id]) >= limit:
+        limit, window_size = self.config.action_limits[action]
+        now = self.clock()
+        window = self.user_actions[action].get_or_create(user_id, now, window_size)
+        if window.estimate(now, window_size) >= limit:
             return False
-
-        # Add the current query
-        self.user_actions[action][user_id].append(current_time)
+        window.current += 1
         return True
 
     def get_wait_time(self, user_id: int, action: str = None) -> int:
         """Returns the wait time until the next available request"""
+        now = self.clock()
         if self.is_banned(user_id):
-            ban_time = self.banned_users[user_id]
-            return int(self.config.ban_duration - (time.time() - ban_time))
+            return int(self.banned_users[user_id] - now)
 
         if action and action in self.config.action_limits:
-            limit, window = self.config.action_limits[action]
-            requests = self.user_actions[action][user_id]
-            if len(requests) >= limit:
-                oldest_request = min(requests)
-                return int(window - (time.time() - oldest_request))
+            limit, window_size = self.config.action_limits[action]
+            window = self.user_actions[action].get(user_id)
+            if window is not None and window.estimate(now, window_size) >= limit:
+                return int(window.wait_time(now, window_size, limit))
 
         # Global limit
-        if len(self.user_requests[user_id]) >= self.config.global_limit:
-            oldest_request = min(self.user_requests[user_id])
-            return int(self.config.global_window - (time.time() - oldest_request))
+        window_size, limit = self.config.global_window, self.config.global_limit
+        window = self.user_requests.get(user_id)
+        if window is not None and window.estimate(now, window_size) >= limit:
+            return int(window.wait_time(now, window_size, limit))
 
         return 0
 
+    def sweep(self) -> int:
+        """
+        Forget expired bans and, once per idle period, the counters of users not seen during
+        the last one. Returns how many records were dropped.
+        """
+        now = self.clock()
+        dropped = 0
+        for user_id in [u for u, until in self.banned_users.items() if until <= now]:
+            del self.banned_users[user_id]
+            dropped += 1
+        if now - self._rotated_at >= self.idle_after:
+            self._rotated_at = now
+            dropped += self.user_requests.rotate()
+            dropped += sum(generations.rotate() for generations in self.user_actions.values())
+        return dropped
+
+    def tracked_users(self) -> int:
+        """Users with a global counter in memory"""
+        return len(self.user_requests)
+
+    async def check(self, user_id: int, action: str) -> tuple[Optional[str], int]:
+        """
+        Count a request: (None, 0) if it may pass, otherwise why not and the seconds to wait:
+        ("banned", wait), ("global", 0) (the user has just been banned) or ("action", wait).
+        """
+        if self.is_banned(user_id):
+            return "banned", self.get_wait_time(user_id)
+        if not self.check_global_limit(user_id):
+            self.ban_user(user_id)
+            return "global", 0
+        if not self.check_action_limit(user_id, action):
+            return "action", self.get_wait_time(user_id, action)
+        return None, 0
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Rate limiter whose counters and bans live in a RateLimitStorage shared by all bot processes
+    (bot.database.rate_limit_storage). A check is one storage round trip; taking back rejected requests
+    and writing bans happen in the background. If the storage fails or takes longer than `timeout`,
+    this process falls back to its own local limits for FALLBACK_SECONDS.
+    """
+
+    FALLBACK_SECONDS = 30
+
+    def __init__(self, config: RateLimitConfig, storage, timeout: float = 0.25,
+                 clock: Callable[[], float] = time.monotonic, wall_clock: Callable[[], float] = time.time):
+        super().__init__(config, clock=clock)
+        self.storage = storage
+        self.timeout = timeout
+        # Windows must line up across processes, so shared counters use wall-clock time
+        self.wall_clock = wall_clock
+        self._local_until = 0.0
+        self._background: set[asyncio.Task] = set()
+
+    def _spawn(self, coro: Awaitable) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Rate limit storage write failed: {task.exception()!r}")
+
+    async def check(self, user_id: int, action: str) -> tuple[Optional[str], int]:
+        if self.clock() < self._local_until:
+            return await super().check(user_id, action)
+        try:
+            return await asyncio.wait_for(self._shared_check(user_id, action), self.timeout)
+        except Exception as e:
+            logger.warning(f"Rate limit storage unavailable ({e!r}), local limits for {self.FALLBACK_SECONDS} s")
+            self._local_until = self.clock() + self.FALLBACK_SECONDS
+            return await super().check(user_id, action)
+
+    async def _shared_check(self, user_id: int, action: str) -> tuple[Optional[str], int]:
+        now = self.wall_clock()
+        limits = [("global", self.config.global_limit, self.config.global_window)]
+        if action in self.config.action_limits:
+            limits.append((action, *self.config.action_limits[action]))
+        counters = [(name, int(now / window_size), window_size) for name, _, window_size in limits]
+
+        banned_until, counts = await self.storage.hit(user_id, counters)
+        if banned_until is not None and banned_until > now:
+            self._spawn(self.storage.undo(user_id, counters))
+            return "banned", int(banned_until - now)
+
+        for i, ((name, limit, window_size), (previous, current)) in enumerate(zip(limits, counts)):
+            # The counts as they were before this request
+            window = _Window(counters[i][1])
+            window.previous, window.current = previous, current - 1
+            if window.estimate(now, window_size) < limit:
+                continue
+            self._spawn(self.storage.undo(user_id, counters[i:]))
+            if name == "global":
+                self._spawn(self.storage.ban(user_id, now + self.config.ban_duration))
+                return "global", 0
+            return "action", int(window.wait_time(now, window_size, limit))
+        return None, 0
+
 
 class RateLimitMiddleware(BaseMiddleware):
     """Middleware to limit the frequency of requests"""
 
-    def __init__(self, config: RateLimitConfig = None):
+    def __init__(self, config: RateLimitConfig = None, storage=None, timeout: float = 0.25):
+        """
+        Args:
+            config: Limits
+            storage: Shared RateLimitStorage (None: this process counts on its own)
+            timeout: Seconds to wait for the storage before using local limits
+        """
         self.config = config or RateLimitConfig()
-        self.limiter = RateLimiter(self.config)
+        self.limiter = (
+            SharedRateLimiter(self.config, storage, timeout=timeout) if storage else RateLimiter(self.config)
+        )
+        self._next_sweep = self.limiter.clock() + self.config.sweep_interval
         self.action_mapping = {
             # Callback data -> action name
             'broadcast': 'broadcast',
@@ -137,6 +304,8 @@ class RateLimitMiddleware(BaseMiddleware):
             'replenish_balance': 'payment',
             'pay_': 'payment',
             'buy_': 'buy_item',
+            'cart-checkout': 'buy_item',
+            'cart': 'shop_view',
             'shop': 'shop_view',
             'category_': 'shop_view',
             'item_': 'shop_view',
@@ -161,14 +330,14 @@ class RateLimitMiddleware(BaseMiddleware):
 
         return 'default'
 
-    async def _check_admin_bypass(self, user_id: int) -> bool:
+    async def _check_admin_bypass(self, user_id: int, session=None) -> bool:
         """Checks if the user is an admin"""
         if not self.config.admin_bypass:
             return False
 
         try:
             from bot.database.methods import check_role
-            role = check_role(user_id)
+            role = await check_role(user_id, session=session)
             return role > 1  # ADMIN или OWNER
         except Exception:
             return False
@@ -193,33 +362,34 @@ class RateLimitMiddleware(BaseMiddleware):
 
         user_id = user.id
 
-        # Checking the ban
-        if self.limiter.is_banned(user_id):
-            wait_time = self.limiter.get_wait_time(user_id)
+        # Drop idle users now and then
+        if self.limiter.clock() >= self._next_sweep:
+            self._next_sweep = self.limiter.clock() + self.config.sweep_interval
+            self.limiter.sweep()
 
+        # Check bypass for admins
+        if await self._check_admin_bypass(user_id, data.get("session")):
+            return await handler(event, data)
+
+        # Define action
+        action = self._get_action_from_event(event)
+
+        # Checking the ban and the limits
+        verdict, wait_time = await self.limiter.check(user_id, action)
+
+        if verdict == "banned":
             if isinstance(event, CallbackQuery):
                 await event.answer(
                     localize("middleware.ban", time=wait_time),
                     show_alert=True
                 )
-                return None
             elif isinstance(event, Message):
                 await event.answer(
                     localize("middleware.ban", time=wait_time)
                 )
-                return None
-
-        # Check bypass for admins
-        if await self._check_admin_bypass(user_id):
-            return await handler(event, data)
-
-        # Define action
-        action = self._get_action_from_event(event)
-
-        # Checking the limits
-        if not self.limiter.check_global_limit(user_id):
-            self.limiter.ban_user(user_id)
+            return None
 
+        if verdict == "global":
             if isinstance(event, CallbackQuery):
                 await event.answer(
                     localize("middleware.above_limits"),
@@ -229,9 +399,7 @@ class RateLimitMiddleware(BaseMiddleware):
                 await event.answer(localize("middleware.above_limits"))
             return None
 
-        if not self.limiter.check_action_limit(user_id, action):
-            wait_time = self.limiter.get_wait_time(user_id, action)
-
+        if verdict == "action":
             if isinstance(event, CallbackQuery):
                 await event.answer(
                     localize("middleware.waiting", time=wait_time),
@@ -249,9 +417,9 @@ class RateLimitMiddleware(BaseMiddleware):
 
 
 # Function for quick setup
-def setup_rate_limiting(dp, config: RateLimitConfig = None):
-    """Connects rate limiting to the dispatcher"""
-    middleware = RateLimitMiddleware(config)
+def setup_rate_limiting(dp, config: RateLimitConfig = None, storage=None, timeout: float = 0.25):
+    """Connects rate limiting to the dispatcher (with a shared storage, limits apply across bot processes)"""
+    middleware = RateLimitMiddleware(config, storage, timeout)
     dp.message.middleware(middleware)
     dp.callback_query.middleware(middleware)
     return middleware
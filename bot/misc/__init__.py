@@ -1,4 +1,6 @@
 from bot.misc.env import EnvKeys
 from bot.misc.singleton import SingletonMeta
+from bot.misc.cache import TTLCache
+from bot.misc.outbound import OutboundGovernor, OutboundLimits, Priority, outbound_priority
 from bot.misc.broadcast_system import BroadcastManager, BroadcastStats
-from bot.misc.lazy_paginator import LazyPaginator
+from bot.misc.lazy_paginator import LazyPaginator, invalidate_counts, page_cache_stats, prefetch_stats
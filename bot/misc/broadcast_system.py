@@ -8,6 +8,7 @@ from aiogram.types import InlineKeyboardMarkup
 from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
 
 from bot.logger_mesh import logger
+from bot.misc.outbound import Priority, outbound_priority
 
 
 @dataclass
@@ -34,21 +35,24 @@ class BroadcastStats:
 
 
 class BroadcastManager:
-    """Manager for mass mailing with optimization"""
+    """
+    Manager for mass mailing. Messages are sent with broadcast priority, so the outbound governor
+    (bot.misc.outbound) paces them to Telegram's limits behind the answers to users.
+    """
 
     def __init__(
             self,
             bot: Bot,
             batch_size: int = 30,
-            batch_delay: float = 1.0,
+            batch_delay: float = 0.0,
             retry_count: int = 3
     ):
         """
         Args:
             bot: Bot instance
-            batch_size: Number of messages in a batch
-            batch_delay: Delay between batches (sec)
-            retry_count: Number of retries on error
+            batch_size: Number of messages sent concurrently (and between progress updates)
+            batch_delay: Extra delay between batches (sec); pacing itself is done by the governor
+            retry_count: Send attempts per user (the outbound governor does not retry broadcasts itself)
         """
         self.bot = bot
         self.batch_size = batch_size
@@ -80,10 +84,9 @@ class BroadcastManager:
                 )
                 return True
 
-            except TelegramRetryAfter as e:
-                # Telegram asks to wait
+            except TelegramRetryAfter:
+                # The governor already holds every message until retry_after has passed
                 if attempt < self.retry_count - 1:
-                    await asyncio.sleep(e.retry_after)
                     continue
                 return False
 
@@ -138,6 +141,17 @@ class BroadcastManager:
 
         self._cancelled = False
 
+        with outbound_priority(Priority.BROADCAST):
+            await self._send_batches(stats, user_ids, text, reply_markup, parse_mode, progress_callback)
+
+        stats.end_time = datetime.now()
+        stats.blocked = stats.failed  # Estimate
+
+        return stats
+
+    async def _send_batches(self, stats: BroadcastStats, user_ids: List[int], text: str,
+                            reply_markup: Optional[InlineKeyboardMarkup], parse_mode: str,
+                            progress_callback) -> None:
         # Split into batches
         for i in range(0, len(user_ids), self.batch_size):
             if self._cancelled:
@@ -176,14 +190,9 @@ class BroadcastManager:
                     logger.error(f"Progress callback error: {e}")
 
             # Delay between batches
-            if i + self.batch_size < len(user_ids):
+            if self.batch_delay and i + self.batch_size < len(user_ids):
                 await asyncio.sleep(self.batch_delay)
 
-        stats.end_time = datetime.now()
-        stats.blocked = stats.failed  # Estimate
-
-        return stats
-
     def cancel(self):
         """Cancel the current mailing"""
         self._cancelled = True
@@ -1,9 +1,112 @@
-from typing import Callable, List, Optional, Dict
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Dict
+
+from aiogram.fsm.context import FSMContext
+
+from bot.misc.cache import TTLCache
+from bot.misc.env import EnvKeys
+
+# Totals shared by all paginators of the process: (count, is_approximate) by query identity
+_count_cache = TTLCache(maxsize=4096, ttl=EnvKeys.PAGINATOR_COUNT_TTL)
+# Pages shared by all paginators of the process: rows by (query identity, data version, per_page, page)
+_page_cache = TTLCache(maxsize=EnvKeys.PAGINATOR_PAGE_CACHE_SIZE, ttl=EnvKeys.PAGINATOR_PAGE_TTL)
+
+# Keyset cursors kept in the state around the current page (pages further away are reached by OFFSET)
+CURSOR_WINDOW = 2
+
+# Background loads of the page the user is likely to open next: pending task and the FSM state
+# it was started in, by FSM key (one per user); keys of prefetched pages not opened yet
+_prefetch_tasks: Dict[Hashable, tuple[asyncio.Task, Optional[str]]] = {}
+_prefetched = TTLCache(maxsize=EnvKeys.PAGINATOR_PAGE_CACHE_SIZE, ttl=EnvKeys.PAGINATOR_PAGE_TTL)
+_prefetch_counters = {"started": 0, "skipped": 0, "cancelled": 0, "loaded": 0, "used": 0}
+
+
+def _query_identity(query_func: Callable) -> Optional[tuple]:
+    """(qualified name, bound args, bound kwargs) of a query function, or None if args are not hashable"""
+    args, kwargs = (), {}
+    func = query_func
+    while isinstance(func, partial):
+        args = func.args + args
+        kwargs = {**func.keywords, **kwargs}
+        func = func.func
+    key = (f"{func.__module__}.{func.__qualname__}", args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def invalidate_counts(query_func: Callable, *args) -> None:
+    """
+    Forget shared totals and pages of `query_func` (call after writes that change the list).
+    With `args`, only those whose leading bound arguments equal them are dropped.
+    """
+    name = _query_identity(query_func)[0]
+    _count_cache.discard_where(lambda key: key[0] == name and key[1][:len(args)] == args)
+    _page_cache.discard_where(lambda key: key[0][0] == name and key[0][1][:len(args)] == args)
+
+
+def page_cache_stats() -> dict:
+    """Hit/miss counters of the shared page cache."""
+    return _page_cache.stats()
+
+
+def prefetch_stats() -> dict:
+    """
+    Prefetch counters: started, skipped (PAGINATOR_PREFETCH_LIMIT reached or page already cached),
+    cancelled, loaded, used (opened by a user while still cached) and hit_rate = used / loaded.
+    """
+    loaded = _prefetch_counters["loaded"]
+    return {
+        **_prefetch_counters,
+        "running": sum(not task.done() for task, _ in _prefetch_tasks.values()),
+        "hit_rate": round(_prefetch_counters["used"] / loaded * 100, 2) if loaded else 0.0,
+    }
+
+
+def cancel_prefetch(owner: Hashable) -> None:
+    """Cancel the pending prefetch of a user (FSM key)."""
+    pending = _prefetch_tasks.pop(owner, None)
+    if pending and not pending[0].done():
+        pending[0].cancel()
+        _prefetch_counters["cancelled"] += 1
+
+
+async def cancel_stale_prefetch(fsm: FSMContext) -> None:
+    """Cancel the user's pending prefetch if they have left the FSM state it was started in."""
+    pending = _prefetch_tasks.get(fsm.key)
+    if pending and not pending[0].done() and await fsm.get_state() != pending[1]:
+        cancel_prefetch(fsm.key)
+
+
+def _unwrap(query_func: Callable) -> Callable:
+    func = query_func
+    while isinstance(func, partial):
+        func = func.func
+    return func
+
+
+def _cursor_key(query_func: Callable) -> Optional[Callable]:
+    """Return the keyset sort-key extractor of a query function (looks through functools.partial)"""
+    return getattr(_unwrap(query_func), "cursor_key", None)
+
+
+def _data_version(query_func: Callable) -> Any:
+    """Current version of the data behind a query function (e.g. the catalog version), if it has one"""
+    version = getattr(_unwrap(query_func), "cache_version", None)
+    return version() if version else None
 
 
 class LazyPaginator:
     """
-    Paginator with lazy loading of data from database
+    Paginator with lazy loading of data from database.
+
+    Loaded pages are shared by all paginators of the process (see invalidate_counts); the FSM state
+    only keeps the current page, the total and, if the query function supports keyset pagination
+    (see lazy_queries.keyset), the sort keys of the last rows of the pages around the current one,
+    so the next page is fetched with `after=` instead of OFFSET.
     """
 
     def __init__(
@@ -11,33 +114,54 @@ class LazyPaginator:
             query_func: Callable,
             per_page: int = 10,
             cache_pages: int = 3,
-            state: Optional[Dict] = None
+            state: Optional[Dict] = None,
+            approximate_count: Optional[Callable[[], Awaitable[Optional[int]]]] = None
     ):
         """
         Args:
-            query_func: Function to query data (offset, limit) -> List
+            query_func: Function to query data (offset, limit[, after]) -> List
             per_page: Items per page
-            cache_pages: Number of pages in cache
-            state: Previous paginator state (dict) for cache restoration
+            cache_pages: Number of pages kept by this instance (shared pages are bounded by PAGINATOR_PAGE_CACHE_SIZE)
+            state: Previous paginator state (dict) for restoration
+            approximate_count: Optional cheap estimate of the total (None = estimate unavailable, count exactly)
         """
         self.query_func = query_func
         self.per_page = per_page
         self.cache_pages = cache_pages
+        self.approximate_count = approximate_count
 
         # Восстанавливаем из словаря или создаем новое
         if state and isinstance(state, dict):
-            self._cache = state.get('cache', {})
+            self._cache = {}
+            self._cursors = state.get('cursors', {})
             self._total_count = state.get('total_count')
+            self.total_is_approximate = state.get('total_is_approximate', False)
             self.current_page = state.get('current_page', 0)
+            self._forward = state.get('forward', True)
         else:
+            self._forward = True
             self._cache = {}
+            self._cursors = {}
             self._total_count = None
+            self.total_is_approximate = False
             self.current_page = 0
 
+        self._cursor_key = _cursor_key(query_func)
+
     async def get_total_count(self) -> int:
-        """Get the total number of items"""
+        """Get the total number of items (shared between paginators of the same query)"""
         if self._total_count is None:
-            self._total_count = await self.query_func(count_only=True)
+            key = _query_identity(self.query_func)
+            cached = _count_cache.get(key) if key else None
+            if cached is None:
+                estimate = await self.approximate_count() if self.approximate_count else None
+                if estimate is not None:
+                    cached = (estimate, True)
+                else:
+                    cached = (await self.query_func(count_only=True), False)
+                if key:
+                    _count_cache.set(key, cached)
+            self._total_count, self.total_is_approximate = cached
         return self._total_count
 
     async def get_page(self, page: int) -> List:
@@ -50,21 +174,24 @@ class LazyPaginator:
         Returns:
             List of page elements
         """
+        if page != self.current_page:
+            self._forward = page > self.current_page
         self.current_page = page
 
         # Check cache
         if page in self._cache:
             return self._cache[page]
 
-        # Load data
-        offset = page * self.per_page
-        items = await self.query_func(
-            offset=offset,
-            limit=self.per_page
-        )
+        key = self._page_key(page)
+        if key and key in _prefetched and key in _page_cache:
+            _prefetched.pop(key)
+            _prefetch_counters["used"] += 1
+        items = await _page_cache.get_or_set(key, partial(self._load, page)) if key else await self._load(page)
 
         # Save to cache
         self._cache[page] = items
+        if self._cursor_key and items:
+            self._cursors[page] = self._cursor_key(items[-1])
 
         # Clear old cache if limit exceeded
         if len(self._cache) > self.cache_pages:
@@ -81,20 +208,84 @@ class LazyPaginator:
 
         return items
 
+    async def _load(self, page: int) -> List:
+        """Query a page: continue after the previous page's last key if we know it, otherwise by offset"""
+        offset = page * self.per_page
+        after = self._cursors.get(page - 1) if self._cursor_key and page > 0 else None
+        if after is not None:
+            return await self.query_func(offset=offset, limit=self.per_page, after=after)
+        return await self.query_func(offset=offset, limit=self.per_page)
+
+    async def prefetch(self, fsm: FSMContext) -> None:
+        """
+        Load the page the user will probably open next (the following one, or the previous one
+        when paging backwards) into the shared cache in the background. Call after rendering the page.
+        At most PAGINATOR_PREFETCH_LIMIT prefetches run per process (others are skipped), a user has one
+        at a time, and it is cancelled when the user leaves the FSM state (see cancel_stale_prefetch).
+        """
+        page = self.current_page + (1 if self._forward else -1)
+        items = self._cache.get(self.current_page)
+        if page < 0 or items is None or (self._forward and len(items) < self.per_page):
+            return
+        key = self._page_key(page)
+        if not key:
+            return
+
+        cancel_prefetch(fsm.key)
+        running = sum(not task.done() for task, _ in _prefetch_tasks.values())
+        if key in _page_cache or running >= EnvKeys.PAGINATOR_PREFETCH_LIMIT:
+            _prefetch_counters["skipped"] += 1
+            return
+
+        async def load() -> List:
+            loaded = await self._load(page)
+            _prefetched.set(key, True)
+            _prefetch_counters["loaded"] += 1
+            return loaded
+
+        fsm_state = await fsm.get_state()
+        task = asyncio.create_task(_page_cache.get_or_set(key, load))
+        _prefetch_tasks[fsm.key] = (task, fsm_state)
+        _prefetch_counters["started"] += 1
+
+        def forget(done: asyncio.Task) -> None:
+            if _prefetch_tasks.get(fsm.key, (None,))[0] is done:
+                del _prefetch_tasks[fsm.key]
+            if not done.cancelled():
+                done.exception()  # a failed prefetch is retried by the handler that needs the page
+
+        task.add_done_callback(forget)
+
     async def get_total_pages(self) -> int:
         """Get total number of pages"""
         total = await self.get_total_count()
         return max(1, (total + self.per_page - 1) // self.per_page)
 
+    def _page_key(self, page: int) -> Optional[tuple]:
+        identity = _query_identity(self.query_func)
+        return (identity, _data_version(self.query_func), self.per_page, page) if identity else None
+
     def get_state(self) -> Dict:
-        """Get current state for FSM storage"""
+        """Get current state for FSM storage (page contents stay in the shared cache)"""
+        first = self.current_page - CURSOR_WINDOW
         return {
-            'cache': self._cache.copy(),  # Copying to avoid mutation problems
+            'cursors': {
+                page: cursor for page, cursor in self._cursors.items()
+                if first <= page <= self.current_page + 1
+            },
             'total_count': self._total_count,
-            'current_page': self.current_page
+            'total_is_approximate': self.total_is_approximate,
+            'current_page': self.current_page,
+            'forward': self._forward
         }
 
     def clear_cache(self):
         """Clear cache"""
         self._cache.clear()
-        self._total_count = None
\ No newline at end of file
+        self._cursors.clear()
+        self._total_count = None
+        self.total_is_approximate = False
+        key = _query_identity(self.query_func)
+        if key:
+            _count_cache.pop(key)
+            _page_cache.discard_where(lambda page_key: page_key[0] == key)
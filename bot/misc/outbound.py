@@ -0,0 +1,221 @@
+"""
+Outbound Telegram API pacing: every message the bot sends or edits passes one governor, which keeps
+the bot under Telegram's limits (about 30 messages per second overall, one per second in a private chat,
+20 per minute in a group or channel) instead of collecting TelegramRetryAfter errors.
+
+Requests wait in their chat's token bucket, then in one queue for the global bucket ordered by class:
+answers to the user being served first, notifications to other chats next, broadcasts last. The class
+is taken from the context the request is sent in (`with outbound_priority(Priority.BROADCAST): ...`).
+A retry_after from Telegram pauses all paced requests for that long.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Dict, Hashable, Iterator, Optional
+
+from bot.logger_mesh import logger
+
+
+class Priority(IntEnum):
+    """Request classes, served in this order when the global budget is short."""
+    INTERACTIVE = 0  # answers and edits for the user whose update is being handled
+    NOTIFICATION = 1  # messages to other chats: channel posts, notices to users and admins
+    BROADCAST = 2  # mass mailing and its progress messages
+
+
+_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def outbound_priority(priority: Priority) -> Iterator[None]:
+    """Send the requests made inside the block (and in tasks started there) with this priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@dataclass
+class OutboundLimits:
+    """Telegram's sending limits (see https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this)"""
+    global_rate: float = 30  # messages per second, all chats together
+    global_burst: int = 30
+    chat_rate: float = 1  # messages per second in one private chat
+    chat_burst: int = 3
+    group_rate: float = 20 / 60  # messages per second in one group or channel
+    group_burst: int = 3
+    # Latest waits kept per class for the percentiles of stats()
+    wait_samples: int = 1024
+
+
+class _TokenBucket:
+    """Token bucket; tokens may go negative, so take() also reserves the next free slot in order."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Take a token; return the seconds to wait before using it."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class OutboundGovernor:
+    """Paces outgoing requests by chat and overall, by priority; see the module docstring."""
+
+    # How often idle chat buckets (full again) are dropped
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, limits: Optional[OutboundLimits] = None, clock=time.monotonic):
+        self.limits = limits or OutboundLimits()
+        self.clock = clock
+        now = clock()
+        self._global = _TokenBucket(self.limits.global_rate, self.limits.global_burst, now)
+        self._chats: Dict[Hashable, _TokenBucket] = {}
+        self._last_sweep = now
+        # (priority, arrival, future) waiting for the global bucket
+        self._queue: list = []
+        self._arrivals = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self.paused_until = 0.0
+        self._chat_waiting = 0
+        self._sent = {p: 0 for p in Priority}
+        self._waits = {p: deque(maxlen=self.limits.wait_samples) for p in Priority}
+        self._retry_after = 0
+        self._paused_seconds = 0.0
+
+    def _chat_bucket(self, chat_id: Hashable, now: float) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Private chats have positive ids; groups and channels negative ids or "@username"
+            private = isinstance(chat_id, int) and chat_id > 0
+            bucket = self._chats[chat_id] = _TokenBucket(
+                self.limits.chat_rate if private else self.limits.group_rate,
+                self.limits.chat_burst if private else self.limits.group_burst,
+                now,
+            )
+        return bucket
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep >= self.SWEEP_INTERVAL:
+            self._last_sweep = now
+            self._chats = {chat: b for chat, b in self._chats.items() if not b.is_full(now)}
+
+    async def acquire(self, chat_id: Optional[Hashable] = None, priority: Optional[Priority] = None) -> float:
+        """Wait until a request to the chat may be sent; return the seconds waited."""
+        priority = current_priority() if priority is None else priority
+        start = self.clock()
+        self._sweep(start)
+
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id, start).take(start)
+            if delay > 0:
+                self._chat_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._chat_waiting -= 1
+
+        now = self.clock()
+        if not self._queue and now >= self.paused_until and self._global.wait_time(now) == 0:
+            self._global.take(now)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (priority, next(self._arrivals), future))
+            if self._pump is None or self._pump.done():
+                self._pump = asyncio.create_task(self._run_queue())
+            await future
+
+        waited = self.clock() - start
+        self._sent[priority] += 1
+        self._waits[priority].append(waited)
+        return waited
+
+    async def _run_queue(self) -> None:
+        """Hand out global tokens to the queue, best priority first, respecting a retry_after pause."""
+        while self._queue:
+            now = self.clock()
+            delay = max(self.paused_until - now, self._global.wait_time(now))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():  # the waiting request was cancelled
+                continue
+            self._global.take(now)
+            future.set_result(None)
+
+    def pause(self, seconds: float) -> None:
+        """Telegram answered retry_after: hold every paced request for that long."""
+        now = self.clock()
+        until = now + seconds
+        self._retry_after += 1
+        if until > self.paused_until:
+            self._paused_seconds += until - max(self.paused_until, now)
+            self.paused_until = until
+            logger.warning(f"Telegram flood control: outgoing messages paused for {seconds} s")
+
+    def stats(self) -> dict:
+        """Queue depth, requests sent and wait percentiles (seconds) by class, and flood-control pauses."""
+        queued = {p: 0 for p in Priority}
+        for priority, _, future in self._queue:
+            if not future.done():
+                queued[priority] += 1
+
+        def percentile(samples: list, q: float) -> float:
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3) if samples else 0.0
+
+        classes = {}
+        for p in Priority:
+            samples = sorted(self._waits[p])
+            classes[p.name.lower()] = {
+                "queued": queued[p],
+                "sent": self._sent[p],
+                "wait_p50": percentile(samples, 0.5),
+                "wait_p95": percentile(samples, 0.95),
+                "wait_max": round(samples[-1], 3) if samples else 0.0,
+            }
+        return {
+            "queued": sum(queued.values()),
+            "waiting_for_chat": self._chat_waiting,
+            "chats_tracked": len(self._chats),
+            "retry_after": self._retry_after,
+            "paused_seconds": round(self._paused_seconds, 3),
+            "paused_for": round(max(0.0, self.paused_until - self.clock()), 3),
+            "classes": classes,
+        }
+
+
+async def log_outbound_stats(interval: float, governor: OutboundGovernor) -> None:
+    """Periodically write governor stats to the bot log (run as a background task)"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Outbound queue stats: %s", governor.stats())
@@ -0,0 +1,66 @@
+import codecs
+import csv
+from typing import AsyncIterable, AsyncIterator
+
+import aiofiles
+from aiogram import Bot
+
+UPLOAD_EXTENSIONS = (".txt", ".csv")
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_TIMEOUT = 600
+
+
+def is_values_document(file_name: str | None) -> bool:
+    """Can the document be imported as item values (by extension)?"""
+    return (file_name or "").lower().endswith(UPLOAD_EXTENSIONS)
+
+
+async def document_chunks(bot: Bot, file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Stream a Telegram file in chunks without keeping it in memory
+    (read from disk when the bot works with a local Bot API server).
+    """
+    if bot.session.api.is_local:
+        async with aiofiles.open(bot.session.api.wrap_local_file.to_local(file_path), "rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+        return
+
+    url = bot.session.api.file_url(bot.token, file_path)
+    async for chunk in bot.session.stream_content(url=url, timeout=UPLOAD_TIMEOUT, chunk_size=chunk_size):
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 (BOM tolerated) incrementally and yield lines without their line breaks."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def iter_values(chunks: AsyncIterable[bytes], is_csv: bool = False) -> AsyncIterator[str]:
+    """
+    Item values of an uploaded document: one per line, or one column of a CSV file —
+    the "value" column if the first row is a header naming it, otherwise the first one.
+    """
+    if not is_csv:
+        async for line in iter_lines(chunks):
+            yield line
+        return
+
+    column, first = 0, True
+    async for line in iter_lines(chunks):
+        row = next(csv.reader([line]), [])
+        if first:
+            first = False
+            header = [cell.strip().lower() for cell in row]
+            if "value" in header:
+                column = header.index("value")
+                continue
+        yield row[column] if len(row) > column else ""
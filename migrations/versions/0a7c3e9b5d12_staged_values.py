@@ -0,0 +1,43 @@
+"""staged_values table
+
+Revision ID: 0a7c3e9b5d12
+Revises: f2c9a6e4b851
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7c3e9b5d12'
+down_revision: Union[str, None] = 'f2c9a6e4b851'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'staged_values' in inspector.get_table_names():
+        print("Table 'staged_values' already exists, skipping creation.")
+        return
+
+    op.create_table('staged_values',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('admin_id', sa.BigInteger(), nullable=False),
+                    sa.Column('staging_id', sa.String(length=32), nullable=False),
+                    sa.Column('value', sa.Text(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                              nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_staged_values_admin_staging', 'staged_values', ['admin_id', 'staging_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_staged_values_admin_staging', table_name='staged_values')
+    op.drop_table('staged_values')
@@ -0,0 +1,41 @@
+"""fsm_states table
+
+Revision ID: 1b8d4f0a6c23
+Revises: 0a7c3e9b5d12
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = '1b8d4f0a6c23'
+down_revision: Union[str, None] = '0a7c3e9b5d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'fsm_states' in inspector.get_table_names():
+        print("Table 'fsm_states' already exists, skipping creation.")
+        return
+
+    op.create_table('fsm_states',
+                    sa.Column('key', sa.String(length=255), nullable=False),
+                    sa.Column('state', sa.String(length=255), nullable=True),
+                    sa.Column('data', sa.LargeBinary(), nullable=True),
+                    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.PrimaryKeyConstraint('key')
+                    )
+    op.create_index(op.f('ix_fsm_states_expires_at'), 'fsm_states', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_fsm_states_expires_at'), table_name='fsm_states')
+    op.drop_table('fsm_states')
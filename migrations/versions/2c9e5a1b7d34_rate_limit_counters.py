@@ -0,0 +1,43 @@
+"""rate_limit_counters table
+
+Revision ID: 2c9e5a1b7d34
+Revises: 1b8d4f0a6c23
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = '2c9e5a1b7d34'
+down_revision: Union[str, None] = '1b8d4f0a6c23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'rate_limit_counters' in inspector.get_table_names():
+        print("Table 'rate_limit_counters' already exists, skipping creation.")
+        return
+
+    op.create_table('rate_limit_counters',
+                    sa.Column('key', sa.String(length=64), nullable=False),
+                    sa.Column('epoch', sa.BigInteger(), nullable=False),
+                    sa.Column('previous', sa.Integer(), nullable=False),
+                    sa.Column('current', sa.Integer(), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('key'),
+                    prefixes=['UNLOGGED']
+                    )
+    op.create_index(op.f('ix_rate_limit_counters_expires_at'), 'rate_limit_counters', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limit_counters_expires_at'), table_name='rate_limit_counters')
+    op.drop_table('rate_limit_counters')
@@ -0,0 +1,76 @@
+"""daily rollups keyed by (day, item_name) / (day, shard)
+
+Revision ID: 4e1a7c3d9b58
+Revises: 2c9e5a1b7d34
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1a7c3d9b58'
+down_revision: Union[str, None] = '2c9e5a1b7d34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match ROLLUP_SHARDS in bot/database/methods/rollups.py
+ROLLUP_SHARDS = 16
+
+
+def _rekey(table: str, column: sa.Column, default: str) -> None:
+    op.add_column(table, column)
+    op.execute(f"UPDATE {table} SET {column.name} = {default}")
+    op.alter_column(table, column.name, nullable=False)
+    op.drop_constraint(f"{table}_pkey", table, type_="primary")
+    op.create_primary_key(f"{table}_pkey", table, ["day", column.name])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {c['name'] for c in inspect(bind).get_columns('daily_sales')}
+    if 'item_name' in columns:
+        print("Rollups are already keyed by item / shard, skipping.")
+        return
+
+    _rekey('daily_sales', sa.Column('item_name', sa.String(length=100), nullable=True), "''")
+    _rekey('daily_topups', sa.Column('shard', sa.Integer(), nullable=True), "0")
+    _rekey('daily_registrations', sa.Column('shard', sa.Integer(), nullable=True), "0")
+
+    # Refill from the raw tables with the new keys
+    op.execute("DELETE FROM daily_sales")
+    op.execute(
+        "INSERT INTO daily_sales (day, item_name, orders_count, revenue) "
+        "SELECT CAST(bought_datetime AS DATE), item_name, count(*), sum(price) FROM bought_goods "
+        "GROUP BY CAST(bought_datetime AS DATE), item_name"
+    )
+    op.execute("DELETE FROM daily_topups")
+    op.execute(
+        "INSERT INTO daily_topups (day, shard, topups_count, amount) "
+        f"SELECT CAST(operation_time AS DATE), user_id % {ROLLUP_SHARDS}, count(*), sum(operation_value) "
+        f"FROM operations GROUP BY CAST(operation_time AS DATE), user_id % {ROLLUP_SHARDS}"
+    )
+    op.execute("DELETE FROM daily_registrations")
+    op.execute(
+        "INSERT INTO daily_registrations (day, shard, users_count) "
+        f"SELECT CAST(registration_date AS DATE), telegram_id % {ROLLUP_SHARDS}, count(*) FROM users "
+        f"GROUP BY CAST(registration_date AS DATE), telegram_id % {ROLLUP_SHARDS}"
+    )
+
+
+def downgrade() -> None:
+    for table, column in (('daily_sales', 'item_name'), ('daily_topups', 'shard'),
+                          ('daily_registrations', 'shard')):
+        counters = [c['name'] for c in inspect(op.get_bind()).get_columns(table)
+                    if c['name'] not in ('day', column)]
+        totals = ", ".join(f"sum({name}) AS {name}" for name in counters)
+        op.execute(f"CREATE TEMPORARY TABLE {table}_day AS SELECT day, {totals} FROM {table} GROUP BY day")
+        op.execute(f"DELETE FROM {table}")
+        op.drop_constraint(f"{table}_pkey", table, type_="primary")
+        op.drop_column(table, column)
+        op.create_primary_key(f"{table}_pkey", table, ["day"])
+        op.execute(f"INSERT INTO {table} (day, {', '.join(counters)}) SELECT * FROM {table}_day")
+        op.execute(f"DROP TABLE {table}_day")
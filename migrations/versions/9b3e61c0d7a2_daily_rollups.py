@@ -0,0 +1,74 @@
+"""daily sales / top-ups / registrations rollups
+
+Revision ID: 9b3e61c0d7a2
+Revises: 5de189770cf2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e61c0d7a2'
+down_revision: Union[str, None] = '5de189770cf2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_tables = inspector.get_table_names()
+
+    if 'daily_sales' in existing_tables:
+        print("Table 'daily_sales' already exists, skipping creation.")
+    else:
+        op.create_table('daily_sales',
+                        sa.Column('day', sa.Date(), nullable=False),
+                        sa.Column('orders_count', sa.Integer(), nullable=False),
+                        sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+                        sa.PrimaryKeyConstraint('day')
+                        )
+        op.execute(
+            "INSERT INTO daily_sales (day, orders_count, revenue) "
+            "SELECT CAST(bought_datetime AS DATE), count(*), sum(price) FROM bought_goods "
+            "GROUP BY CAST(bought_datetime AS DATE)"
+        )
+
+    if 'daily_topups' in existing_tables:
+        print("Table 'daily_topups' already exists, skipping creation.")
+    else:
+        op.create_table('daily_topups',
+                        sa.Column('day', sa.Date(), nullable=False),
+                        sa.Column('topups_count', sa.Integer(), nullable=False),
+                        sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+                        sa.PrimaryKeyConstraint('day')
+                        )
+        op.execute(
+            "INSERT INTO daily_topups (day, topups_count, amount) "
+            "SELECT CAST(operation_time AS DATE), count(*), sum(operation_value) FROM operations "
+            "GROUP BY CAST(operation_time AS DATE)"
+        )
+
+    if 'daily_registrations' in existing_tables:
+        print("Table 'daily_registrations' already exists, skipping creation.")
+    else:
+        op.create_table('daily_registrations',
+                        sa.Column('day', sa.Date(), nullable=False),
+                        sa.Column('users_count', sa.Integer(), nullable=False),
+                        sa.PrimaryKeyConstraint('day')
+                        )
+        op.execute(
+            "INSERT INTO daily_registrations (day, users_count) "
+            "SELECT CAST(registration_date AS DATE), count(*) FROM users "
+            "GROUP BY CAST(registration_date AS DATE)"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_registrations')
+    op.drop_table('daily_topups')
+    op.drop_table('daily_sales')
@@ -0,0 +1,43 @@
+"""composite indexes for keyset pagination
+
+Revision ID: c41f7a9e2b15
+Revises: 9b3e61c0d7a2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2b15'
+down_revision: Union[str, None] = '9b3e61c0d7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_users_role_telegram', 'users', ['role_id', 'telegram_id']),
+    ('ix_goods_category_name_name', 'goods', ['category_name', 'name']),
+    ('ix_item_values_item_id', 'item_values', ['item_name', 'id']),
+    ('ix_bought_goods_buyer_datetime_id', 'bought_goods', ['buyer_id', 'bought_datetime', 'id']),
+    ('ix_referral_earnings_referrer_created_id', 'referral_earnings', ['referrer_id', 'created_at', 'id']),
+    ('ix_referral_earnings_pair_created_id', 'referral_earnings', ['referrer_id', 'referral_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    for name, table, columns in INDEXES:
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name in existing:
+            print(f"Index '{name}' already exists, skipping creation.")
+            continue
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,46 @@
+"""denormalized stock counters on goods
+
+Revision ID: d8a4c2f61b37
+Revises: c41f7a9e2b15
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4c2f61b37'
+down_revision: Union[str, None] = 'c41f7a9e2b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_columns = {col['name'] for col in inspector.get_columns('goods')}
+
+    if 'stock_count' in existing_columns:
+        print("Column 'goods.stock_count' already exists, skipping creation.")
+    else:
+        op.add_column('goods', sa.Column('stock_count', sa.Integer(), nullable=False, server_default='0'))
+
+    if 'is_infinite' in existing_columns:
+        print("Column 'goods.is_infinite' already exists, skipping creation.")
+    else:
+        op.add_column('goods', sa.Column('is_infinite', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.execute(
+        "UPDATE goods SET "
+        "stock_count = (SELECT count(*) FROM item_values WHERE item_values.item_name = goods.name), "
+        "is_infinite = EXISTS (SELECT 1 FROM item_values "
+        "WHERE item_values.item_name = goods.name AND item_values.is_infinity)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('goods', 'is_infinite')
+    op.drop_column('goods', 'stock_count')
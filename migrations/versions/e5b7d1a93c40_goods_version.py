@@ -0,0 +1,33 @@
+"""goods.version for lock-free purchases
+
+Revision ID: e5b7d1a93c40
+Revises: d8a4c2f61b37
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7d1a93c40'
+down_revision: Union[str, None] = 'd8a4c2f61b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_columns = {col['name'] for col in inspector.get_columns('goods')}
+
+    if 'version' in existing_columns:
+        print("Column 'goods.version' already exists, skipping creation.")
+    else:
+        op.add_column('goods', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('goods', 'version')
@@ -0,0 +1,42 @@
+"""cart_items table
+
+Revision ID: f2c9a6e4b851
+Revises: e5b7d1a93c40
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c9a6e4b851'
+down_revision: Union[str, None] = 'e5b7d1a93c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = inspect(bind)
+
+    if 'cart_items' in inspector.get_table_names():
+        print("Table 'cart_items' already exists, skipping creation.")
+        return
+
+    op.create_table('cart_items',
+                    sa.Column('user_id', sa.BigInteger(), nullable=False),
+                    sa.Column('item_name', sa.String(length=100), nullable=False),
+                    sa.Column('quantity', sa.Integer(), nullable=False),
+                    sa.Column('added_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                              nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['item_name'], ['goods.name'], ondelete='CASCADE', onupdate='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'item_name')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('cart_items')
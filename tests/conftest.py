@@ -0,0 +1,11 @@
+import pytest_asyncio
+
+from bot.database.main import AsyncDatabase
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def dispose_async_engine():
+    """pytest-asyncio gives every test its own loop; pooled asyncpg connections must not outlive it"""
+    yield
+    if AsyncDatabase._instance is not None:
+        await AsyncDatabase().dispose()
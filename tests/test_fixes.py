@@ -1,8 +1,10 @@
 import asyncio
+import os
+import time
 import pytest
 from decimal import Decimal
 from unittest.mock import MagicMock, AsyncMock
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 
 # === TRANSACTIONAL BUYING TEST ===
@@ -33,7 +35,8 @@ async def test_concurrent_purchase_safety():
             "test_item",
             Decimal("100"),
             "Test",
-            "test_category"
+            "test_category",
+            stock_count=1
         )
         s.add(goods)
 
@@ -46,10 +49,10 @@ async def test_concurrent_purchase_safety():
     # Parallel buying
     async def buy_user1():
         await asyncio.sleep(0.01)  # A slight delay
-        return buy_item_transaction(111, "test_item")
+        return await buy_item_transaction(111, "test_item")
 
     async def buy_user2():
-        return buy_item_transaction(222, "test_item")
+        return await buy_item_transaction(222, "test_item")
 
     # Run at the same time
     results = await asyncio.gather(buy_user1(), buy_user2(), return_exceptions=True)
@@ -95,7 +98,7 @@ async def test_payment_idempotency():
         s.commit()
 
     # First attempt to process the payment
-    result1 = process_payment_with_referral(
+    result1 = await process_payment_with_referral(
         user_id=333,
         amount=Decimal("500"),
         provider="test",
@@ -104,7 +107,7 @@ async def test_payment_idempotency():
     )
 
     # A second attempt with the same external_id
-    result2 = process_payment_with_referral(
+    result2 = await process_payment_with_referral(
         user_id=333,
         amount=Decimal("500"),
         provider="test",
@@ -294,6 +297,1343 @@ async def test_lazy_pagination():
     print("✅ Lazy pagination test passed")
 
 
+# === UNIT OF WORK SESSION TEST ===
+
+@pytest.mark.asyncio
+async def test_db_session_middleware():
+    """Test: one read session is shared by everything handling the update and holds no connection between reads"""
+
+    from sqlalchemy import text
+    from bot.database import AsyncDatabase
+    from bot.middleware import DatabaseSessionMiddleware
+    from bot.database.methods import check_user, check_role
+
+    seen = []
+    pool = AsyncDatabase().engine.pool
+
+    async def handler(event, data):
+        session = data["session"]
+        seen.append(session)
+        checked_out = pool.checkedout()
+        assert await check_user(999999999, session=session) is None
+        assert not await check_role(999999999, session=session)
+        # No transaction is left open and the connection is back in the pool (e.g. while Telegram is called)
+        assert (await session.execute(text("SELECT 1"))).scalar() == 1
+        assert not session.in_transaction() and pool.checkedout() == checked_out
+        return "ok"
+
+    middleware = DatabaseSessionMiddleware()
+    assert await middleware(handler, MagicMock(), {}) == "ok"
+    assert len(seen) == 1, "Handler must receive the session"
+
+    print("✅ Unit of work session test passed")
+
+
+# === CONNECTION POOL STATS TEST ===
+
+def test_pool_instrumentation():
+    """Test: pool counters, idle liveness ping and checkout timeouts are recorded"""
+
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from sqlalchemy.pool import QueuePool
+    from bot.database.dsn import dsn
+    from bot.database.pool import PoolStats, pool_options, instrument_engine
+
+    stats = PoolStats("test")
+    options = pool_options(QueuePool, stats)
+    options.update(pool_size=1, max_overflow=0, pool_timeout=0.1)
+    engine = create_engine(dsn(), **options)
+    instrument_engine(engine, stats, ping_idle=0)
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            # The only connection is busy: the second checkout must time out
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+
+        # Returned connection was idle >= 0s, so it is pinged on the next checkout
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        snapshot = stats.snapshot()
+        assert snapshot["connects"] == 1, "The connection must be reused"
+        assert snapshot["checkouts"] == 2
+        assert snapshot["pings"] == 1 and snapshot["ping_failures"] == 0
+        assert snapshot["timeouts"] == 1
+        assert snapshot["wait_count"] == 3
+        assert sum(snapshot["wait_histogram"].values()) == 3
+        assert snapshot["checked_out"] == 0 and snapshot["checked_in"] == 1
+    finally:
+        engine.dispose()
+
+    print("✅ Connection pool stats test passed")
+
+
+# === USER SUMMARY TEST ===
+
+@pytest.mark.asyncio
+async def test_user_summary():
+    """Test: profile summary aggregates top-ups, purchases, referrals and earnings in one query"""
+
+    from bot.database.methods import get_user_summary
+    from bot.database import Database
+    from bot.database.models import User, BoughtGoods, Operations, ReferralEarnings
+
+    with Database().session() as s:
+        s.add(User(telegram_id=333, registration_date=datetime.now(), balance=Decimal("50")))
+        s.flush()
+        s.add(User(telegram_id=334, registration_date=datetime.now(), referral_id=333))
+        s.add(User(telegram_id=335, registration_date=datetime.now(), referral_id=333))
+        s.add(Operations(333, Decimal("100"), datetime.now()))
+        s.add(Operations(333, Decimal("25.50"), datetime.now()))
+        s.add(BoughtGoods("summary_item", "V1", Decimal("10"), datetime.now(), 990001, 333))
+        s.flush()
+        s.add(ReferralEarnings(333, 334, Decimal("5"), Decimal("50")))
+        s.add(ReferralEarnings(333, 334, Decimal("1"), Decimal("10")))
+
+    try:
+        summary = await get_user_summary(333)
+        assert summary.balance == Decimal("50")
+        assert summary.role_name == "USER"
+        assert summary.total_topups == Decimal("125.50")
+        assert summary.purchases_count == 1
+        assert summary.referrals_count == 2
+        assert summary.earnings_count == 2
+        assert summary.earnings_amount == Decimal("6")
+        assert summary.earnings_original_amount == Decimal("60")
+        assert summary.active_referrals_count == 1
+
+        empty = await get_user_summary(334)
+        assert empty.total_topups == 0 and empty.purchases_count == 0 and empty.earnings_count == 0
+        assert await get_user_summary(999999999) is None
+    finally:
+        with Database().session() as s:
+            s.query(BoughtGoods).filter(BoughtGoods.unique_id == 990001).delete()
+            s.query(User).filter(User.telegram_id.in_([334, 335])).delete()
+            s.query(User).filter(User.telegram_id == 333).delete()
+
+    print("✅ User summary test passed")
+
+
+# === SHOP STATISTICS SNAPSHOT TEST ===
+
+@pytest.mark.asyncio
+async def test_shop_stats_snapshot():
+    """Test: statistics panel (daily rollups) matches the raw tables and is served from the snapshot cache"""
+
+    from bot.database.methods import (
+        get_shop_stats, create_user, create_operation, select_today_users, select_admins, get_user_count,
+        select_today_orders, select_all_orders, select_today_operations, select_all_operations,
+        select_count_items, select_count_goods, select_count_bought_items
+    )
+    from bot.database.methods.read import _shop_stats_cache
+    from bot.database.maintenance import backfill_rollups
+    from bot.database import Database
+    from bot.database.models import User, DailyTopups
+
+    today = datetime.now().date().isoformat()
+    backfill_rollups()
+
+    # Rollups are maintained by the write paths themselves, one row per day and user shard
+    await create_user(444, datetime.now(), None)
+    await create_user(445, datetime.now(), None)
+    create_operation(444, 70, datetime.now())
+    create_operation(445, 30, datetime.now())
+
+    try:
+        with Database().session() as s:
+            shards = {shard for shard, in s.query(DailyTopups.shard).filter(DailyTopups.day == datetime.now().date())}
+        assert {444 % 16, 445 % 16} <= shards, "Top-ups of different users do not share a row"
+
+        _shop_stats_cache.clear()
+        hits_before = _shop_stats_cache.hits
+
+        stats = await get_shop_stats(today)
+        assert stats.today_users == select_today_users(today)
+        assert stats.admins == select_admins()
+        assert stats.users == get_user_count()
+        assert stats.today_orders == select_today_orders(today)
+        assert stats.all_orders == select_all_orders()
+        assert stats.today_topups == select_today_operations(today)
+        assert stats.all_topups == select_all_operations()
+        assert stats.items == select_count_items()
+        assert stats.goods == select_count_goods()
+        assert stats.sold_count == select_count_bought_items()
+
+        assert await get_shop_stats(today) is stats, "Second refresh must reuse the snapshot"
+        assert _shop_stats_cache.hits == hits_before + 1
+    finally:
+        with Database().session() as s:
+            s.query(User).filter(User.telegram_id.in_([444, 445])).delete()
+        backfill_rollups()
+        _shop_stats_cache.clear()
+
+    print("✅ Shop statistics snapshot test passed")
+
+
+# === KEYSET PAGINATION TEST ===
+
+@pytest.mark.asyncio
+async def test_keyset_pagination():
+    """Test: paginator continues from the last sort key instead of OFFSET, and keyset pages match offset pages"""
+
+    from functools import partial
+    from bot.misc import LazyPaginator
+    from bot.database import Database
+    from bot.database.models import Goods, ItemValues, Categories
+    from bot.database.methods import query_items_in_position
+
+    with Database().session() as s:
+        s.add(Categories(name="keyset_category"))
+        s.add(Goods("keyset_item", Decimal("1"), "Test", "keyset_category"))
+        s.flush()
+        for i in range(25):
+            s.add(ItemValues(name="keyset_item", value=f"K{i}", is_infinity=False))
+
+    calls = []
+
+    async def spy(offset=0, limit=10, count_only=False, after=None):
+        calls.append((offset, after))
+        return await query_items_in_position("keyset_item", offset=offset, limit=limit,
+                                             count_only=count_only, after=after)
+
+    spy.cursor_key = query_items_in_position.cursor_key
+
+    try:
+        paginator = LazyPaginator(spy, per_page=10)
+        pages = [await paginator.get_page(p) for p in range(3)]
+        assert [len(p) for p in pages] == [10, 10, 5]
+        assert calls[1] == (10, pages[0][-1]) and calls[2] == (20, pages[1][-1]), "Next pages must use after="
+
+        # State restored in another handler keeps the cursors
+        restored = LazyPaginator(spy, per_page=10, state=paginator.get_state())
+        assert await restored._load(2) == pages[2]
+        assert calls[-1] == (20, pages[1][-1]), "Restored state must continue after the saved cursor"
+
+        # Once the cursors are dropped the page falls back to OFFSET
+        restored.clear_cache()
+        assert await restored.get_page(1) == pages[1], "Without a cursor the page falls back to OFFSET"
+
+        by_offset = LazyPaginator(partial(query_items_in_position, "keyset_item"), per_page=10)
+        by_offset._cursor_key = None
+        assert [await by_offset.get_page(p) for p in range(3)] == pages
+    finally:
+        with Database().session() as s:
+            s.query(Goods).filter(Goods.name == "keyset_item").delete()
+            s.query(Categories).filter(Categories.name == "keyset_category").delete()
+
+    print("✅ Keyset pagination test passed")
+
+
+# === REFERRALS LIST TEST ===
+
+@pytest.mark.asyncio
+async def test_user_referrals_order():
+    """Test: referrals are ordered by total earned across pages, loaded with one query per page"""
+
+    from sqlalchemy import event
+    from bot.database import Database, AsyncDatabase
+    from bot.database.models import User, ReferralEarnings
+    from bot.database.methods import query_user_referrals
+
+    earned = {5551: 0, 5552: 30, 5553: 10, 5554: 20, 5555: 5}
+    with Database().session() as s:
+        s.add(User(telegram_id=5550, registration_date=datetime.now()))
+        s.flush()
+        for ref_id in earned:
+            s.add(User(telegram_id=ref_id, registration_date=datetime.now(), referral_id=5550))
+        s.flush()
+        for ref_id, amount in earned.items():
+            if amount:
+                s.add(ReferralEarnings(5550, ref_id, Decimal(amount) / 2, Decimal(amount) * 10))
+                s.add(ReferralEarnings(5550, ref_id, Decimal(amount) / 2, Decimal(amount) * 10))
+
+    statements = []
+
+    def count_statements(*args):
+        statements.append(args)
+
+    engine = AsyncDatabase().engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statements)
+    try:
+        page1 = await query_user_referrals(5550, offset=0, limit=2)
+        page2 = await query_user_referrals(5550, offset=2, limit=2)
+        page3 = await query_user_referrals(5550, offset=4, limit=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statements)
+        with Database().session() as s:
+            s.query(User).filter(User.telegram_id.in_(list(earned))).delete()
+            s.query(User).filter(User.telegram_id == 5550).delete()
+
+    assert [r['telegram_id'] for r in page1 + page2 + page3] == [5552, 5554, 5553, 5555, 5551]
+    assert page1[0]['total_earned'] == Decimal(30) and page3[0]['total_earned'] == 0
+    assert len(statements) == 3, "One query per page"
+
+    print("✅ Referrals list test passed")
+
+
+# === PAGINATOR COUNT CACHE TEST ===
+
+@pytest.mark.asyncio
+async def test_paginator_count_cache():
+    """Test: totals are shared between paginators, writes invalidate them, approximate totals are flagged"""
+
+    from bot.misc import LazyPaginator
+    from bot.database.methods import query_categories, create_category, delete_category
+
+    counted = []
+
+    async def counting_query(offset=0, limit=10, count_only=False, after=None):
+        if count_only:
+            counted.append(1)
+        return await query_categories(offset=offset, limit=limit, count_only=count_only, after=after)
+
+    counting_query.__qualname__ = query_categories.__qualname__
+    counting_query.__module__ = query_categories.__module__
+
+    LazyPaginator(counting_query).clear_cache()
+    total = await LazyPaginator(counting_query).get_total_count()
+    assert await LazyPaginator(counting_query).get_total_count() == total
+    assert len(counted) == 1, "The second paginator must reuse the shared total"
+
+    create_category("count_cache_category")
+    try:
+        assert await LazyPaginator(counting_query).get_total_count() == total + 1, "create_category invalidates"
+        assert len(counted) == 2
+    finally:
+        delete_category("count_cache_category")
+
+    async def estimate():
+        return 1_234_567
+
+    paginator = LazyPaginator(counting_query, approximate_count=estimate)
+    paginator.clear_cache()
+    assert await paginator.get_total_count() == 1_234_567 and paginator.total_is_approximate
+    paginator.clear_cache()
+
+    print("✅ Paginator count cache test passed")
+
+
+# === ROLE CACHE TEST ===
+
+@pytest.mark.asyncio
+async def test_role_cache():
+    """Test: permission checks hit the cache, set_role and create_user invalidate it"""
+
+    from bot.database.methods import check_role, create_user, set_role, role_cache_stats, invalidate_role_cache
+    from bot.database import Database
+    from bot.database.models import User, Permission
+
+    invalidate_role_cache()
+    assert not await check_role(555), "Unknown user has no permissions"
+    await create_user(555, datetime.now(), None)
+    try:
+        assert await check_role(555) == Permission.USE, "create_user drops the negative entry"
+
+        hits_before = role_cache_stats()["hits"]
+        assert await check_role(555) == Permission.USE
+        assert role_cache_stats()["hits"] == hits_before + 1
+
+        set_role(555, 2)
+        assert await check_role(555) & Permission.SHOP_MANAGE, "set_role must invalidate the cached role"
+    finally:
+        with Database().session() as s:
+            s.query(User).filter(User.telegram_id == 555).delete()
+        invalidate_role_cache()
+
+    print("✅ Role cache test passed")
+
+
+# === CATALOG CACHE TEST ===
+
+@pytest.mark.asyncio
+async def test_catalog_cache():
+    """Test: item cards and catalog pages are served from memory until the catalog or stock changes"""
+
+    from sqlalchemy import event
+    from bot.database import AsyncDatabase
+    from bot.database.methods import (
+        get_item_card, query_items_in_category, create_category, create_item, add_values_to_item,
+        update_item, delete_category
+    )
+
+    create_category("catalog_cache_category")
+    create_item("catalog_cache_item", "desc", 10, "catalog_cache_category")
+
+    statements = []
+
+    def count_statements(*args):
+        statements.append(args)
+
+    engine = AsyncDatabase().engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statements)
+    try:
+        card = await get_item_card("catalog_cache_item")
+        assert card.stock_count == 0 and not card.is_infinite and "desc" in card.text
+        assert await get_item_card("catalog_cache_item") is card
+
+        page = await query_items_in_category("catalog_cache_category", offset=0, limit=10)
+        assert await query_items_in_category("catalog_cache_category", offset=0, limit=10) == page
+        assert len(statements) == 2, "Repeated reads must not hit the database"
+
+        add_values_to_item("catalog_cache_item", "value-1", False)
+        assert (await get_item_card("catalog_cache_item")).stock_count == 1, "Stock change drops the card"
+
+        update_item("catalog_cache_item", "catalog_cache_item", "new desc", 12, "catalog_cache_category")
+        assert (await get_item_card("catalog_cache_item")).description == "new desc", "Edits bump the version"
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statements)
+        delete_category("catalog_cache_category")
+
+    assert await get_item_card("catalog_cache_item") is None
+
+    print("✅ Catalog cache test passed")
+
+
+# === STOCK COUNTERS TEST ===
+
+@pytest.mark.asyncio
+async def test_stock_counters():
+    """Test: goods.stock_count / is_infinite follow adds, sales and deletes; reconcile repairs drift"""
+
+    from bot.database import Database
+    from bot.database.models import User, ItemValues
+    from bot.database.maintenance import reconcile_stock
+    from bot.database.methods import (
+        create_category, create_item, add_values_to_item, buy_item_transaction, delete_item_from_position,
+        delete_only_items, select_item_values_amount, check_value, delete_category
+    )
+
+    def stock():
+        return select_item_values_amount("stock_item"), check_value("stock_item")
+
+    create_category("stock_category")
+    create_item("stock_item", "Test", 10, "stock_category")
+    with Database().session() as s:
+        s.add(User(telegram_id=666, balance=Decimal("100"), registration_date=datetime.now(), role_id=1))
+
+    try:
+        for value in ("S1", "S2", "S3"):
+            add_values_to_item("stock_item", value, False)
+        assert not add_values_to_item("stock_item", "S1", False), "Duplicate is not counted"
+        assert stock() == (3, False)
+
+        ok, *_ = await buy_item_transaction(666, "stock_item")
+        assert ok and stock() == (2, False)
+
+        with Database().session() as s:
+            item_id = s.query(ItemValues.id).filter(ItemValues.item_name == "stock_item").first()[0]
+        delete_item_from_position(item_id)
+        assert stock() == (1, False)
+
+        add_values_to_item("stock_item", "INF", True)
+        assert stock() == (2, True)
+
+        with Database().session() as s:
+            inf_id = s.query(ItemValues.id).filter(ItemValues.value == "INF").scalar()
+        delete_item_from_position(inf_id)
+        assert stock() == (1, False)
+
+        delete_only_items("stock_item")
+        assert stock() == (0, False)
+
+        with Database().session() as s:
+            s.add(ItemValues(name="stock_item", value="RAW", is_infinity=True))
+        assert reconcile_stock() == 1 and stock() == (1, True)
+        assert reconcile_stock() == 0
+    finally:
+        with Database().session() as s:
+            s.query(User).filter(User.telegram_id == 666).delete()
+        delete_category("stock_category")
+
+    print("✅ Stock counters test passed")
+
+
+# === LOCK-FREE PURCHASE TEST ===
+
+@pytest.mark.asyncio
+async def test_purchase_price_version():
+    """Test: concurrent buyers of one position all succeed; a price edit mid-purchase or since the card
+    was shown aborts it"""
+
+    from sqlalchemy import event, text
+    from sqlalchemy.exc import OperationalError
+    from bot.database import Database, AsyncDatabase
+    from bot.database.models import User, Goods, ItemValues, BoughtGoods
+    from bot.database.methods import (
+        buy_item_transaction, create_category, create_item, delete_category, select_item_values_amount,
+        get_item_card
+    )
+
+    create_category("version_category")
+    create_item("version_item", "Test", 10, "version_category")
+    with Database().session() as s:
+        s.query(Goods).filter(Goods.name == "version_item").update({Goods.stock_count: 5})
+        for i in range(5):
+            s.add(ItemValues(name="version_item", value=f"V{i}", is_infinity=False))
+        for user_id in range(7701, 7705):
+            s.add(User(telegram_id=user_id, balance=Decimal("100"), registration_date=datetime.now()))
+    create_item("version_inf", "Test", 10, "version_category")
+    with Database().session() as s:
+        s.query(Goods).filter(Goods.name == "version_inf").update({Goods.stock_count: 1, Goods.is_infinite: True})
+        s.add(ItemValues(name="version_inf", value="INF", is_infinity=True))
+
+    edited = []
+    blocked = []
+
+    def edit_infinite_price(conn, cursor, statement, *args):
+        if "FOR SHARE" in statement and not blocked:
+            with Database().session() as s:
+                s.execute(text("SET LOCAL lock_timeout = '200ms'"))
+                try:
+                    s.query(Goods).filter(Goods.name == "version_inf").update({Goods.price: 30})
+                    blocked.append(False)
+                except OperationalError:
+                    s.rollback()
+                    blocked.append(True)
+
+    def edit_price(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE goods SET stock_count") and not edited:
+            edited.append(statement)
+            with Database().session() as s:
+                s.query(Goods).filter(Goods.name == "version_item").update(
+                    {Goods.price: 20, Goods.version: Goods.version + 1}
+                )
+
+    engine = AsyncDatabase().engine.sync_engine
+    try:
+        results = await asyncio.gather(*(buy_item_transaction(user_id, "version_item")
+                                         for user_id in range(7701, 7705)))
+        assert all(ok for ok, *_ in results), "Buyers of one position must not fail each other"
+        assert select_item_values_amount("version_item") == 1
+
+        event.listen(engine, "before_cursor_execute", edit_price)
+        ok, message, _ = await buy_item_transaction(7701, "version_item")
+        event.remove(engine, "before_cursor_execute", edit_price)
+        assert not ok and message == "price_changed"
+        assert select_item_values_amount("version_item") == 1, "Aborted purchase keeps the stock"
+
+        # A price edited by another bot process: this process still shows the cached card,
+        # but the buy button carries the version of that card, so the new price is not charged
+        card = await get_item_card("version_item")
+        with Database().session() as s:
+            s.query(Goods).filter(Goods.name == "version_item").update(
+                {Goods.price: 25, Goods.version: Goods.version + 1}
+            )
+        assert (await get_item_card("version_item")).price == card.price
+        ok, message, _ = await buy_item_transaction(7701, "version_item", version=card.version)
+        assert not ok and message == "price_changed"
+        assert select_item_values_amount("version_item") == 1
+
+        ok, *_ = await buy_item_transaction(7701, "version_item", version=card.version + 1)
+        assert ok
+
+        # Infinite items: the version is read FOR SHARE, so a price edit waits for the purchase to commit
+        event.listen(engine, "after_cursor_execute", edit_infinite_price)
+        ok, *_ = await buy_item_transaction(7702, "version_inf")
+        event.remove(engine, "after_cursor_execute", edit_infinite_price)
+        assert ok and blocked == [True], "A price edit cannot commit between the check and the purchase"
+    finally:
+        with Database().session() as s:
+            s.query(BoughtGoods).filter(BoughtGoods.item_name.in_(["version_item", "version_inf"])).delete()
+            s.query(User).filter(User.telegram_id.in_(range(7701, 7705))).delete()
+        delete_category("version_category")
+
+    print("✅ Lock-free purchase test passed")
+
+
+# === MULTI-UNIT PURCHASE TEST ===
+
+@pytest.mark.asyncio
+async def test_multi_unit_purchase():
+    """Test: N units are bought in one transaction, all or nothing; buy buttons are parsed unambiguously"""
+
+    from bot.database import Database
+    from bot.database.models import User, ItemValues, BoughtGoods
+    from bot.database.methods import (
+        buy_item_transaction, create_category, create_item, add_values_to_item, delete_category,
+        select_item_values_amount, get_item_card
+    )
+    from bot.keyboards import item_info, BUY_QUANTITIES, MAX_ITEM_NAME_BYTES
+    from bot.handlers.user.balance_and_payment import buy_item_callback_handler
+
+    create_category("bulk_category")
+    create_item("bulk_item", "Test", 10, "bulk_category")
+    for i in range(4):
+        add_values_to_item("bulk_item", f"B{i}", False)
+    with Database().session() as s:
+        s.add(User(telegram_id=7801, balance=Decimal("100"), registration_date=datetime.now()))
+
+    try:
+        ok, message, data = await buy_item_transaction(7801, "bulk_item", quantity=3)
+        assert ok, message
+        assert data["quantity"] == 3 and sorted(data["values"]) == ["B0", "B1", "B2"]
+        assert data["price"] == 30 and data["new_balance"] == 70
+        assert select_item_values_amount("bulk_item") == 1
+
+        ok, message, _ = await buy_item_transaction(7801, "bulk_item", quantity=2)
+        assert not ok and message == "out_of_stock"
+
+        # The buy button of a name that looks like "quantity_name" buys that item, one unit
+        create_item("5_bulk_item", "Test", 1, "bulk_category")
+        add_values_to_item("5_bulk_item", "N0", False)
+        card = await get_item_card("5_bulk_item")
+        buttons = [b for row in item_info("5_bulk_item", "shop", version=card.version).inline_keyboard for b in row]
+        call = AsyncMock()
+        call.data = buttons[0].callback_data
+        call.from_user = MagicMock(id=7801)
+        await buy_item_callback_handler(call)
+        assert select_item_values_amount("5_bulk_item") == 0
+
+        # Buy buttons of the longest allowed name fit the callback_data limit
+        longest = item_info("я" * (MAX_ITEM_NAME_BYTES // 2), "shop", max_quantity=max(BUY_QUANTITIES),
+                            version=2 ** 31 - 1)
+        assert all(len(b.callback_data.encode()) <= 64 for b in longest.inline_keyboard[0])
+
+        with Database().session() as s:
+            assert s.query(BoughtGoods).filter(BoughtGoods.buyer_id == 7801).count() == 4
+            assert s.query(User.balance).filter(User.telegram_id == 7801).scalar() == 69
+            assert s.query(ItemValues).filter(ItemValues.item_name == "bulk_item").count() == 1
+    finally:
+        with Database().session() as s:
+            s.query(BoughtGoods).filter(BoughtGoods.buyer_id == 7801).delete()
+            s.query(User).filter(User.telegram_id == 7801).delete()
+        delete_category("bulk_category")
+
+    print("✅ Multi-unit purchase test passed")
+
+
+# === CART CHECKOUT TEST ===
+
+@pytest.mark.asyncio
+async def test_cart_checkout():
+    """Test: the cart is bought in one transaction, all or nothing, and emptied"""
+
+    from bot.database import Database
+    from bot.database.models import User, BoughtGoods
+    from bot.database.methods import (
+        add_to_cart, get_cart, remove_from_cart, checkout_cart_transaction, create_category, create_item,
+        add_values_to_item, delete_category, select_item_values_amount
+    )
+
+    create_category("cart_category")
+    create_item("cart_a", "Test", 10, "cart_category")
+    create_item("cart_b", "Test", 5, "cart_category")
+    add_values_to_item("cart_a", "A0", False)
+    add_values_to_item("cart_a", "A1", False)
+    add_values_to_item("cart_b", "B0", False)
+    with Database().session() as s:
+        s.add(User(telegram_id=7901, balance=Decimal("100"), registration_date=datetime.now()))
+
+    try:
+        ok, message, _ = await checkout_cart_transaction(7901)
+        assert not ok and message == "cart_empty"
+
+        assert await add_to_cart(7901, "cart_a") == 1
+        assert await add_to_cart(7901, "cart_a") == 2
+        assert await add_to_cart(7901, "cart_b", 2) == 2
+        assert await add_to_cart(7901, "no_such_item") == 0
+
+        # Two units of cart_b are not in stock: nothing is bought
+        ok, message, data = await checkout_cart_transaction(7901)
+        assert not ok and message == "out_of_stock" and data["item_name"] == "cart_b"
+        assert select_item_values_amount("cart_a") == 2
+        assert len(await get_cart(7901)) == 2
+
+        await remove_from_cart(7901, "cart_b")
+        await add_to_cart(7901, "cart_b")
+        ok, message, data = await checkout_cart_transaction(7901)
+        assert ok, message
+        assert sorted(data["lines"]["cart_a"]["values"]) == ["A0", "A1"]
+        assert data["lines"]["cart_b"]["values"] == ["B0"]
+        assert data["total"] == 25 and data["new_balance"] == 75
+        assert await get_cart(7901) == []
+        assert select_item_values_amount("cart_a") == 0 and select_item_values_amount("cart_b") == 0
+
+        with Database().session() as s:
+            assert s.query(BoughtGoods).filter(BoughtGoods.buyer_id == 7901).count() == 3
+    finally:
+        with Database().session() as s:
+            s.query(BoughtGoods).filter(BoughtGoods.buyer_id == 7901).delete()
+            s.query(User).filter(User.telegram_id == 7901).delete()
+        delete_category("cart_category")
+
+    print("✅ Cart checkout test passed")
+
+
+# === BULK ADD VALUES TEST ===
+
+@pytest.mark.asyncio
+async def test_bulk_add_values():
+    """Test: values are inserted in chunks, duplicates and blanks are counted like the admin report"""
+
+    from bot.database import Database
+    from bot.database.models import ItemValues, Goods
+    from bot.database.methods import (
+        bulk_add_values, add_values_to_item, create_category, create_item, delete_category,
+        select_item_values_amount
+    )
+    from bot.database.methods import create as create_module
+
+    create_category("bulk_add_category")
+    create_item("bulk_add_item", "Test", 1, "bulk_add_category")
+    add_values_to_item("bulk_add_item", "K0", False)
+    chunk = create_module.BULK_VALUES_CHUNK
+    create_module.BULK_VALUES_CHUNK = 3
+
+    try:
+        values = ["K0", " K1 ", "K1", "", "   ", "K2", "K3", "K4", "K5", "K2"]
+        result = await bulk_add_values("bulk_add_item", values)
+        assert result == {"added": 5, "skipped_db_dup": 1, "skipped_batch_dup": 2, "skipped_invalid": 2}
+        assert select_item_values_amount("bulk_add_item") == 6
+
+        with Database().session() as s:
+            assert s.query(ItemValues).filter(ItemValues.item_name == "bulk_add_item").count() == 6
+            assert s.query(Goods.stock_count).filter(Goods.name == "bulk_add_item").scalar() == 6
+
+        # Unknown position: nothing is inserted
+        result = await bulk_add_values("no_such_item", ["X"])
+        assert result["added"] == 0 and result["skipped_db_dup"] == 1
+    finally:
+        create_module.BULK_VALUES_CHUNK = chunk
+        delete_category("bulk_add_category")
+
+    print("✅ Bulk add values test passed")
+
+
+# === STREAMING VALUES UPLOAD TEST ===
+
+@pytest.mark.asyncio
+async def test_streaming_values_upload():
+    """Test: an uploaded document is parsed chunk by chunk, imported in committed batches and announced"""
+
+    from bot.database import Database
+    from bot.database.models import Goods
+    from bot.database.methods import import_values, create_category, create_item, delete_category
+    from bot.database.methods import create as create_module
+    from bot.misc import EnvKeys
+    from bot.misc.stock_upload import iter_values
+    from bot.handlers.admin.update_position_states import upload_item_values_upd
+
+    async def chunks(data: bytes, size: int):
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+    # BOM, CRLF, a blank line and a multibyte value split across chunks
+    text = "\ufeffK1\r\nКлюч-2\r\n\r\nK3"
+    assert [v async for v in iter_values(chunks(text.encode(), 3))] == ["K1", "Ключ-2", "", "K3"]
+
+    csv_data = 'login,value\r\na,"V,1"\r\nb,V2\r\nc\r\n'.encode()
+    assert [v async for v in iter_values(chunks(csv_data, 5), is_csv=True)] == ["V,1", "V2", ""]
+    assert [v async for v in iter_values(chunks(b"V1;x\nV2;y", 4), is_csv=True)] == ["V1;x", "V2;y"]
+
+    create_category("upload_category")
+    create_item("upload_item", "Test", 1, "upload_category")
+    chunk = create_module.BULK_VALUES_CHUNK
+    create_module.BULK_VALUES_CHUNK = 4
+    progress = []
+
+    async def on_progress(result):
+        progress.append(result["added"])
+
+    try:
+        lines = "\n".join(["U1", "U2", "U2", "", "U3", "U4", "U1", "U5"]).encode()
+        result = await import_values(
+            "upload_item", iter_values(chunks(lines, 7)), on_progress=on_progress
+        )
+        # The repeat of U1 is in the second batch, so it is counted as a DB duplicate
+        assert result == {"added": 5, "skipped_db_dup": 1, "skipped_batch_dup": 1, "skipped_invalid": 1}
+        assert progress == [2, 5]
+        with Database().session() as s:
+            assert s.query(Goods.stock_count).filter(Goods.name == "upload_item").scalar() == 5
+
+        # The upload handler posts the "new upload" notice to the channel with the values added
+        bot = MagicMock()
+        bot.session.api.is_local = False
+        bot.session.stream_content = lambda **kwargs: chunks(b"U5\nU6\nU7", 4)
+        bot.get_file = AsyncMock(return_value=MagicMock(file_path="values.txt"))
+        bot.send_message = AsyncMock()
+        bot.get_chat = AsyncMock()
+        message = AsyncMock()
+        message.bot = bot
+        message.document = MagicMock(file_name="values.txt", file_id="file")
+        state = AsyncMock()
+        state.get_data.return_value = {"item_name": "upload_item"}
+        channel_url = EnvKeys.CHANNEL_URL
+        EnvKeys.CHANNEL_URL = "https://t.me/upload_channel"
+        try:
+            await upload_item_values_upd(message, state)
+        finally:
+            EnvKeys.CHANNEL_URL = channel_url
+        bot.send_message.assert_awaited_once()
+        assert bot.send_message.await_args.kwargs["chat_id"] == "@upload_channel"
+        assert "<b>2</b>" in bot.send_message.await_args.kwargs["text"]
+    finally:
+        create_module.BULK_VALUES_CHUNK = chunk
+        delete_category("upload_category")
+
+    print("✅ Streaming values upload test passed")
+
+
+# === STAGED VALUES TEST ===
+
+@pytest.mark.asyncio
+async def test_staged_values():
+    """Test: typed values are staged in the database, moved into item_values with one INSERT ... SELECT,
+    dropped on "Back" and purged when abandoned"""
+
+    from bot.database import Database
+    from bot.database.models import Goods, StagedValues
+    from bot.database.methods import (
+        start_staging, stage_value, commit_staged_values, add_values_to_item, create_category, create_item,
+        delete_category, select_item_values_amount
+    )
+    from bot.database.maintenance import purge_staging, STAGING_MAX_AGE
+    from bot.handlers.admin.goods_management_states import goods_management_callback_handler
+    from bot.handlers.admin.update_position_states import updating_item_amount
+    from bot.handlers.admin.adding_position_states import values_report
+    from bot.i18n import localize
+    from bot.misc import EnvKeys
+
+    create_category("staging_category")
+    create_item("staging_item", "Test", 1, "staging_category")
+    add_values_to_item("staging_item", "S0", False)
+
+    try:
+        # Values of an abandoned batch are dropped when the admin starts a new one
+        abandoned = await start_staging(7950)
+        await stage_value(7950, abandoned, "OLD")
+        staging_id = await start_staging(7950)
+        assert staging_id != abandoned
+
+        for value in ["S0", " S1 ", "S1", "", "S2", "S3"]:
+            await stage_value(7950, staging_id, value)
+
+        result = await commit_staged_values(7950, staging_id, "staging_item")
+        assert result == {"added": 3, "skipped_db_dup": 1, "skipped_batch_dup": 1, "skipped_invalid": 1}
+        assert select_item_values_amount("staging_item") == 4
+
+        with Database().session() as s:
+            assert s.query(StagedValues).filter(StagedValues.admin_id == 7950).count() == 0
+            assert s.query(Goods.stock_count).filter(Goods.name == "staging_item").scalar() == 4
+
+        assert (await commit_staged_values(7950, None, "staging_item"))["added"] == 0
+
+        # "Finish" reports the counts and announces the values in the channel
+        staging_id = await start_staging(7950)
+        for value in ["S4", "S4"]:
+            await stage_value(7950, staging_id, value)
+        state = AsyncMock()
+        state.get_data.return_value = {"item_name": "staging_item", "staging_id": staging_id}
+        call = AsyncMock()
+        call.from_user = MagicMock(id=7950)
+        channel_url = EnvKeys.CHANNEL_URL
+        EnvKeys.CHANNEL_URL = "https://t.me/staging_channel"
+        try:
+            await updating_item_amount(call, state)
+        finally:
+            EnvKeys.CHANNEL_URL = channel_url
+        assert call.message.edit_text.await_args.args[0] == values_report(
+            localize('admin.goods.update.values.result.title'), {"added": 1, "skipped_batch_dup": 1}
+        )
+        assert "<b>1</b>" in call.bot.send_message.await_args.kwargs["text"]
+
+        # "Back" from value entry drops the batch
+        staging_id = await start_staging(7950)
+        await stage_value(7950, staging_id, "S4")
+        state = AsyncMock()
+        state.get_data.return_value = {"staging_id": staging_id, "staged_count": 1}
+        call = AsyncMock()
+        call.from_user = MagicMock(id=7950)
+        await goods_management_callback_handler(call, state)
+        state.clear.assert_awaited_once()
+        with Database().session() as s:
+            assert s.query(StagedValues).filter(StagedValues.admin_id == 7950).count() == 0
+
+        # Values of dialogs that were never finished are purged by age
+        stale = await start_staging(7950)
+        await stage_value(7950, stale, "OLD")
+        with Database().session() as s:
+            s.query(StagedValues).filter(StagedValues.admin_id == 7950).update(
+                {StagedValues.created_at: datetime.now(timezone.utc) - STAGING_MAX_AGE - timedelta(minutes=1)}
+            )
+        await stage_value(7950, stale, "NEW")
+        assert purge_staging() >= 1
+        with Database().session() as s:
+            assert [v for (v,) in s.query(StagedValues.value).filter(StagedValues.admin_id == 7950)] == ["NEW"]
+    finally:
+        with Database().session() as s:
+            s.query(StagedValues).filter(StagedValues.admin_id == 7950).delete()
+        delete_category("staging_category")
+
+    print("✅ Staged values test passed")
+
+
+# === FSM STORAGE TEST ===
+
+@pytest.mark.asyncio
+async def test_fsm_storage():
+    """Test: SQL FSM storage keeps state and data across instances, with TTL and a compact blob"""
+
+    from aiogram.fsm.storage.base import StorageKey
+    from bot.database import Database
+    from bot.database.models import FSMStates
+    from bot.database.fsm_storage import SQLStorage, pack_data, unpack_data
+    from bot.states import ShopStates
+
+    key = StorageKey(bot_id=1, chat_id=8001, user_id=8001)
+    rows = [("item", Decimal("9.99"), datetime(2026, 1, 1))]
+    data = {"goods_paginator": {"cache": {0: rows}, "cursors": {0: "item"}}, "amount": 10}
+
+    # Ints as dict keys, tuples, Decimals and datetimes survive; large blobs are compressed
+    assert unpack_data(pack_data(data)) == data
+    tagged = {"__t": "tuple", "v": [1]}
+    assert unpack_data(pack_data({"raw": tagged})) == {"raw": tagged}, "Dicts that look tagged stay dicts"
+    big = pack_data({"values": ["same value"] * 500})
+    assert big[:1] == b"c" and len(big) < 200
+    assert pack_data({}) is None and unpack_data(None) == {}
+    # Blobs are JSON: a pickle written into the shared store is never loaded
+    import pickle
+    assert unpack_data(b"p" + pickle.dumps({"amount": 10})) == {}
+    with pytest.raises(TypeError):
+        pack_data({"state": object()})
+
+    first, second = SQLStorage(cache_ttl=60), SQLStorage(cache_ttl=0)
+    try:
+        await first.set_state(key, ShopStates.viewing_goods)
+        await first.set_data(key, data)
+        assert await first.get_state(key) == ShopStates.viewing_goods.state
+
+        # Another process (no cache) sees the same state
+        assert await second.get_state(key) == ShopStates.viewing_goods.state
+        assert await second.get_data(key) == data
+        assert await second.update_data(key, {"amount": 20}) == {**data, "amount": 20}
+
+        # Returned data is a copy: mutating it does not touch the cached blob
+        (await first.get_data(key))["amount"] = 99
+        assert (await first.get_data(key))["amount"] != 99
+        assert first.cache_stats()["hits"] >= 2
+
+        # Clearing removes the row
+        await second.set_state(key, None)
+        await second.set_data(key, {})
+        with Database().session() as s:
+            assert s.query(FSMStates).count() == 0
+
+        # Expired keys are not read
+        short = SQLStorage(ttl=0.01, cache_ttl=0)
+        await short.set_state(key, "Some:state")
+        await asyncio.sleep(0.05)
+        assert await short.get_state(key) is None
+    finally:
+        with Database().session() as s:
+            s.query(FSMStates).delete()
+
+    print("✅ FSM storage test passed")
+
+
+# === BOUNDED MEMORY FSM STORAGE TEST ===
+
+@pytest.mark.asyncio
+async def test_bounded_memory_storage():
+    """Test: in-memory FSM storage expires untouched keys and evicts the least recently used over budget"""
+
+    from aiogram.fsm.storage.base import StorageKey
+    from bot.database.fsm_storage import BoundedMemoryStorage
+
+    def key(i):
+        return StorageKey(bot_id=1, chat_id=i, user_id=i)
+
+    storage = BoundedMemoryStorage(max_entries=3)
+    for i in range(3):
+        await storage.set_state(key(i), "Some:state")
+        await storage.set_data(key(i), {"page": {0: [("row", i)]}})
+    assert await storage.get_data(key(0)) == {"page": {0: [("row", 0)]}}
+
+    # Key 1 is now the least recently used one
+    await storage.set_state(key(3), "Some:state")
+    assert await storage.get_state(key(1)) is None
+    assert await storage.get_state(key(0)) == "Some:state"
+    stats = storage.stats()
+    assert stats["entries"] == 3 and stats["evicted"] == 1
+
+    # Clearing a key frees its bytes
+    await storage.set_state(key(0), None)
+    await storage.set_data(key(0), {})
+    assert storage.stats()["entries"] == 2
+
+    # Byte budget: big blobs push older keys out
+    small = BoundedMemoryStorage(max_bytes=BoundedMemoryStorage.ENTRY_OVERHEAD * 2 + 4000)
+    for i in range(5):
+        await small.set_data(key(i), {"blob": os.urandom(2500)})
+    assert small.stats()["bytes"] <= small.max_bytes and small.stats()["entries"] == 1
+    assert await small.get_data(key(4)) != {}
+
+    # TTL: untouched keys expire
+    short = BoundedMemoryStorage(ttl=0.01)
+    await short.set_state(key(1), "Some:state")
+    await asyncio.sleep(0.05)
+    assert await short.get_state(key(1)) is None
+    assert short.stats() == {"entries": 0, "bytes": 0, "evicted": 0, "expired": 1}
+
+    print("✅ Bounded memory FSM storage test passed")
+
+
+# === SHARED PAGE CACHE TEST ===
+
+@pytest.mark.asyncio
+async def test_shared_page_cache():
+    """Test: paginators of different users share pages, the FSM state keeps no rows, writes invalidate pages"""
+
+    from functools import partial
+    from bot.misc import LazyPaginator, page_cache_stats
+    from bot.database.methods import create_category, delete_category, query_items_in_position, create_item, \
+        add_values_to_item, delete_item, query_categories
+
+    loads = []
+
+    async def counting_query(item_name, offset=0, limit=10, count_only=False, after=None):
+        if not count_only:
+            loads.append((offset, after))
+        return await query_items_in_position(item_name, offset=offset, limit=limit, count_only=count_only,
+                                             after=after)
+
+    counting_query.__qualname__ = query_items_in_position.__qualname__
+    counting_query.__module__ = query_items_in_position.__module__
+    counting_query.cursor_key = query_items_in_position.cursor_key
+
+    create_category("page_cache_category")
+    create_item("page_cache_item", "Test", 1, "page_cache_category")
+    try:
+        add_values_to_item("page_cache_item", "P0", False)
+        query = partial(counting_query, "page_cache_item")
+        LazyPaginator(query, per_page=2).clear_cache()
+
+        first = LazyPaginator(query, per_page=2)
+        page = await first.get_page(0)
+        state = first.get_state()
+        assert "cache" not in state and set(state["cursors"]) == {0}, "Only cursors go to the FSM"
+
+        hits = page_cache_stats()["hits"]
+        assert await LazyPaginator(query, per_page=2).get_page(0) == page, "Another user gets the same page"
+        assert len(loads) == 1 and page_cache_stats()["hits"] == hits + 1
+
+        add_values_to_item("page_cache_item", "P1", False)
+        restored = LazyPaginator(query, per_page=2, state=state)
+        assert len(await restored.get_page(0)) == 2, "Adding values invalidates the shared page"
+        assert len(loads) == 2
+
+        # Catalog pages are keyed by the catalog version
+        categories = LazyPaginator(query_categories, per_page=1000)
+        assert "page_cache_other" not in await categories.get_page(0)
+        create_category("page_cache_other")
+        assert "page_cache_other" in await LazyPaginator(query_categories, per_page=1000).get_page(0)
+    finally:
+        delete_item("page_cache_item")
+        delete_category("page_cache_category")
+        delete_category("page_cache_other")
+
+    print("✅ Shared page cache test passed")
+
+
+# === PAGE PREFETCH TEST ===
+
+@pytest.mark.asyncio
+async def test_page_prefetch():
+    """Test: the next (or previous) page is loaded in the background, bounded, and cancelled on leaving the state"""
+
+    from unittest.mock import patch
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from bot.misc import EnvKeys, LazyPaginator, prefetch_stats
+    from bot.misc.lazy_paginator import _prefetch_tasks, cancel_stale_prefetch
+
+    loads = []
+    gate = asyncio.Event()
+    gate.set()
+
+    async def prefetch_query(offset=0, limit=10, count_only=False):
+        if count_only:
+            return 100
+        loads.append(offset)
+        await gate.wait()
+        return list(range(offset, min(offset + limit, 100)))
+
+    fsm = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=7070, user_id=7070))
+    await fsm.set_state("Browse:list")
+
+    async def settle():
+        await asyncio.gather(*(task for task, _ in _prefetch_tasks.values()), return_exceptions=True)
+
+    LazyPaginator(prefetch_query).clear_cache()
+    before = prefetch_stats()
+
+    paginator = LazyPaginator(prefetch_query)
+    await paginator.get_page(0)
+    await paginator.prefetch(fsm)
+    await settle()
+    assert loads == [0, 10], "Page 1 is loaded in the background"
+
+    paginator = LazyPaginator(prefetch_query, state=paginator.get_state())
+    assert await paginator.get_page(1) == list(range(10, 20))
+    assert loads == [0, 10], "The next page comes from the prefetch"
+    assert prefetch_stats()["used"] == before["used"] + 1
+
+    # Paging backwards prefetches the previous page
+    paginator = LazyPaginator(prefetch_query, state={'current_page': 6})
+    await paginator.get_page(5)
+    await paginator.prefetch(fsm)
+    await settle()
+    assert loads[-2:] == [50, 40]
+
+    # Limit reached: skipped
+    with patch.object(EnvKeys, "PAGINATOR_PREFETCH_LIMIT", 0):
+        await paginator.get_page(8)
+        await paginator.prefetch(fsm)
+    assert prefetch_stats()["skipped"] == before["skipped"] + 1 and loads[-1] == 80
+
+    # Leaving the state cancels a pending prefetch
+    gate.clear()
+    await paginator.prefetch(fsm)
+    await asyncio.sleep(0)
+    await fsm.set_state("Other:menu")
+    await cancel_stale_prefetch(fsm)
+    await settle()
+    gate.set()
+    assert prefetch_stats()["cancelled"] == before["cancelled"] + 1
+    assert not _prefetch_tasks
+    LazyPaginator(prefetch_query).clear_cache()
+
+    print("✅ Page prefetch test passed")
+
+
+# === SLIDING WINDOW RATE LIMITER TEST ===
+
+def test_sliding_window_limiter():
+    """Test: sliding-window counters refill gradually, report wait times, and idle users are swept"""
+
+    from bot.middleware import RateLimiter, RateLimitConfig
+
+    now = [1000.0]
+    config = RateLimitConfig(global_limit=4, global_window=10, ban_duration=30,
+                             action_limits={'buy_item': (2, 60)})
+    limiter = RateLimiter(config, clock=lambda: now[0])
+
+    for _ in range(4):
+        assert limiter.check_global_limit(1)
+    assert not limiter.check_global_limit(1)
+    assert limiter.get_wait_time(1) == 10, "Full window: wait for the next one"
+
+    # 30% into the next window: 70% of the previous count still weighs in
+    now[0] = 1013.0
+    assert limiter.check_global_limit(1) and limiter.check_global_limit(1)
+    assert not limiter.check_global_limit(1)
+    assert limiter.get_wait_time(1) == 2
+    now[0] = 1015.5
+    assert limiter.check_global_limit(1)
+
+    assert limiter.check_action_limit(2, 'buy_item') and limiter.check_action_limit(2, 'buy_item')
+    assert not limiter.check_action_limit(2, 'buy_item')
+    assert 0 < limiter.get_wait_time(2, 'buy_item') <= 60
+    assert limiter.check_action_limit(2, 'unknown_action')
+
+    limiter.ban_user(3)
+    assert limiter.is_banned(3) and limiter.get_wait_time(3) == 30
+
+    # Users idle for two rotations are dropped, active ones are kept
+    now[0] += limiter.idle_after
+    limiter.sweep()
+    assert limiter.tracked_users() == 1 and not limiter.banned_users, "Expired ban dropped"
+    limiter.check_global_limit(1)
+    now[0] += limiter.idle_after
+    assert limiter.sweep() == 1, "User 2's action counter was idle for a whole period"
+    assert limiter.tracked_users() == 1
+    now[0] += limiter.idle_after
+    limiter.sweep()
+    assert limiter.tracked_users() == 0
+
+    print("✅ Sliding window rate limiter test passed")
+
+
+# === SHARED RATE LIMIT TEST ===
+
+@pytest.mark.asyncio
+async def test_shared_rate_limits():
+    """Test: bot processes sharing SQL rate-limit counters enforce one budget and one ban, slow storage falls back"""
+
+    from bot.database import Database
+    from bot.database.models import RateLimitCounters
+    from bot.database.rate_limit_storage import SQLRateLimitStorage, RateLimitStorage
+    from bot.middleware import RateLimitConfig
+    from bot.middleware.rate_limit import SharedRateLimiter
+
+    config = RateLimitConfig(global_limit=4, global_window=60, ban_duration=30,
+                             action_limits={'buy_item': (2, 60)})
+    # Both "processes" sit at the start of a window, so the previous one does not weigh in
+    now = [(int(time.time() / 60) + 1) * 60 + 0.5]
+    first, second = (SharedRateLimiter(config, SQLRateLimitStorage(), timeout=5, wall_clock=lambda: now[0])
+                     for _ in range(2))
+
+    async def settle():
+        await asyncio.gather(*first._background, *second._background)
+
+    with Database().session() as s:
+        s.query(RateLimitCounters).delete()
+    try:
+        assert await first.check(9001, 'buy_item') == (None, 0)
+        assert await second.check(9001, 'buy_item') == (None, 0)
+        verdict, wait = await first.check(9001, 'buy_item')
+        assert verdict == "action" and 0 < wait <= 60, "The action budget is shared"
+        await settle()
+        with Database().session() as s:
+            assert s.get(RateLimitCounters, "9001:buy_item").current == 2, "The rejected request was taken back"
+
+        # Three requests so far count globally; the action-rejected one was only taken back from buy_item
+        assert await second.check(9001, 'default') == (None, 0)
+        assert await first.check(9001, 'default') == ("global", 0)
+        await settle()
+        verdict, wait = await first.check(9001, 'default')
+        assert verdict == "banned" and 0 < wait <= 30, "The ban reached the other process"
+
+        class SlowStorage(RateLimitStorage):
+            async def hit(self, user_id, counters):
+                await asyncio.sleep(1)
+
+        slow = SharedRateLimiter(config, SlowStorage(), timeout=0.05)
+        assert await slow.check(9002, 'default') == (None, 0), "Local limits are used"
+        assert slow.tracked_users() == 1 and slow.clock() < slow._local_until
+    finally:
+        with Database().session() as s:
+            s.query(RateLimitCounters).delete()
+
+    print("✅ Shared rate limit test passed")
+
+
+# === OUTBOUND GOVERNOR TEST ===
+
+@pytest.mark.asyncio
+async def test_outbound_governor():
+    """Test: outgoing requests are paced per chat and globally, by priority, and retry_after pauses them all"""
+
+    from aiogram.exceptions import TelegramRetryAfter
+    from aiogram.methods import SendMessage, AnswerCallbackQuery
+    from bot.misc import BroadcastManager, OutboundGovernor, OutboundLimits, Priority
+    from bot.misc.outbound import current_priority
+    from bot.middleware.outbound import OutboundGovernorMiddleware
+
+    # Global budget short: the user's answer overtakes broadcasts queued before it
+    governor = OutboundGovernor(OutboundLimits(global_rate=20, global_burst=1, chat_burst=5, group_burst=5))
+    await governor.acquire(1)
+    order = []
+
+    async def send(chat_id, priority, name):
+        await governor.acquire(chat_id, priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(send(100 + i, Priority.BROADCAST, f"broadcast{i}")) for i in range(3)]
+    tasks.append(asyncio.create_task(send(2, Priority.NOTIFICATION, "notification")))
+    tasks.append(asyncio.create_task(send(1, Priority.INTERACTIVE, "answer")))
+    await asyncio.gather(*tasks)
+    assert order == ["answer", "notification", "broadcast0", "broadcast1", "broadcast2"]
+    stats = governor.stats()
+    assert stats["queued"] == 0 and stats["classes"]["broadcast"]["sent"] == 3
+    assert stats["classes"]["broadcast"]["wait_max"] >= stats["classes"]["interactive"]["wait_p95"]
+
+    # Per-chat buckets: a second message to a chat waits, other chats do not; channels are slower
+    governor = OutboundGovernor(OutboundLimits(chat_rate=10, chat_burst=1, group_rate=5, group_burst=1))
+    assert await governor.acquire(5) < 0.01 and await governor.acquire(6) < 0.01
+    assert 0.05 < await governor.acquire(5) < 0.3
+    await governor.acquire("@channel")
+    assert 0.15 < await governor.acquire("@channel") < 0.5
+
+    # retry_after: the request is resent after the pause, which holds other sends too but not other methods
+    governor = OutboundGovernor()
+    middleware = OutboundGovernorMiddleware(governor, retries=1)
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(type(method).__name__)
+        if len(calls) == 1:
+            raise TelegramRetryAfter(method=method, message="Flood control exceeded", retry_after=1)
+        return True
+
+    flooded = asyncio.create_task(middleware(make_request, None, SendMessage(chat_id=1, text="a")))
+    await asyncio.sleep(0.05)
+    assert governor.stats()["paused_for"] > 0.5
+    start = time.monotonic()
+    assert await middleware(make_request, None, AnswerCallbackQuery(callback_query_id="1")) is True
+    assert time.monotonic() - start < 0.1, "Only sending methods are paced"
+    assert await middleware(make_request, None, SendMessage(chat_id=2, text="b")) is True
+    assert time.monotonic() - start > 0.8, "The pause is global"
+    assert await flooded is True
+    assert calls == ["SendMessage", "AnswerCallbackQuery", "SendMessage", "SendMessage"]
+    assert governor.stats()["retry_after"] == 1
+
+    # Broadcasts send with broadcast priority
+    priorities = []
+    bot_mock = AsyncMock()
+
+    async def record_priority(**kwargs):
+        priorities.append(current_priority())
+
+    bot_mock.send_message.side_effect = record_priority
+    await BroadcastManager(bot_mock, batch_size=2).broadcast([1, 2, 3], "text")
+    assert priorities == [Priority.BROADCAST] * 3 and current_priority() == Priority.INTERACTIVE
+
+    # Broadcasts are retried by BroadcastManager only, not again by the governor
+    middleware = OutboundGovernorMiddleware(OutboundGovernor(), retries=2)
+    attempts = []
+
+    async def always_flooded(bot, method):
+        attempts.append(method.chat_id)
+        raise TelegramRetryAfter(method=method, message="Flood control exceeded", retry_after=0)
+
+    async def send_through_governor(**kwargs):
+        return await middleware(always_flooded, None, SendMessage(chat_id=kwargs["chat_id"], text=kwargs["text"]))
+
+    bot_mock.send_message.side_effect = send_through_governor
+    stats = await BroadcastManager(bot_mock, retry_count=3).broadcast([1], "text")
+    assert stats.failed == 1 and attempts == [1, 1, 1]
+
+    print("✅ Outbound governor test passed")
+
+
+# === CACHE STATS TEST ===
+
+@pytest.mark.asyncio
+async def test_cache_stats():
+    """Test: cache counters (evictions included) are collected in one snapshot and logged periodically"""
+
+    from unittest.mock import patch
+    from bot.misc import TTLCache
+    from bot.database import cache_stats as cache_stats_module
+    from bot.database.cache_stats import cache_stats, log_cache_stats
+    from bot.database.fsm_storage import BoundedMemoryStorage
+
+    cache = TTLCache(maxsize=2)
+    for key in range(3):
+        cache.set(key, key)
+    assert cache.stats()["evicted"] == 1 and cache.stats()["size"] == 2
+
+    storage = BoundedMemoryStorage()
+    snapshot = cache_stats(storage)
+    assert set(snapshot) == {"roles", "catalog", "pages", "prefetch", "fsm"}
+    assert "evicted" in snapshot["roles"] and "evicted" in snapshot["fsm"]
+    assert "fsm" not in cache_stats()
+
+    with patch.object(cache_stats_module, "logger") as logger:
+        task = asyncio.create_task(log_cache_stats(0.01, storage))
+        await asyncio.sleep(0.05)
+        task.cancel()
+    assert logger.info.call_count >= 2
+    assert set(logger.info.call_args.args[1]) == set(snapshot)
+
+    print("✅ Cache stats test passed")
+
+
 # === MAIN FUNCTION TO RUN TESTS ===
 
 async def run_all_tests():
@@ -331,6 +1671,150 @@ async def run_all_tests():
     except Exception as e:
         print(f"❌ Error: {e}")
 
+    try:
+        print("\n6. Testing unit of work session...")
+        await test_db_session_middleware()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n7. Testing connection pool stats...")
+        test_pool_instrumentation()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n8. Testing user summary...")
+        await test_user_summary()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n9. Testing shop statistics snapshot...")
+        await test_shop_stats_snapshot()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n10. Testing keyset pagination...")
+        await test_keyset_pagination()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n11. Testing referrals list...")
+        await test_user_referrals_order()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n12. Testing paginator count cache...")
+        await test_paginator_count_cache()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n13. Testing role cache...")
+        await test_role_cache()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n14. Testing catalog cache...")
+        await test_catalog_cache()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n15. Testing stock counters...")
+        await test_stock_counters()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n16. Testing lock-free purchase...")
+        await test_purchase_price_version()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n17. Testing multi-unit purchase...")
+        await test_multi_unit_purchase()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n18. Testing cart checkout...")
+        await test_cart_checkout()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n19. Testing bulk value import...")
+        await test_bulk_add_values()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n20. Testing streaming values upload...")
+        await test_streaming_values_upload()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n21. Testing staged values...")
+        await test_staged_values()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n22. Testing FSM storage...")
+        await test_fsm_storage()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n23. Testing bounded memory FSM storage...")
+        await test_bounded_memory_storage()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n24. Testing shared page cache...")
+        await test_shared_page_cache()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n25. Testing page prefetch...")
+        await test_page_prefetch()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n26. Testing sliding window rate limiter...")
+        test_sliding_window_limiter()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n27. Testing shared rate limits...")
+        await test_shared_rate_limits()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n28. Testing outbound governor...")
+        await test_outbound_governor()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+    try:
+        print("\n29. Testing cache stats...")
+        await test_cache_stats()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
     print("\n" + "=" * 50)
     print("✅ ALL TESTS COMPLETED")
     print("=" * 50)